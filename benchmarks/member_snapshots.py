@@ -0,0 +1,124 @@
+"""Compare member dicts with MemberSnapshot objects for large result sets
+
+python -m benchmarks.member_snapshots --members 1000000
+
+Builds the same stored rows both ways (the dict shape get_all_members
+used to return, and MemberSnapshot.from_row), then reports retained
+memory per row from tracemalloc, build time, and the time to scan every
+role id as an int. Finally reads the rows back through DatabaseHandler
+from a scratch SQLite file, where members share role set arrays.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from database.db_handler import DatabaseHandler
+from database.role_sets import canonical_roles, role_set_hash
+from database.snapshot import MemberSnapshot
+from database.storage import StorageManager
+
+def make_rows(members, roles, seed):
+    rng = random.Random(seed)
+    role_ids = [10**17 + i for i in range(roles)]
+    return [
+        (str(10**18 + user), ','.join(map(str, rng.sample(role_ids, rng.randint(1, 7)))),
+         None if user % 3 else f"nick-{user}", '2024-01-01 00:00:00')
+        for user in range(members)
+    ]
+
+def as_dicts(rows):
+    return [{
+        'user_id': row[0],
+        'roles': row[1].split(',') if row[1] else [],
+        'nickname': row[2],
+        'last_updated': row[3]
+    } for row in rows]
+
+def as_snapshots(rows):
+    return [MemberSnapshot.from_row(row) for row in rows]
+
+def measure(build, rows):
+    """Build a result set; returns it with (seconds, retained bytes)
+
+    Timed without tracemalloc, whose tracing would dominate the build
+    time, then built again under it for the memory figure.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+def scan_dicts(members):
+    return sum(int(role_id) for member in members for role_id in member['roles'])
+
+def scan_snapshots(members):
+    return sum(role_id for member in members for role_id in member.roles)
+
+async def read_back(rows):
+    """get_all_members from a scratch database holding rows; returns (snapshots, seconds)"""
+    storage = StorageManager(os.path.join(tempfile.mkdtemp(prefix="snapshots-"), "discord_bot.db"))
+    db = DatabaseHandler(storage)
+    await db.connect()
+    set_ids = {}
+    for _, roles, _, _ in rows:
+        canonical = canonical_roles(roles.split(','))
+        if canonical not in set_ids:
+            set_ids[canonical] = storage.execute(
+                'INSERT INTO role_sets (hash, roles) VALUES (?, ?)', (role_set_hash(canonical), canonical)
+            ).lastrowid
+    storage.executemany(
+        'INSERT INTO members (user_id, role_set_id, nickname, last_updated) VALUES (?, ?, ?, ?)',
+        ((user_id, set_ids[canonical_roles(roles.split(','))], nickname, updated) for user_id, roles, nickname, updated in rows)
+    )
+    started = time.perf_counter()
+    members = await db.get_all_members()
+    elapsed = time.perf_counter() - started
+    await db.close()
+    storage.close()
+    return members, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=1_000_000)
+    parser.add_argument("--roles", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rows = make_rows(args.members, args.roles, args.seed)
+    print(f"{args.members} stored members, 1-7 of {args.roles} roles each")
+
+    dicts, dict_build, dict_memory = measure(as_dicts, rows)
+    dict_scan = time.perf_counter()
+    dict_total = scan_dicts(dicts)
+    dict_scan = time.perf_counter() - dict_scan
+    del dicts
+
+    snapshots, snapshot_build, snapshot_memory = measure(as_snapshots, rows)
+    snapshot_scan = time.perf_counter()
+    snapshot_total = scan_snapshots(snapshots)
+    snapshot_scan = time.perf_counter() - snapshot_scan
+    del snapshots
+    assert dict_total == snapshot_total
+
+    print(f"  memory:       {dict_memory / args.members:.0f} B/row as dicts, {snapshot_memory / args.members:.0f} B/row as snapshots")
+    print(f"  build:        {dict_build:.2f}s as dicts, {snapshot_build:.2f}s as snapshots")
+    print(f"  scan role ids: {dict_scan:.2f}s as dicts with int(), {snapshot_scan:.2f}s as snapshots")
+
+    members, read_time = asyncio.run(read_back(rows))
+    assert len(members) == args.members
+    print(f"  get_all_members from SQLite: {read_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
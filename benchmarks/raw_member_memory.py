@@ -0,0 +1,94 @@
+"""Measure memory retained by member events with and without the member cache
+
+python -m benchmarks.raw_member_memory --members 200000
+
+Feeds synthetic GUILD_MEMBER_ADD and GUILD_MEMBER_UPDATE payloads through
+discord.py's own ConnectionState parsers, once with the default member
+cache and once the way RAW_MEMBER_EVENTS=true configures the bot, and
+reports what tracemalloc sees retained afterwards. Nothing connects to
+Discord.
+"""
+import argparse
+import asyncio
+import gc
+import random
+import tracemalloc
+
+import discord
+from discord.ext import commands
+
+from events.raw_member_events import install_raw_member_update
+
+GUILD_ID = 10**17
+
+def guild_payload(roles, member_count):
+    return {
+        'id': str(GUILD_ID), 'name': 'benchmark', 'owner_id': '1', 'unavailable': False,
+        'member_count': member_count, 'members': [], 'channels': [], 'features': [],
+        'emojis': [], 'stickers': [],
+        'roles': [{
+            'id': str(GUILD_ID + i), 'name': f'role-{i}', 'permissions': '0', 'position': i,
+            'color': 0, 'hoist': False, 'managed': False, 'mentionable': False
+        } for i in range(roles + 1)],
+    }
+
+def member_payload(user_id, role_ids):
+    return {
+        'guild_id': str(GUILD_ID),
+        'user': {'id': str(user_id), 'username': f'user-{user_id}', 'discriminator': '0', 'avatar': None},
+        'roles': [str(role_id) for role_id in role_ids],
+        'nick': None, 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0,
+    }
+
+async def measure(raw, members, roles, per_member, seed):
+    intents = discord.Intents.default()
+    intents.members = True
+    if raw:
+        bot = commands.Bot(command_prefix="!", intents=intents,
+                           member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+        install_raw_member_update(bot)
+    else:
+        bot = commands.Bot(command_prefix="!", intents=intents, chunk_guilds_at_startup=False)
+
+    raw_updates = 0
+
+    def dispatch(event, *args, **kwargs):
+        nonlocal raw_updates
+        if event == 'raw_member_update':
+            raw_updates += 1
+
+    # Count what the cogs would receive without scheduling listener tasks
+    bot.dispatch = dispatch
+    state = bot._connection
+    state.parse_guild_create(guild_payload(roles, members))
+    parsers = state.parsers
+
+    rng = random.Random(seed)
+    gc.collect()
+    tracemalloc.start()
+    for user in range(members):
+        payload = member_payload(2 * GUILD_ID + user, [GUILD_ID + 1 + r for r in rng.sample(range(roles), per_member)])
+        parsers['GUILD_MEMBER_ADD'](dict(payload))
+        parsers['GUILD_MEMBER_UPDATE'](dict(payload))
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cached = len(bot.get_guild(GUILD_ID).members)
+    return retained, cached, raw_updates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=200_000)
+    parser.add_argument("--roles", type=int, default=300)
+    parser.add_argument("--per-member", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.members} members, {args.per_member} of {args.roles} roles each")
+    for raw in (False, True):
+        retained, cached, raw_updates = asyncio.run(measure(raw, args.members, args.roles, args.per_member, args.seed))
+        print(f"  {'raw events  ' if raw else 'member cache'}: {retained / 1048576:.1f} MB retained, "
+              f"{cached} members cached, {raw_updates} raw updates dispatched")
+
+if __name__ == "__main__":
+    main()
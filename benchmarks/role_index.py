@@ -0,0 +1,57 @@
+"""Benchmark RoleIndex queries against a scan of stored members
+
+python -m benchmarks.role_index --members 500000 --roles 300 --per-member 8
+"""
+import argparse
+import random
+import time
+
+from database.role_index import RoleIndex
+
+def timed(fn, repeat=1):
+    """Best wall time of fn over repeat runs, in seconds, and its last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500_000)
+    parser.add_argument("--roles", type=int, default=300)
+    parser.add_argument("--per-member", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    role_ids = [10**17 + i for i in range(args.roles)]
+    members = [
+        (10**17 + 10**6 + user, rng.sample(role_ids, args.per_member), rng.random() < 0.8)
+        for user in range(args.members)
+    ]
+    a, b, c = role_ids[:3]
+
+    index = RoleIndex()
+    build, _ = timed(lambda: [index.set_member(user_id, roles, present) for user_id, roles, present in members])
+    print(f"{args.members} members x {args.roles} roles, {args.per_member} each")
+    print(f"  build:                        {build:.2f}s")
+
+    def scan():
+        return sum(1 for _, roles, _ in members if a in roles and b not in roles)
+
+    scan_time, expected = timed(scan, 3)
+    query_time, total = timed(lambda: index.count(all_of=[a], none_of=[b]), 5)
+    assert total == expected
+    print(f"  A and not B:                  {query_time * 1000:.1f}ms ({total} matches; scan {scan_time * 1000:.0f}ms)")
+
+    paged, _ = timed(lambda: index.query(all_of=[a], any_of=[b, c], present=False, offset=100, limit=25), 5)
+    print(f"  3-clause query, page of 25:   {paged * 1000:.1f}ms")
+
+    updates = [(rng.choice(members)[0], rng.sample(role_ids, args.per_member)) for _ in range(10_000)]
+    update_time, _ = timed(lambda: [index.set_member(user_id, roles) for user_id, roles in updates])
+    print(f"  incremental update:           {update_time / len(updates) * 1e6:.1f}us")
+
+if __name__ == "__main__":
+    main()
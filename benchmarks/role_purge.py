@@ -0,0 +1,120 @@
+"""Time purging a deleted role held by a large share of stored members
+
+python -m benchmarks.role_purge --members 500000 --holders 200000
+
+Fills a scratch SQLite database and a RoleIndex with the same members,
+a fixed number of them holding the purged role alongside 1-7 others,
+then runs DatabaseHandler.purge_role while a ticker task records the
+longest stretch the event loop went without running it. The index purge
+is timed separately, since on_guild_role_delete runs both.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from database.db_handler import DatabaseHandler
+from database.role_index import RoleIndex
+from database.role_sets import canonical_roles, role_set_hash
+from database.storage import StorageManager
+
+PURGED = 10**17 - 1
+
+def make_members(members, holders, roles, seed):
+    """(user_id, role ids) pairs; the first holders members also hold PURGED"""
+    rng = random.Random(seed)
+    role_ids = [10**17 + i for i in range(roles)]
+    result = []
+    for user in range(members):
+        held = rng.sample(role_ids, rng.randint(1, 7))
+        if user < holders:
+            held.append(PURGED)
+        result.append((10**18 + user, held))
+    rng.shuffle(result)
+    return result
+
+async def fill(storage, members):
+    """Store members through interned role sets; returns how many sets there are"""
+    set_ids = {}
+    for _, held in members:
+        canonical = canonical_roles(held)
+        if canonical not in set_ids:
+            set_ids[canonical] = storage.execute(
+                'INSERT INTO role_sets (hash, roles) VALUES (?, ?)', (role_set_hash(canonical), canonical)
+            ).lastrowid
+    storage.executemany(
+        'INSERT INTO members (user_id, role_set_id) VALUES (?, ?)',
+        ((str(user_id), set_ids[canonical_roles(held)]) for user_id, held in members)
+    )
+    return len(set_ids)
+
+async def ticker(stalls):
+    """Record the longest gap between wakeups until cancelled
+
+    The gap that ends in the cancellation counts too, so a purge that
+    never yields shows up as one stall as long as the purge.
+    """
+    last = time.perf_counter()
+    try:
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stalls[0] = max(stalls[0], now - last)
+            last = now
+    finally:
+        stalls[0] = max(stalls[0], time.perf_counter() - last)
+
+async def purge(members, holders, chunk_size):
+    storage = StorageManager(os.path.join(tempfile.mkdtemp(prefix="role-purge-"), "discord_bot.db"))
+    db = DatabaseHandler(storage)
+    await db.connect()
+    role_sets = await fill(storage, members)
+
+    stalls = [0.0]
+    task = asyncio.create_task(ticker(stalls))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    affected = await db.purge_role(1, PURGED, "purged", record_history=True, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert len(affected) == holders
+    left = storage.execute(
+        "SELECT COUNT(*) FROM members JOIN role_sets USING (role_set_id) WHERE instr(',' || roles || ',', ?)",
+        (f",{PURGED},",)
+    ).fetchone()[0]
+    assert left == 0
+    await db.close()
+    storage.close()
+    return role_sets, elapsed, stalls[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500_000)
+    parser.add_argument("--holders", type=int, default=200_000)
+    parser.add_argument("--roles", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    members = make_members(args.members, args.holders, args.roles, args.seed)
+    print(f"{args.members} stored members, {args.holders} holding the purged role")
+
+    role_sets, elapsed, stall = asyncio.run(purge(members, args.holders, args.chunk_size))
+    print(f"  DatabaseHandler.purge_role: {elapsed:.2f}s over {role_sets} role sets, "
+          f"longest loop stall {stall * 1000:.1f}ms")
+
+    index = RoleIndex()
+    for user_id, held in members:
+        index.set_member(user_id, held)
+    started = time.perf_counter()
+    cleared = index.purge_role(PURGED)
+    elapsed = time.perf_counter() - started
+    assert cleared == args.holders
+    print(f"  RoleIndex.purge_role: {elapsed * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
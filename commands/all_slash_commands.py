@@ -4,15 +4,21 @@ from discord.ext import commands
 import logging
 import traceback
 from utils.permission_checks import is_admin, has_manage_roles
+from utils.members import iter_members, resolve_member
 
 logger = logging.getLogger('bot.commands')
 
 class CommandsCog(commands.Cog):
     """Cog containing all slash commands for the bot"""
     
-    def __init__(self, bot, db):
+    def __init__(self, bot, db, role_index=None, journal=None, maintenance=None, storage=None, replication=None):
         self.bot = bot
         self.db = db
+        self.role_index = role_index
+        self.journal = journal
+        self.maintenance = maintenance
+        self.storage = storage
+        self.replication = replication
         
     async def log_command(self, interaction, command_name, success=True, details=None):
         """Log command usage to both logger and Discord channel if configured"""
@@ -55,7 +61,7 @@ class CommandsCog(commands.Cog):
             guild = interaction.guild
             member_count = 0
             
-            for member in guild.members:
+            async for member in iter_members(guild):
                 if not member.bot:  # Skip bots
                     # Get roles (excluding @everyone)
                     roles = [role.id for role in member.roles if role.name != "@everyone"]
@@ -68,6 +74,9 @@ class CommandsCog(commands.Cog):
                     )
                     member_count += 1
             
+            if self.role_index:
+                await self.role_index.build(guild)
+            
             await interaction.followup.send(f"✅ Successfully stored data for {member_count} members!", ephemeral=True)
             await self.log_command(interaction, "fetchall", True, f"Processed {member_count} members")
             
@@ -100,13 +109,13 @@ class CommandsCog(commands.Cog):
             
             # Format roles for display
             stored_roles = []
-            for role_id in member_data.get("roles", []):
-                role = interaction.guild.get_role(int(role_id))
+            for role_id in member_data.roles:
+                role = interaction.guild.get_role(role_id)
                 role_name = role.name if role else f"Unknown Role ({role_id})"
                 stored_roles.append(f"- {role_name} ({role_id})")
             
             roles_text = "\n".join(stored_roles) if stored_roles else "None"
-            nickname = member_data.get("nickname") or "None"
+            nickname = member_data.nickname or "None"
             
             # Create embed for better display
             embed = discord.Embed(
@@ -140,7 +149,7 @@ class CommandsCog(commands.Cog):
         
         try:
             # Check if user is in the guild
-            member = interaction.guild.get_member(user.id)
+            member = await resolve_member(interaction.guild, user.id)
             if not member:
                 await interaction.followup.send(f"❌ {user.mention} is not in this server", ephemeral=True)
                 await self.log_command(interaction, "restore", False, f"User {user.id} not in guild")
@@ -162,7 +171,7 @@ class CommandsCog(commands.Cog):
             current_roles = set(role.id for role in member.roles if role.name != "@everyone")
             
             # Get the roles to be restored
-            roles_to_restore = set(int(role_id) for role_id in member_data.get("roles", []))
+            roles_to_restore = set(member_data.roles)
             
             # Calculate roles to add and remove
             roles_to_add = roles_to_restore - current_roles
@@ -171,6 +180,14 @@ class CommandsCog(commands.Cog):
             added_roles = []
             failed_roles = []
             
+            # Journal the restore so a crash part-way through gets finished on startup
+            entry_id = None
+            if self.journal:
+                entry_id = await self.journal.begin('restore', interaction.guild.id, member.id, {
+                    'roles': list(roles_to_add),
+                    'nickname': member_data.nickname
+                })
+            
             # Add roles
             for role_id in roles_to_add:
                 role = interaction.guild.get_role(role_id)
@@ -193,15 +210,18 @@ class CommandsCog(commands.Cog):
             
             # Restore nickname if it exists
             nickname_result = "No change"
-            if member_data.get("nickname") and member_data["nickname"] != member.nick:
+            if member_data.nickname and member_data.nickname != member.nick:
                 try:
-                    await member.edit(nick=member_data["nickname"], reason="Automatic nickname restore")
-                    nickname_result = f"Changed to {member_data['nickname']}"
+                    await member.edit(nick=member_data.nickname, reason="Automatic nickname restore")
+                    nickname_result = f"Changed to {member_data.nickname}"
                 except discord.Forbidden:
                     nickname_result = "Failed - missing permissions"
                 except Exception as e:
                     nickname_result = f"Failed - {str(e)}"
             
+            if entry_id:
+                self.journal.done(entry_id)
+            
             # Create response
             embed = discord.Embed(
                 title=f"Restore Results for {user.name}",
@@ -254,6 +274,8 @@ class CommandsCog(commands.Cog):
         try:
             # Delete from database
             success = await self.db.delete_member(str(user.id))
+            if success and self.role_index:
+                self.role_index.remove_member(user.id)
             
             if success:
                 await interaction.followup.send(f"✅ Successfully deleted data for {user.mention}", ephemeral=True)
@@ -293,6 +315,8 @@ class CommandsCog(commands.Cog):
             try:
                 # Clear database
                 deleted_count = await self.db.clear_database()
+                if self.role_index:
+                    self.role_index.clear()
                 
                 await interaction.followup.send(
                     f"✅ Database cleared successfully. Deleted {deleted_count} records.",
@@ -308,6 +332,40 @@ class CommandsCog(commands.Cog):
         else:
             await interaction.followup.send("Operation cancelled.", ephemeral=True)
     
+    @app_commands.command(
+        name="dbstats",
+        description="Show database file, free page and WAL sizes"
+    )
+    @app_commands.check(is_admin)
+    async def dbstats(self, interaction: discord.Interaction):
+        """Report storage sizes from the maintenance component"""
+        if not self.maintenance:
+            await interaction.response.send_message("❌ Database maintenance is only available with SQLite storage.", ephemeral=True)
+            return
+        
+        report = self.maintenance.report()
+        embed = discord.Embed(title="Database Stats", color=discord.Color.blue())
+        embed.add_field(name="File", value=f"{report['file_bytes'] / 1048576:.1f} MB", inline=True)
+        embed.add_field(name="Free pages", value=f"{report['freelist_pages']} ({report['freelist_bytes'] / 1048576:.1f} MB)", inline=True)
+        embed.add_field(name="WAL", value=f"{report['wal_bytes'] / 1048576:.1f} MB", inline=True)
+        embed.add_field(name="Pages", value=f"{report['page_count']} x {report['page_size']} B", inline=True)
+        if self.storage:
+            lines = [
+                f"`{entry['statement']}` {entry['calls']}x, {entry['avg_ms']:.2f} ms avg"
+                for entry in self.storage.stats()[:5]
+            ]
+            embed.add_field(name="Busiest statements", value="\n".join(lines) or "None yet", inline=False)
+        if self.replication:
+            replication = self.replication.stats()
+            value = f"{replication['pending']} queued, {replication['lag_seconds']:.1f}s behind, {replication['shipped']} shipped"
+            if replication['rejected']:
+                value += f"\n{replication['rejected']} rejected by the service (see replication_rejects)"
+            if replication['failures']:
+                value += f"\n{replication['failures']} failures, last: {(replication['last_error'] or '')[:200]}"
+            embed.add_field(name="Replication", value=value, inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await self.log_command(interaction, "dbstats", True)
+    
     # Error handling for command checks
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.errors.CheckFailure):
@@ -0,0 +1,345 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+from datetime import datetime, timezone
+import json
+import logging
+import time
+import traceback
+from typing import Optional
+from config import BOT_CONFIG
+from utils.permission_checks import is_admin
+from utils.members import iter_members, resolve_member
+
+logger = logging.getLogger('bot.commands')
+
+# How often progress is persisted and shown while a job runs
+CHECKPOINT_EVERY = 25
+PROGRESS_INTERVAL = 5.0
+
+class BulkRoleJobDB:
+    """Persists bulk role jobs and their checkpoints so they survive restarts
+
+    Targets are processed in ascending user id order, so the checkpoint is
+    just the last user id handled: a resumed job recomputes its filter and
+    continues with the ids after it. Jobs live in the shared storage
+    manager's database, which creates the bulk_role_jobs table.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.storage.open()
+
+    @staticmethod
+    def _rows(cursor):
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def create_job(self, guild_id: int, role_id: int, action: str, filters: dict,
+                   channel_id: int, requested_by: int) -> int:
+        """Create a new running job and return its id"""
+        return self.storage.execute('''
+            INSERT INTO bulk_role_jobs
+            (guild_id, role_id, action, filter, channel_id, requested_by, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'running', ?)
+        ''', (guild_id, role_id, action, json.dumps(filters), channel_id, requested_by,
+              datetime.now().isoformat())).lastrowid
+
+    def set_message(self, job_id: int, message_id: int):
+        """Remember the progress message of a job"""
+        self.storage.execute('UPDATE bulk_role_jobs SET message_id = ? WHERE job_id = ?', (message_id, job_id))
+
+    def checkpoint(self, job_id: int, last_user_id: int, processed: int, failed: int, status: str = 'running'):
+        """Persist how far a job got"""
+        self.storage.execute('''
+            UPDATE bulk_role_jobs
+            SET last_user_id = ?, processed = ?, failed = ?, status = ?
+            WHERE job_id = ?
+        ''', (last_user_id, processed, failed, status, job_id))
+
+    def set_status(self, job_id: int, status: str):
+        """Change the status of a job"""
+        self.storage.execute('UPDATE bulk_role_jobs SET status = ? WHERE job_id = ?', (status, job_id))
+
+    def get_job(self, job_id: int):
+        """Get a job as a dict"""
+        rows = self._rows(self.storage.execute('SELECT * FROM bulk_role_jobs WHERE job_id = ?', (job_id,)))
+        return rows[0] if rows else None
+
+    def get_running_jobs(self):
+        """Get all jobs that were running when the bot stopped"""
+        return self._rows(self.storage.execute("SELECT * FROM bulk_role_jobs WHERE status = 'running'"))
+
+class BulkRoles(commands.Cog):
+    """Add or remove a role for every member matching a filter"""
+
+    def __init__(self, bot, db, storage, role_index=None):
+        self.bot = bot
+        self.db = db
+        self.jobs = BulkRoleJobDB(storage)
+        self.role_index = role_index
+        self.active_tasks = {}
+        self.delay = BOT_CONFIG.get("bulk_role_delay", 1.0)
+
+    async def find_targets(self, guild: discord.Guild, job: dict):
+        """Compute the sorted user ids a job still has to process
+
+        Present members are matched on their live roles and join date; with
+        the "absent" scope, stored snapshots of members who are not in the
+        guild are matched instead. Members that already have the desired
+        state are skipped.
+        """
+        filters = json.loads(job['filter'])
+        role_id = job['role_id']
+        has_role = filters.get('has_role')
+        adding = job['action'] == 'add'
+
+        if filters.get('scope') == 'absent':
+            present_ids = {member.id async for member in iter_members(guild)}
+            targets = []
+            for member_data in await self.db.get_all_members():
+                user_id = member_data.user_id
+                roles = set(member_data.roles)
+                if user_id in present_ids or user_id <= job['last_user_id']:
+                    continue
+                if has_role and has_role not in roles:
+                    continue
+                if (role_id in roles) != adding:
+                    targets.append(user_id)
+            return sorted(targets)
+
+        joined_before = filters.get('joined_before')
+        if joined_before:
+            joined_before = datetime.fromisoformat(joined_before)
+
+        targets = []
+        async for member in iter_members(guild):
+            if member.bot or member.id <= job['last_user_id']:
+                continue
+            roles = {role.id for role in member.roles}
+            if has_role and has_role not in roles:
+                continue
+            if joined_before and (member.joined_at is None or member.joined_at >= joined_before):
+                continue
+            if (role_id in roles) != adding:
+                targets.append(member.id)
+        return sorted(targets)
+
+    async def apply(self, guild: discord.Guild, role: discord.Role, job: dict, user_id: int):
+        """Apply the job's action to one member; returns True on success"""
+        adding = job['action'] == 'add'
+        member = await resolve_member(guild, user_id)
+
+        if member is None:
+            if json.loads(job['filter']).get('scope') != 'absent':
+                # Left while the job ran; their snapshot isn't what this job targets
+                logger.info(f"Bulk role job #{job['job_id']} skipped {user_id}: no longer in the server")
+                return False
+            # Stored but absent: change the snapshot that will be restored on rejoin
+            member_data = await self.db.get_member(str(user_id))
+            if not member_data:
+                return False
+            roles = [role_id for role_id in member_data.roles if role_id != role.id]
+            if adding:
+                roles.append(role.id)
+            if not await self.db.update_member(str(user_id), roles, member_data.nickname, left=True):
+                return False
+            # No member update event will follow, so keep /whohas and the role counts in step here
+            if self.role_index:
+                self.role_index.update_raw(guild.id, user_id, roles, present=False)
+            return True
+
+        reason = f"Bulk role job #{job['job_id']}"
+        if adding:
+            await member.add_roles(role, reason=reason)
+        else:
+            await member.remove_roles(role, reason=reason)
+        return True
+
+    def progress_embed(self, job: dict, role: discord.Role, total: int, status: str):
+        embed = discord.Embed(
+            title=f"Bulk role job #{job['job_id']}",
+            description=f"{'Adding' if job['action'] == 'add' else 'Removing'} {role.mention}",
+            color=discord.Color.green() if status == 'done' else discord.Color.blue()
+        )
+        embed.add_field(name="Progress", value=f"{job['processed'] + job['failed']}/{total}", inline=True)
+        embed.add_field(name="Failed", value=str(job['failed']), inline=True)
+        embed.add_field(name="Status", value=status, inline=True)
+        embed.set_footer(text=f"Cancel with /bulkrole_cancel job_id:{job['job_id']}")
+        return embed
+
+    async def update_progress(self, message, job, role, total, status):
+        if message is None:
+            return
+        try:
+            await message.edit(embed=self.progress_embed(job, role, total, status))
+        except discord.HTTPException as e:
+            logger.warning(f"Could not update progress for bulk role job #{job['job_id']}: {str(e)}")
+
+    async def run_job(self, job: dict):
+        """Process a job from its checkpoint, pacing role edits"""
+        job_id = job['job_id']
+        guild = self.bot.get_guild(job['guild_id'])
+        role = guild.get_role(job['role_id']) if guild else None
+        if not role:
+            logger.error(f"Bulk role job #{job_id} stopped: guild or role no longer exists")
+            self.jobs.set_status(job_id, 'failed')
+            return
+
+        message = None
+        channel = self.bot.get_channel(job['channel_id'])
+        if channel and job['message_id']:
+            try:
+                message = await channel.fetch_message(job['message_id'])
+            except discord.HTTPException:
+                message = None
+
+        targets = await self.find_targets(guild, job)
+        scope = json.loads(job['filter']).get('scope')
+        total = job['processed'] + job['failed'] + len(targets)
+        last_progress = 0.0
+        status = 'running'
+
+        try:
+            for count, user_id in enumerate(targets, 1):
+                try:
+                    if await self.apply(guild, role, job, user_id):
+                        job['processed'] += 1
+                    else:
+                        job['failed'] += 1
+                except discord.HTTPException as e:
+                    job['failed'] += 1
+                    logger.warning(f"Bulk role job #{job_id} failed for {user_id}: {str(e)}")
+                job['last_user_id'] = user_id
+
+                if count % CHECKPOINT_EVERY == 0:
+                    self.jobs.checkpoint(job_id, user_id, job['processed'], job['failed'])
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await self.update_progress(message, job, role, total, status)
+
+                # Only role edits through the API need pacing; absent members are storage-only
+                await asyncio.sleep(0 if scope == 'absent' else self.delay)
+
+            status = 'done'
+        except asyncio.CancelledError:
+            status = 'cancelled' if self.jobs.get_job(job_id)['status'] == 'cancelled' else 'running'
+            raise
+        except Exception as e:
+            status = 'failed'
+            logger.error(f"Bulk role job #{job_id} failed: {str(e)}\n{traceback.format_exc()}")
+        finally:
+            self.jobs.checkpoint(job_id, job['last_user_id'], job['processed'], job['failed'], status)
+            self.active_tasks.pop(job_id, None)
+            await self.update_progress(message, job, role, total, status)
+            logger.info(f"Bulk role job #{job_id} {status}: {job['processed']} processed, {job['failed']} failed")
+
+    def start_job(self, job: dict):
+        if job['job_id'] not in self.active_tasks:
+            self.active_tasks[job['job_id']] = asyncio.create_task(self.run_job(job))
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Resume jobs that were interrupted by a restart"""
+        for job in self.jobs.get_running_jobs():
+            logger.info(f"Resuming bulk role job #{job['job_id']} after user {job['last_user_id']}")
+            self.start_job(job)
+
+    @app_commands.command(
+        name="bulkrole",
+        description="Add or remove a role for every member matching a filter"
+    )
+    @app_commands.describe(
+        action="Whether to add or remove the role",
+        role="The role to add or remove",
+        has_role="Only members who have this role",
+        joined_before="Only members who joined before this date (YYYY-MM-DD)",
+        scope="Members in the server, or stored members who have left"
+    )
+    @app_commands.choices(
+        action=[
+            app_commands.Choice(name="Add", value="add"),
+            app_commands.Choice(name="Remove", value="remove"),
+        ],
+        scope=[
+            app_commands.Choice(name="In the server", value="present"),
+            app_commands.Choice(name="Stored but absent", value="absent"),
+        ]
+    )
+    @app_commands.check(is_admin)
+    async def bulkrole(
+        self,
+        interaction: discord.Interaction,
+        action: str,
+        role: discord.Role,
+        has_role: Optional[discord.Role] = None,
+        joined_before: Optional[str] = None,
+        scope: str = "present"
+    ):
+        """Start a paced background job applying a role change by filter"""
+        if role.position >= interaction.guild.me.top_role.position:
+            await interaction.response.send_message("I can't manage this role because it's higher than or equal to my highest role!", ephemeral=True)
+            return
+
+        if scope == "absent" and joined_before:
+            await interaction.response.send_message("❌ Join dates are not stored for absent members.", ephemeral=True)
+            return
+
+        filters = {'scope': scope, 'has_role': has_role.id if has_role else None}
+        if joined_before:
+            try:
+                filters['joined_before'] = datetime.strptime(joined_before, "%Y-%m-%d").replace(tzinfo=timezone.utc).isoformat()
+            except ValueError:
+                await interaction.response.send_message("❌ joined_before must be a date like 2024-01-31.", ephemeral=True)
+                return
+
+        job_id = self.jobs.create_job(
+            interaction.guild.id, role.id, action, filters,
+            interaction.channel.id, interaction.user.id
+        )
+        job = self.jobs.get_job(job_id)
+
+        await interaction.response.send_message(f"✅ Started bulk role job #{job_id}", ephemeral=True)
+        try:
+            message = await interaction.channel.send(embed=self.progress_embed(job, role, 0, 'starting'))
+        except Exception:
+            # Otherwise the job would stay 'running' and resume on the next start with nothing to report to
+            self.jobs.set_status(job_id, 'failed')
+            raise
+        self.jobs.set_message(job_id, message.id)
+        job['message_id'] = message.id
+
+        self.start_job(job)
+        logger.info(f"Bulk role job #{job_id} started by {interaction.user} ({interaction.user.id}): {action} {role.id} {filters}")
+
+    @app_commands.command(
+        name="bulkrole_cancel",
+        description="Cancel a running bulk role job"
+    )
+    @app_commands.describe(job_id="The job number shown on the progress message")
+    @app_commands.check(is_admin)
+    async def bulkrole_cancel(self, interaction: discord.Interaction, job_id: int):
+        job = self.jobs.get_job(job_id)
+        if not job or job['guild_id'] != interaction.guild.id or job['status'] != 'running':
+            await interaction.response.send_message(f"❌ No running job #{job_id} in this server.", ephemeral=True)
+            return
+
+        self.jobs.set_status(job_id, 'cancelled')
+        task = self.active_tasks.get(job_id)
+        if task:
+            task.cancel()
+        await interaction.response.send_message(f"✅ Cancelled bulk role job #{job_id}", ephemeral=True)
+
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.errors.CheckFailure):
+            await interaction.response.send_message(
+                "❌ You don't have permission to use this command.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Command error: {str(error)}\n{traceback.format_exc()}")
+            if interaction.response.is_done():
+                await interaction.followup.send(f"❌ An error occurred: {str(error)}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❌ An error occurred: {str(error)}", ephemeral=True)
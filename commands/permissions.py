@@ -0,0 +1,134 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import logging
+import traceback
+from utils.permission_checks import is_admin
+from utils.permission_policy import LEVELS, LEVEL_NAMES
+
+logger = logging.getLogger('bot.commands')
+
+class PermissionsCog(commands.Cog):
+    """Manages per-guild permission rules and keeps compiled rules fresh"""
+
+    def __init__(self, bot, policy):
+        self.bot = bot
+        self.policy = policy
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.policy.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.permissions != after.permissions:
+            self.policy.invalidate(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.policy.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before, after):
+        if before.owner_id != after.owner_id:
+            self.policy.invalidate(after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.policy.invalidate(guild.id)
+
+    @app_commands.command(
+        name="permrole",
+        description="Grant or revoke admin or manager level for a role"
+    )
+    @app_commands.describe(
+        action="Grant or revoke the level",
+        level="Permission level",
+        role="The role to change"
+    )
+    @app_commands.choices(
+        action=[
+            app_commands.Choice(name="Grant", value="add"),
+            app_commands.Choice(name="Revoke", value="remove"),
+        ],
+        level=[
+            app_commands.Choice(name="Admin", value="admin"),
+            app_commands.Choice(name="Manager", value="manager"),
+        ]
+    )
+    @app_commands.check(is_admin)
+    async def permrole(self, interaction: discord.Interaction, action: str, level: str, role: discord.Role):
+        """Set which roles count as admin or manager in this guild"""
+        if action == "add":
+            self.policy.add_role(interaction.guild.id, role.id, LEVELS[level])
+            message = f"✅ {role.mention} now has {level} permissions."
+        elif self.policy.remove_role(interaction.guild.id, role.id, LEVELS[level]):
+            message = f"✅ {role.mention} no longer has {level} permissions."
+        else:
+            message = f"❌ {role.mention} was not a configured {level} role."
+        await interaction.response.send_message(message, ephemeral=True)
+        logger.info(f"/permrole {action} {level} {role.id} by {interaction.user} ({interaction.user.id})")
+
+    @app_commands.command(
+        name="permcommand",
+        description="Change the permission level a command needs in this server"
+    )
+    @app_commands.describe(
+        command="Command name without the slash",
+        level="Required level, or default to restore the built-in level"
+    )
+    @app_commands.choices(level=[
+        app_commands.Choice(name="Everyone", value="everyone"),
+        app_commands.Choice(name="Manager", value="manager"),
+        app_commands.Choice(name="Admin", value="admin"),
+        app_commands.Choice(name="Default", value="default"),
+    ])
+    @app_commands.check(is_admin)
+    async def permcommand(self, interaction: discord.Interaction, command: str, level: str):
+        """Override the level a command requires"""
+        command = command.strip().lstrip('/')
+        if self.bot.tree.get_command(command) is None:
+            await interaction.response.send_message(f"❌ Unknown command `/{command}`.", ephemeral=True)
+            return
+        if command in ("permrole", "permcommand", "permshow") and level not in ("admin", "default"):
+            await interaction.response.send_message("❌ Permission commands always require admin.", ephemeral=True)
+            return
+
+        self.policy.set_override(interaction.guild.id, command, None if level == "default" else LEVELS[level])
+        await interaction.response.send_message(f"✅ `/{command}` now requires {level} level.", ephemeral=True)
+        logger.info(f"/permcommand {command} {level} by {interaction.user} ({interaction.user.id})")
+
+    @app_commands.command(
+        name="permshow",
+        description="Show this server's permission rules"
+    )
+    @app_commands.check(is_admin)
+    async def permshow(self, interaction: discord.Interaction):
+        """Show the compiled rules for this guild"""
+        compiled = self.policy.get(interaction.guild)
+
+        def mentions(role_ids):
+            roles = [interaction.guild.get_role(role_id) for role_id in role_ids]
+            return ", ".join(role.mention for role in roles if role) or "None"
+
+        embed = discord.Embed(title="Permission Rules", color=discord.Color.blue())
+        embed.add_field(name="Admin roles", value=mentions(compiled.admin_roles)[:1024], inline=False)
+        embed.add_field(name="Manager roles", value=mentions(compiled.manager_roles)[:1024], inline=False)
+        overrides = "\n".join(
+            f"`/{command}`: {LEVEL_NAMES[level]}" for command, level in sorted(compiled.overrides.items())
+        )
+        embed.add_field(name="Command overrides", value=overrides[:1024] or "None", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.errors.CheckFailure):
+            await interaction.response.send_message(
+                "❌ You don't have permission to use this command.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Command error: {str(error)}\n{traceback.format_exc()}")
+            if interaction.response.is_done():
+                await interaction.followup.send(f"❌ An error occurred: {str(error)}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❌ An error occurred: {str(error)}", ephemeral=True)
@@ -0,0 +1,110 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import io
+import logging
+import traceback
+from datetime import datetime
+from utils.permission_checks import is_admin
+from utils.profiling import profile_cprofile, profile_sampling
+
+logger = logging.getLogger('bot.commands')
+
+MAX_PROFILE_SECONDS = 120
+
+class ProfilingCog(commands.Cog):
+    """Admin commands for finding out what makes the bot lag"""
+
+    def __init__(self, bot, monitor=None, pipeline=None):
+        self.bot = bot
+        self.monitor = monitor
+        self.pipeline = pipeline
+        self.profiling = False
+
+    @app_commands.command(
+        name="profile",
+        description="Profile the bot for a number of seconds and attach the results"
+    )
+    @app_commands.describe(
+        seconds=f"How long to profile (1-{MAX_PROFILE_SECONDS})",
+        mode="cProfile for exact call counts, sampling for a flamegraph"
+    )
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="cProfile (pstats file)", value="cprofile"),
+        app_commands.Choice(name="Sampling (folded stacks for flamegraphs)", value="sampling"),
+    ])
+    @app_commands.check(is_admin)
+    async def profile(
+        self,
+        interaction: discord.Interaction,
+        seconds: app_commands.Range[int, 1, MAX_PROFILE_SECONDS] = 30,
+        mode: str = "cprofile"
+    ):
+        """Run one profiling session and send the output as a file"""
+        if self.profiling:
+            await interaction.response.send_message("❌ A profiling session is already running.", ephemeral=True)
+            return
+
+        self.profiling = True
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        logger.info(f"{mode} profiling for {seconds}s started by {interaction.user} ({interaction.user.id})")
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        try:
+            if mode == "sampling":
+                folded, samples = await profile_sampling(seconds)
+                file = discord.File(io.BytesIO(folded.encode()), filename=f"profile-{stamp}.folded")
+                message = (
+                    f"✅ {samples} samples over {seconds}s. Render with "
+                    f"`flamegraph.pl profile-{stamp}.folded > flame.svg` or open in speedscope."
+                )
+            else:
+                stats_bytes, summary = await profile_cprofile(seconds)
+                file = discord.File(io.BytesIO(stats_bytes), filename=f"profile-{stamp}.pstats")
+                top = summary.strip().splitlines()
+                message = (
+                    f"✅ Profiled {seconds}s. Load with `python -m pstats profile-{stamp}.pstats`.\n"
+                    f"```\n{chr(10).join(top[:20])[:1700]}\n```"
+                )
+            await interaction.followup.send(message, file=file, ephemeral=True)
+        finally:
+            self.profiling = False
+
+    @app_commands.command(
+        name="loopstats",
+        description="Show event loop stalls and member event queue lag since startup"
+    )
+    @app_commands.check(is_admin)
+    async def loopstats(self, interaction: discord.Interaction):
+        """Report what the stall monitor and the event pipeline have seen"""
+        if not self.monitor and not self.pipeline:
+            await interaction.response.send_message("❌ The event loop monitor is disabled.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="Event Loop", color=discord.Color.blue())
+        if self.monitor:
+            stats = self.monitor.stats()
+            embed.add_field(name="Stalls", value=f"{stats['stalls']} over {stats['threshold_ms']:.0f} ms", inline=True)
+            embed.add_field(name="Worst", value=f"{stats['worst_ms']:.0f} ms", inline=True)
+            if stats['worst_culprit']:
+                embed.add_field(name="Worst stall in", value=f"`{stats['worst_culprit'][:1000]}`", inline=False)
+        if self.pipeline:
+            lines = [
+                f"#{p['partition']}: {p['queued']} queued, {p['waiting']} waiting, {p['processed']} done, {p['failed']} failed, "
+                f"lag {p['lag_ms']:.0f} ms (worst {p['worst_lag_ms']:.0f} ms)"
+                for p in self.pipeline.stats()
+            ]
+            embed.add_field(name="Member event partitions", value="\n".join(lines)[:1024], inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.errors.CheckFailure):
+            await interaction.response.send_message(
+                "❌ You don't have permission to use this command.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Command error: {str(error)}\n{traceback.format_exc()}")
+            if interaction.response.is_done():
+                await interaction.followup.send(f"❌ An error occurred: {str(error)}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❌ An error occurred: {str(error)}", ephemeral=True)
@@ -2,83 +2,99 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-import sqlite3
-import os
+import math
+import re
+import time
+from typing import Optional
+from events.pipeline import run_ordered
+from utils.dm_outbox import DMOutbox, DMOutboxDB
+from utils.permission_checks import is_admin, has_manage_roles
+from utils.members import resolve_member
 
 logger = logging.getLogger('bot')
 
+# Removals due within the same window are handled by one task
+EXPIRY_WINDOW = 60
+# Seconds between role edits when granting or expiring many roles at once
+ROLE_EDIT_DELAY = 0.5
+
+DURATION_UNITS = {
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+}
+DURATION_PATTERN = re.compile(r"(\d+)\s*([smhdw])")
+
+def parse_duration(duration: str) -> int:
+    """Parse a duration like "30m", "1h30m" or "2w 3d" into seconds
+
+    Raises ValueError for anything that isn't a sequence of <number><unit>.
+    """
+    text = duration.strip().lower()
+    parts = DURATION_PATTERN.findall(text)
+    if not parts or DURATION_PATTERN.sub("", text).strip():
+        raise ValueError(f"Invalid duration: {duration}")
+    seconds = sum(int(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+    if seconds <= 0:
+        raise ValueError(f"Duration must be positive: {duration}")
+    return seconds
+
 class TempRoleDB:
-    def __init__(self):
-        self.db_path = "database/temp_roles.db"
-        self.init_db()
-
-    def init_db(self):
-        """Initialize the database and create tables if they don't exist"""
-        os.makedirs("database", exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS temp_roles (
-                user_id INTEGER,
-                role_id INTEGER,
-                guild_id INTEGER,
-                start_time TIMESTAMP,
-                duration TEXT,
-                start_message TEXT,
-                end_message TEXT,
-                PRIMARY KEY (user_id, role_id, guild_id)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    def __init__(self, storage):
+        self.storage = storage
+        # The temp_roles table is created by the storage manager
+        self.storage.open()
 
     def add_temp_role(self, user_id: int, role_id: int, guild_id: int, start_time: datetime, 
                      duration: str, start_message: str, end_message: str):
         """Add a new temporary role assignment"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
+        self.storage.execute('''
             INSERT OR REPLACE INTO temp_roles 
             (user_id, role_id, guild_id, start_time, duration, start_message, end_message)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (user_id, role_id, guild_id, start_time.isoformat(), duration, start_message, end_message))
-        conn.commit()
-        conn.close()
+
+    def add_temp_roles(self, rows):
+        """Add many temporary role assignments in one transaction
+
+        rows are (user_id, role_id, guild_id, start_time, duration, start_message, end_message)
+        """
+        self.storage.executemany('''
+            INSERT OR REPLACE INTO temp_roles 
+            (user_id, role_id, guild_id, start_time, duration, start_message, end_message)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_id, role_id, guild_id, start_time.isoformat(), duration, start_message, end_message)
+              for user_id, role_id, guild_id, start_time, duration, start_message, end_message in rows])
+
+    def remove_temp_roles(self, keys):
+        """Remove many temporary role assignments given (user_id, role_id, guild_id) keys"""
+        self.storage.executemany('''
+            DELETE FROM temp_roles 
+            WHERE user_id = ? AND role_id = ? AND guild_id = ?
+        ''', list(keys))
 
     def remove_temp_role(self, user_id: int, role_id: int, guild_id: int):
         """Remove a temporary role assignment"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
+        self.storage.execute('''
             DELETE FROM temp_roles 
             WHERE user_id = ? AND role_id = ? AND guild_id = ?
         ''', (user_id, role_id, guild_id))
-        conn.commit()
-        conn.close()
 
     def get_temp_role(self, user_id: int, guild_id: int):
         """Get active temporary role for a user"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
+        return self.storage.execute('''
             SELECT role_id, start_time, duration, start_message, end_message
             FROM temp_roles
             WHERE user_id = ? AND guild_id = ?
-        ''', (user_id, guild_id))
-        result = c.fetchone()
-        conn.close()
-        return result
+        ''', (user_id, guild_id)).fetchone()
 
     def get_all_active_roles(self):
         """Get all active temporary roles"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('SELECT * FROM temp_roles')
-        results = c.fetchall()
-        conn.close()
-        return results
+        return self.storage.execute('SELECT * FROM temp_roles').fetchall()
 
 class ConfirmView(discord.ui.View):
     def __init__(self, timeout: float = 300):
@@ -98,41 +114,64 @@ class ConfirmView(discord.ui.View):
         self.stop()
 
 class TempRole(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, journal=None, storage=None, outbox=None, pipeline=None, role_index=None):
         self.bot = bot
-        self.db = TempRoleDB()
-        self.active_tasks = {}
-
-    async def send_role_dm(self, member: discord.Member, role: discord.Role, message: str, title: str, color: discord.Color):
-        """Helper function to send role-related DMs"""
-        try:
-            embed = discord.Embed(
-                title=title,
-                description=message,
-                color=color
-            )
-            embed.add_field(name="Role", value=role.mention, inline=True)
-            embed.add_field(name="Server", value=member.guild.name, inline=True)
-            await member.send(embed=embed)
-            return True
-        except discord.Forbidden:
-            logger.warning(f"Could not send DM to {member.name} - DMs are closed")
-            return False
-        except Exception as e:
-            logger.error(f"Error sending DM to {member.name}: {str(e)}")
-            return False
+        self.pipeline = pipeline
+        self.role_index = role_index
+        # The shared StorageManager owns the database's only writer connection
+        storage = storage or getattr(bot, 'storage', None)
+        if storage is None:
+            raise RuntimeError("TempRole needs the shared StorageManager; pass storage or set bot.storage")
+        self.storage = storage
+        self.db = TempRoleDB(storage)
+        # Expiry window number -> {(user_id, role_id, guild_id): (end_message, start_time)}
+        self.expiry_groups = {}
+        self.expiry_tasks = {}
+        # Grant tasks, kept referenced until they finish
+        self.active_tasks = set()
+        self.outbox = outbox or DMOutbox(bot, DMOutboxDB(storage))
+        self.journal = journal
+        if journal:
+            journal.register('temp_expire', self.replay_expiry)
+
+    async def cog_load(self):
+        self.outbox.start()
+
+    async def cog_unload(self):
+        for task in self.active_tasks:
+            task.cancel()
+        await self.outbox.stop()
+
+    def spawn(self, coro, description: str):
+        """Run a grant in the background, holding a reference and logging its failure"""
+        task = asyncio.create_task(coro)
+        self.active_tasks.add(task)
+
+        def finished(task):
+            self.active_tasks.discard(task)
+            if not task.cancelled() and task.exception():
+                logger.error(f"Background task failed ({description}): {str(task.exception())}")
+
+        task.add_done_callback(finished)
+        return task
+
+    def send_role_dm(self, member: discord.Member, role: discord.Role, message: str, title: str,
+                     color: discord.Color, dedupe_key: str, fields=()):
+        """Queue a role-related DM in the outbox; returns False if it was already queued"""
+        embed = discord.Embed(
+            title=title,
+            description=message,
+            color=color
+        )
+        embed.add_field(name="Role", value=role.mention, inline=True)
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=True)
+        embed.add_field(name="Server", value=member.guild.name, inline=True)
+        return self.outbox.enqueue(member.id, embed, dedupe_key)
 
     def get_remaining_seconds(self, start_time: datetime, duration: str) -> int:
         """Calculate remaining seconds for a temporary role"""
-        duration_map = {
-            "5m": 300,
-            "30m": 1800,
-            "1h": 3600,
-            "6h": 21600,
-            "1d": 86400,
-            "7d": 604800
-        }
-        total_seconds = duration_map[duration]
+        total_seconds = parse_duration(duration)
         elapsed_seconds = (datetime.now() - start_time).total_seconds()
         remaining_seconds = total_seconds - elapsed_seconds
         return max(0, int(remaining_seconds))
@@ -140,60 +179,109 @@ class TempRole(commands.Cog):
     async def handle_temp_role(self, member: discord.Member, role: discord.Role, 
                              start_time: datetime, duration: str, 
                              start_message: str, end_message: str):
-        """Handle the temporary role assignment and removal"""
+        """Assign a temporary role and schedule its removal"""
         try:
             # Add role
             await member.add_roles(role)
             
-            # Send start message
-            try:
-                embed = discord.Embed(
-                    title="Role Assigned",
-                    description=start_message,
-                    color=role.color
-                )
-                embed.add_field(name="Role", value=role.mention, inline=True)
-                embed.add_field(name="Duration", value=duration, inline=True)
-                embed.add_field(name="Server", value=member.guild.name, inline=True)
-                await member.send(embed=embed)
-            except discord.Forbidden:
-                logger.warning(f"Could not send DM to {member.name} - DMs are closed")
-            except Exception as e:
-                logger.error(f"Error sending DM to {member.name}: {str(e)}")
+            # Send start message (once per assignment, even if the role is re-applied)
+            self.send_role_dm(
+                member, role, start_message, "Role Assigned", role.color,
+                dedupe_key=f"temp-start:{member.guild.id}:{member.id}:{role.id}:{start_time.isoformat()}",
+                fields=[("Duration", duration)]
+            )
 
-            # Calculate remaining time
-            remaining_seconds = self.get_remaining_seconds(start_time, duration)
-            
-            # Wait for remaining time
-            await asyncio.sleep(remaining_seconds)
+            self.schedule_expiry(member.id, role.id, member.guild.id,
+                                 self.get_remaining_seconds(start_time, duration), end_message, start_time)
+
+        except Exception as e:
+            logger.error(f"Error handling temp role for {member.name}: {str(e)}")
+            raise
+
+    def schedule_expiry(self, user_id: int, role_id: int, guild_id: int,
+                        remaining_seconds: int, end_message: str, start_time: datetime):
+        """Queue a role removal into the expiry window it falls in"""
+        window = math.ceil((time.time() + remaining_seconds) / EXPIRY_WINDOW)
+        self.expiry_groups.setdefault(window, {})[(user_id, role_id, guild_id)] = (end_message, start_time)
+        if window not in self.expiry_tasks:
+            self.expiry_tasks[window] = asyncio.create_task(self.expire_window(window))
+
+    async def expire_window(self, window: int):
+        """Remove every temporary role due in one expiry window as a paced batch"""
+        await asyncio.sleep(max(0, window * EXPIRY_WINDOW - time.time()))
+        entries = self.expiry_groups.pop(window, {})
+        self.expiry_tasks.pop(window, None)
+
+        # Journal every removal in the window with one commit before touching the API
+        journal_ids = {}
+        if self.journal and entries:
+            keys = list(entries)
+            entry_ids = await self.journal.begin_many('temp_expire', [
+                (guild_id, user_id, {
+                    'role_id': role_id,
+                    'end_message': entries[(user_id, role_id, guild_id)][0],
+                    'start_time': entries[(user_id, role_id, guild_id)][1].isoformat()
+                })
+                for user_id, role_id, guild_id in keys
+            ])
+            journal_ids = dict(zip(keys, entry_ids))
+
+        done = []
+        for (user_id, role_id, guild_id), (end_message, start_time) in entries.items():
+            guild = self.bot.get_guild(guild_id)
+            role = guild.get_role(role_id) if guild else None
+            if not role:
+                done.append((user_id, role_id, guild_id))
+                continue
 
-            # Remove role
-            await member.remove_roles(role)
-            
-            # Send end message
             try:
-                embed = discord.Embed(
-                    title="Role Removed",
-                    description=end_message,
-                    color=discord.Color.red()
+                member = await resolve_member(guild, user_id)
+                if not member:
+                    # Kept in the database; on_member_join expires it if they come back
+                    continue
+                await member.remove_roles(role)
+                self.send_role_dm(
+                    member, role, end_message, "Role Removed", discord.Color.red(),
+                    dedupe_key=f"temp-end:{guild_id}:{user_id}:{role_id}:{start_time.isoformat()}"
                 )
-                embed.add_field(name="Role", value=role.mention, inline=True)
-                embed.add_field(name="Server", value=member.guild.name, inline=True)
-                await member.send(embed=embed)
-            except discord.Forbidden:
-                logger.warning(f"Could not send DM to {member.name} - DMs are closed")
+                done.append((user_id, role_id, guild_id))
             except Exception as e:
-                logger.error(f"Error sending DM to {member.name}: {str(e)}")
-
-            # Remove from database
-            self.db.remove_temp_role(member.id, role.id, member.guild.id)
+                # Left in the database and retried on the next start; the rest of the window carries on
+                logger.error(f"Error removing temp role {role_id} from {user_id}: {str(e)}")
+            await asyncio.sleep(ROLE_EDIT_DELAY)
+
+        # The rows and the journal entries protecting them go in one commit
+        with self.storage.transaction():
+            if done:
+                self.db.remove_temp_roles(done)
+            if journal_ids:
+                self.journal.complete(*journal_ids.values())
+        if done:
+            logger.info(f"Expired {len(done)} temporary role(s)")
+
+    async def replay_expiry(self, guild_id, user_id, payload):
+        """Finish an interrupted expiry; safe to run after the role is already gone"""
+        guild = self.bot.get_guild(guild_id)
+        role = guild.get_role(payload['role_id']) if guild else None
+        member = await resolve_member(guild, user_id) if guild else None
+        if not member:
+            # Left the server; on_member_join expires the stored role if they come back
+            return
 
-        except Exception as e:
-            logger.error(f"Error handling temp role for {member.name}: {str(e)}")
-            raise
+        if role:
+            if role in member.roles:
+                await member.remove_roles(role)
+            self.send_role_dm(
+                member, role, payload['end_message'], "Role Removed", discord.Color.red(),
+                dedupe_key=f"temp-end:{guild_id}:{user_id}:{role.id}:{payload['start_time']}"
+            )
+        self.db.remove_temp_role(user_id, payload['role_id'], guild_id)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
+        await run_ordered(self.pipeline, member.guild.id, member.id, self.restore_temp_role, member)
+
+    async def restore_temp_role(self, member: discord.Member):
         """Handle member join events to restore temporary roles"""
         temp_role = self.db.get_temp_role(member.id, member.guild.id)
         if temp_role:
@@ -201,14 +289,18 @@ class TempRole(commands.Cog):
             role = member.guild.get_role(role_id)
             if role:
                 start_time = datetime.fromisoformat(start_time)
-                # Start new task for remaining time
-                task = asyncio.create_task(
+                if self.get_remaining_seconds(start_time, duration) == 0:
+                    # Expired while they were away
+                    self.db.remove_temp_role(member.id, role_id, member.guild.id)
+                    return
+                # Re-assign the role for the remaining time
+                self.spawn(
                     self.handle_temp_role(
                         member, role, start_time, duration,
                         start_message, end_message
-                    )
+                    ),
+                    f"restore temp role {role.id} for {member.id}"
                 )
-                self.active_tasks[(member.id, role_id, member.guild.id)] = task
 
     @app_commands.command(
         name="temp",
@@ -247,7 +339,7 @@ class TempRole(commands.Cog):
             await interaction.response.send_message("I can't assign this role because it's higher than or equal to my highest role!", ephemeral=True)
             return
 
-        if not interaction.user.guild_permissions.manage_roles:
+        if not await has_manage_roles(interaction):
             await interaction.response.send_message("You don't have permission to manage roles!", ephemeral=True)
             return
 
@@ -291,13 +383,13 @@ class TempRole(commands.Cog):
             )
 
             # Start the role management task
-            task = asyncio.create_task(
+            self.spawn(
                 self.handle_temp_role(
                     member, role, start_time, duration,
                     start_message, end_message
-                )
+                ),
+                f"grant temp role {role.id} to {member.id}"
             )
-            self.active_tasks[(member.id, role.id, member.guild.id)] = task
 
             # Send confirmation
             await interaction.followup.send(
@@ -309,6 +401,169 @@ class TempRole(commands.Cog):
             await interaction.followup.send(f"An error occurred: {str(e)}", ephemeral=True)
             logger.error(f"Error in temp role command: {str(e)}")
 
+    @app_commands.command(
+        name="tempbulk",
+        description="Give a temporary role to many users at once"
+    )
+    @app_commands.describe(
+        role="The role to give",
+        duration="How long to give the role for, e.g. 90m, 1h30m, 2d, 1w",
+        start_message="Message to send to the users when the role is given",
+        end_message="Message to send to the users when the role is removed",
+        members="Users to give the role to, as mentions or IDs separated by spaces",
+        has_role="Also give the role to every member who has this role"
+    )
+    async def temp_role_bulk(
+        self,
+        interaction: discord.Interaction,
+        role: discord.Role,
+        duration: str,
+        start_message: str,
+        end_message: str,
+        members: Optional[str] = None,
+        has_role: Optional[discord.Role] = None
+    ):
+        # Permission checks
+        if not interaction.guild.me.guild_permissions.manage_roles:
+            await interaction.response.send_message("I don't have permission to manage roles!", ephemeral=True)
+            return
+
+        if role.position >= interaction.guild.me.top_role.position:
+            await interaction.response.send_message("I can't assign this role because it's higher than or equal to my highest role!", ephemeral=True)
+            return
+
+        if not await has_manage_roles(interaction):
+            await interaction.response.send_message("You don't have permission to manage roles!", ephemeral=True)
+            return
+
+        if role.position >= interaction.user.top_role.position:
+            await interaction.response.send_message("You can't assign this role because it's higher than or equal to your highest role!", ephemeral=True)
+            return
+
+        try:
+            parse_duration(duration)
+        except ValueError:
+            await interaction.response.send_message("Invalid duration! Use values like 30m, 1h30m, 2d or 1w.", ephemeral=True)
+            return
+
+        # Collect target ids from the member list and the role filter. Members are
+        # resolved while granting, so this works without the member cache too.
+        targets = {int(user_id) for user_id in re.findall(r"\d{15,20}", members or "")}
+        if has_role:
+            index = self.role_index.get(interaction.guild.id) if self.role_index else None
+            if index is not None:
+                targets.update(index.query(all_of=[has_role.id], present=True)[1])
+            elif interaction.guild.chunked:
+                targets.update(member.id for member in has_role.members)
+            else:
+                await interaction.response.send_message("❌ The role index is still being built, try again shortly.", ephemeral=True)
+                return
+
+        if not targets:
+            await interaction.response.send_message("No members matched!", ephemeral=True)
+            return
+
+        # Create confirmation embed
+        confirm_embed = discord.Embed(
+            title="Confirm Bulk Temporary Role",
+            description="Please confirm the following temporary role assignment:",
+            color=role.color
+        )
+        confirm_embed.add_field(name="Members", value=str(len(targets)), inline=True)
+        confirm_embed.add_field(name="Role", value=role.mention, inline=True)
+        confirm_embed.add_field(name="Duration", value=duration, inline=True)
+        confirm_embed.add_field(name="Start Message", value=start_message, inline=False)
+        confirm_embed.add_field(name="End Message", value=end_message, inline=False)
+        confirm_embed.set_footer(text="Click Confirm to proceed or Cancel to abort")
+
+        # Show confirmation buttons
+        view = ConfirmView()
+        await interaction.response.send_message(embed=confirm_embed, view=view, ephemeral=True)
+
+        # Wait for user confirmation
+        await view.wait()
+
+        if view.value is None:
+            await interaction.followup.send("Operation timed out.", ephemeral=True)
+            return
+        elif not view.value:
+            await interaction.followup.send("Operation cancelled.", ephemeral=True)
+            return
+
+        try:
+            # Store every assignment in one transaction
+            start_time = datetime.now()
+            self.db.add_temp_roles([
+                (user_id, role.id, interaction.guild.id, start_time, duration, start_message, end_message)
+                for user_id in targets
+            ])
+
+            self.spawn(
+                self.grant_bulk(interaction.guild, sorted(targets), role, start_time, duration, start_message, end_message),
+                f"bulk grant of temp role {role.id}"
+            )
+
+            await interaction.followup.send(
+                f"✅ Giving {role.mention} to {len(targets)} members for {duration}",
+                ephemeral=True
+            )
+
+        except Exception as e:
+            await interaction.followup.send(f"An error occurred: {str(e)}", ephemeral=True)
+            logger.error(f"Error in bulk temp role command: {str(e)}")
+
+    async def grant_bulk(self, guild: discord.Guild, user_ids, role: discord.Role, start_time: datetime,
+                         duration: str, start_message: str, end_message: str):
+        """Assign a temporary role to many members, pacing the role edits
+
+        Ids that turn out not to be members, or to be bots, have their
+        stored assignment removed again.
+        """
+        granted = 0
+        failed = 0
+        skipped = []
+        for user_id in user_ids:
+            try:
+                member = await resolve_member(guild, user_id)
+            except discord.HTTPException as e:
+                logger.error(f"Error looking up {user_id} for temp role {role.id}: {str(e)}")
+                member = None
+            if member is None or member.bot:
+                skipped.append((user_id, role.id, guild.id))
+                continue
+            try:
+                await self.handle_temp_role(member, role, start_time, duration, start_message, end_message)
+                granted += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Bulk grant of temp role {role.id} failed for {user_id}: {str(e)}")
+            await asyncio.sleep(ROLE_EDIT_DELAY)
+        if skipped:
+            self.db.remove_temp_roles(skipped)
+        logger.info(
+            f"Granted temporary role {role.id} to {granted}/{len(user_ids)} members for {duration} "
+            f"({failed} failed, {len(skipped)} not members)"
+        )
+
+    @app_commands.command(
+        name="dmqueue",
+        description="Show the temporary role DM queue"
+    )
+    async def dm_queue(self, interaction: discord.Interaction):
+        if not await is_admin(interaction):
+            await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+            return
+
+        stats = self.outbox.stats()
+        embed = discord.Embed(title="DM Queue", color=discord.Color.blue())
+        embed.add_field(name="Queued", value=str(stats['queued']), inline=True)
+        embed.add_field(name="Waiting to retry", value=str(stats['retrying']), inline=True)
+        embed.add_field(name="Sent", value=str(stats['sent']), inline=True)
+        embed.add_field(name="Dropped", value=str(stats['dropped']), inline=True)
+        embed.add_field(name="Latency (avg / p95)",
+                        value=f"{stats['latency_avg']:.1f}s / {stats['latency_p95']:.1f}s", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @commands.Cog.listener()
     async def on_ready(self):
         """Restore all active temporary roles on bot startup"""
@@ -317,19 +572,17 @@ class TempRole(commands.Cog):
             user_id, role_id, guild_id, start_time, duration, start_message, end_message = role_data
             guild = self.bot.get_guild(guild_id)
             if guild:
-                member = guild.get_member(user_id)
+                try:
+                    member = await resolve_member(guild, user_id)
+                except discord.HTTPException as e:
+                    logger.error(f"Error looking up {user_id} to restore temp role {role_id}: {str(e)}")
+                    continue
                 role = guild.get_role(role_id)
                 if member and role:
                     start_time = datetime.fromisoformat(start_time)
-                    # Only restore if time hasn't expired
-                    if self.get_remaining_seconds(start_time, duration) > 0:
-                        task = asyncio.create_task(
-                            self.handle_temp_role(
-                                member, role, start_time, duration,
-                                start_message, end_message
-                            )
-                        )
-                        self.active_tasks[(user_id, role_id, guild_id)] = task
+                    # Roles that expired while the bot was offline go into the first window
+                    self.schedule_expiry(user_id, role_id, guild_id,
+                                         self.get_remaining_seconds(start_time, duration), end_message, start_time)
 
 async def setup(bot):
-    await bot.add_cog(TempRole(bot)) 
\ No newline at end of file
+    await bot.add_cog(TempRole(bot))
\ No newline at end of file
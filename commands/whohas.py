@@ -0,0 +1,220 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import logging
+import time
+import traceback
+from typing import Optional
+from utils.permission_checks import is_admin
+
+logger = logging.getLogger('bot.commands')
+
+PAGE_SIZE = 25
+ROLESTATS_LIMIT = 25
+
+class RoleIndexCog(commands.Cog):
+    """Keeps the role index in sync with member events and answers /whohas and /rolestats"""
+
+    def __init__(self, bot, role_index, checkpoints=None):
+        self.bot = bot
+        self.role_index = role_index
+        self.checkpoints = checkpoints
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Build the role index for every guild"""
+        for guild in self.bot.guilds:
+            try:
+                await self.role_index.build(guild)
+            except Exception as e:
+                logger.error(f"Failed to build role index for {guild.name}: {str(e)}\n{traceback.format_exc()}")
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if not member.bot:
+            self.role_index.update_member(member, present=True)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if not after.bot:
+            self.role_index.update_member(after, present=True)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        if not member.bot:
+            self.role_index.update_member(member, present=False)
+
+    # Only dispatched when the member cache is disabled (RAW_MEMBER_EVENTS)
+    @commands.Cog.listener()
+    async def on_raw_member_update(self, data):
+        if not data['user'].get('bot'):
+            self.role_index.update_raw(int(data['guild_id']), int(data['user']['id']), data.get('roles', []))
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        if not payload.user.bot:
+            self.role_index.set_present(payload.guild_id, payload.user.id, False)
+
+    @app_commands.command(
+        name="whohas",
+        description="List stored members by role, including members who left"
+    )
+    @app_commands.describe(
+        role="Members must have this role",
+        also_has="Members must also have this role",
+        without="Members must not have this role",
+        scope="Which stored members to include"
+    )
+    @app_commands.choices(scope=[
+        app_commands.Choice(name="In the server", value="present"),
+        app_commands.Choice(name="Left the server", value="left"),
+        app_commands.Choice(name="All stored members", value="all"),
+    ])
+    @app_commands.check(is_admin)
+    async def whohas(
+        self,
+        interaction: discord.Interaction,
+        role: discord.Role,
+        also_has: Optional[discord.Role] = None,
+        without: Optional[discord.Role] = None,
+        scope: str = "all"
+    ):
+        """Show a paginated list of stored members matching a role query"""
+        index = self.role_index.get(interaction.guild.id)
+        if index is None:
+            await interaction.response.send_message("❌ The role index is still being built, try again shortly.", ephemeral=True)
+            return
+
+        query = {
+            'all_of': [role.id] + ([also_has.id] if also_has else []),
+            'none_of': [without.id] if without else [],
+            'present': {'present': True, 'left': False}.get(scope),
+        }
+
+        description = role.mention
+        if also_has:
+            description += f" and {also_has.mention}"
+        if without:
+            description += f" without {without.mention}"
+
+        view = WhoHasView(index, query, description)
+        await interaction.response.send_message(embed=view.render(), view=view, ephemeral=True)
+        logger.info(f"/whohas by {interaction.user} ({interaction.user.id}): {view.total} matches")
+
+    @app_commands.command(
+        name="rolestats",
+        description="Show how many stored members hold each role and how that changed"
+    )
+    @app_commands.describe(
+        role="Only show this role",
+        days="Compare with the counts from this many days ago"
+    )
+    @app_commands.check(is_admin)
+    async def rolestats(
+        self,
+        interaction: discord.Interaction,
+        role: Optional[discord.Role] = None,
+        days: app_commands.Range[int, 1, 90] = 7
+    ):
+        """Answer from the role index counters and the saved checkpoints, without scanning members"""
+        counts = self.role_index.role_counts(interaction.guild.id)
+        if counts is None:
+            await interaction.response.send_message("❌ The role index is still being built, try again shortly.", ephemeral=True)
+            return
+
+        previous, taken_at = {}, None
+        if self.checkpoints:
+            previous, taken_at = await self.checkpoints.counts_at(interaction.guild.id, time.time() - days * 86400)
+
+        if role:
+            roles = [role]
+        else:
+            roles = sorted(
+                (r for r in interaction.guild.roles if not r.is_default()),
+                key=lambda r: counts.get(r.id, 0),
+                reverse=True
+            )[:ROLESTATS_LIMIT]
+
+        lines = []
+        for r in roles:
+            line = f"{r.mention}: {counts.get(r.id, 0)}"
+            if taken_at is not None:
+                line += f" ({counts.get(r.id, 0) - previous.get(r.id, 0):+d})"
+            lines.append(line)
+
+        embed = discord.Embed(
+            title="Stored members per role",
+            description="\n".join(lines) or "No roles",
+            color=discord.Color.blue()
+        )
+        if taken_at is not None:
+            embed.set_footer(text=f"Change since the checkpoint of {time.strftime('%Y-%m-%d %H:%M', time.gmtime(taken_at))} UTC")
+        else:
+            embed.set_footer(text=f"No checkpoint from {days} day(s) ago yet")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.errors.CheckFailure):
+            await interaction.response.send_message(
+                "❌ You don't have permission to use this command.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Command error: {str(error)}\n{traceback.format_exc()}")
+            if interaction.response.is_done():
+                await interaction.followup.send(f"❌ An error occurred: {str(error)}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❌ An error occurred: {str(error)}", ephemeral=True)
+
+
+# Paginated result list for /whohas
+class WhoHasView(discord.ui.View):
+    def __init__(self, index, query, description):
+        super().__init__(timeout=300.0)
+        self.index = index
+        self.query = query
+        self.description = description
+        self.page = 0
+        self.total = 0
+        self.user_ids = []
+        self.load()
+
+    @property
+    def page_count(self):
+        return max(1, (self.total + PAGE_SIZE - 1) // PAGE_SIZE)
+
+    def load(self):
+        """Re-run the query for the current page so results reflect recent events"""
+        self.total, self.user_ids = self.index.query(
+            offset=self.page * PAGE_SIZE, limit=PAGE_SIZE, **self.query
+        )
+        if self.page >= self.page_count:
+            # Matches shrank since the last page was shown
+            self.page = self.page_count - 1
+            self.total, self.user_ids = self.index.query(
+                offset=self.page * PAGE_SIZE, limit=PAGE_SIZE, **self.query
+            )
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page >= self.page_count - 1
+
+    def render(self):
+        embed = discord.Embed(
+            title=f"{self.total} stored member(s) match",
+            description="\n".join(f"<@{user_id}> ({user_id})" for user_id in self.user_ids) or "None",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Query", value=self.description, inline=False)
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_count}")
+        return embed
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
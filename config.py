@@ -11,9 +11,66 @@ BOT_CONFIG = {
     
     # Database settings
     "db_path": os.getenv("DB_PATH", "database/discord_bot.db"),
+    "sqlite_cache_size_kb": int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384")),
+    "sqlite_mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))),
+    "sqlite_synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "sqlite_statement_cache": int(os.getenv("SQLITE_STATEMENT_CACHE", "256")),
+    # Read-only connections serving member lookups and exports from worker threads (0 reads on the writer)
+    "sqlite_read_pool_size": int(os.getenv("SQLITE_READ_POOL_SIZE", "4")),
+    # One-off full VACUUM at startup so an older database can use incremental vacuum (blocks startup)
+    "sqlite_convert_auto_vacuum": os.getenv("SQLITE_CONVERT_AUTO_VACUUM", "false").lower() == "true",
+    
+    # Delete snapshots of members who left more than this many days ago (0 keeps them forever)
+    "member_retention_days": int(os.getenv("MEMBER_RETENTION_DAYS", "0")),
+    "member_retention_interval": int(os.getenv("MEMBER_RETENTION_INTERVAL", "3600")),
+    # Keep who held a role when it is deleted and purged from stored members
+    "role_purge_history": os.getenv("ROLE_PURGE_HISTORY", "true").lower() == "true",
+    # Save per-role member counts this often (seconds) for /rolestats comparisons, keeping this many days
+    "role_stats_interval": int(os.getenv("ROLE_STATS_INTERVAL", "3600")),
+    "role_stats_keep_days": int(os.getenv("ROLE_STATS_KEEP_DAYS", "90")),
+    
+    # SQLite maintenance (seconds)
+    "db_checkpoint_interval": int(os.getenv("DB_CHECKPOINT_INTERVAL", "60")),
+    "db_optimize_interval": int(os.getenv("DB_OPTIMIZE_INTERVAL", "3600")),
+    "db_idle_seconds": int(os.getenv("DB_IDLE_SECONDS", "30")),
+    "db_vacuum_pages": int(os.getenv("DB_VACUUM_PAGES", "256")),
+    
+    # Hot backups of database/*.db
+    "backup_enabled": os.getenv("BACKUP_ENABLED", "true").lower() == "true",
+    "backup_dir": os.getenv("BACKUP_DIR", "backups"),
+    "backup_interval_hours": float(os.getenv("BACKUP_INTERVAL_HOURS", "6")),
+    "backup_keep": int(os.getenv("BACKUP_KEEP", "10")),
+    "backup_max_age_days": int(os.getenv("BACKUP_MAX_AGE_DAYS", "14")),
+    
+    # Storage backend: "sqlite" (local file) or "http" (REST service in service/)
+    "storage_backend": os.getenv("STORAGE_BACKEND", "sqlite"),
+    "service_url": os.getenv("SERVICE_URL", "http://localhost:3000"),
+    "service_api_key": os.getenv("SERVICE_API_KEY"),
+    "service_timeout": float(os.getenv("SERVICE_TIMEOUT", "10")),
+    "service_batch_size": int(os.getenv("SERVICE_BATCH_SIZE", "500")),
+    "service_flush_interval": float(os.getenv("SERVICE_FLUSH_INTERVAL", "0.5")),
+    "service_max_in_flight": int(os.getenv("SERVICE_MAX_IN_FLIGHT", "4")),
+    "service_pool_size": int(os.getenv("SERVICE_POOL_SIZE", "8")),
+    # Longest pause between retries of rejected batches, and how long shutdown keeps retrying
+    "service_max_backoff": float(os.getenv("SERVICE_MAX_BACKOFF", "60")),
+    "service_close_timeout": float(os.getenv("SERVICE_CLOSE_TIMEOUT", "30")),
+    # With SQLite storage, also copy member changes to the service through an outbox
+    "replicate_to_service": os.getenv("REPLICATE_TO_SERVICE", "false").lower() == "true",
+    "replication_interval": float(os.getenv("REPLICATION_INTERVAL", "1")),
     
     # Feature flags
     "auto_restore": os.getenv("AUTO_RESTORE", "true").lower() == "true",
+    # Disable the member cache and store member updates straight from gateway payloads
+    "raw_member_events": os.getenv("RAW_MEMBER_EVENTS", "false").lower() == "true",
+    # Ordered worker queues for member event handlers (0 runs each event as its own task)
+    "event_pipeline_partitions": int(os.getenv("EVENT_PIPELINE_PARTITIONS", "8")),
+    "event_pipeline_queue_size": int(os.getenv("EVENT_PIPELINE_QUEUE_SIZE", "1000")),
+    
+    # Append received member events to this gzip file for replay (empty disables recording)
+    "record_events_path": os.getenv("RECORD_EVENTS_PATH", ""),
+    
+    # Log event loop stalls longer than this many seconds (0 disables the monitor)
+    "loop_stall_threshold": float(os.getenv("LOOP_STALL_THRESHOLD", "0.25")),
     
     # Permissions
     "admin_role_id": os.getenv("ADMIN_ROLE_ID"),
@@ -24,6 +81,9 @@ BOT_CONFIG = {
     
     # Bot behavior
     "command_prefix": os.getenv("COMMAND_PREFIX", "!"),
+    
+    # Seconds between role edits made by /bulkrole jobs
+    "bulk_role_delay": float(os.getenv("BULK_ROLE_DELAY", "1.0")),
 }
 
 # Validate required configuration
@@ -0,0 +1,87 @@
+import logging
+
+logger = logging.getLogger('bot.database')
+
+class StorageBackend:
+    """Interface shared by every member data store used by the bot
+
+    Reads return database.snapshot.MemberSnapshot objects; writes take
+    role ids as any iterable of ints.
+    """
+
+    async def connect(self):
+        """Open the store and make sure it is ready for use"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Flush pending work and release the store"""
+        raise NotImplementedError
+
+    async def update_member(self, user_id, roles, nickname=None, left=False):
+        """Update or insert member data; left=True when the snapshot is taken on leave"""
+        raise NotImplementedError
+
+    async def get_member(self, user_id):
+        """Get member data, or None if nothing is stored"""
+        raise NotImplementedError
+
+    async def delete_member(self, user_id):
+        """Delete member data, returning True if something was deleted"""
+        raise NotImplementedError
+
+    async def clear_database(self):
+        """Delete all member data, returning the number of records removed"""
+        raise NotImplementedError
+
+    async def get_all_members(self):
+        """Get all stored members"""
+        raise NotImplementedError
+
+    async def purge_role(self, guild_id, role_id, role_name, record_history=False):
+        """Remove a deleted role from every stored member; returns the affected user ids
+
+        record_history keeps who held the role.
+        """
+        raise NotImplementedError
+
+def create_storage_manager(config):
+    """Build the shared SQLite storage manager from BOT_CONFIG"""
+    from database.storage import StorageManager
+    return StorageManager(
+        db_path=config.get("db_path") or 'database/discord_bot.db',
+        cache_size_kb=config.get("sqlite_cache_size_kb", 16384),
+        mmap_size=config.get("sqlite_mmap_size", 64 * 1024 * 1024),
+        synchronous=config.get("sqlite_synchronous", "NORMAL"),
+        statement_cache_size=config.get("sqlite_statement_cache", 256),
+        read_pool_size=config.get("sqlite_read_pool_size", 4),
+        replicate=config.get("replicate_to_service", False),
+        convert_auto_vacuum=config.get("sqlite_convert_auto_vacuum", False),
+    )
+
+def create_storage_backend(config, storage=None):
+    """Build the member store selected by BOT_CONFIG['storage_backend']
+
+    The SQLite backend keeps members in the shared storage manager's
+    database, so pass the manager the rest of the bot uses.
+    """
+    backend = (config.get("storage_backend") or "sqlite").lower()
+
+    if backend == "sqlite":
+        from database.db_handler import DatabaseHandler
+        return DatabaseHandler(storage or create_storage_manager(config))
+
+    if backend == "http":
+        from database.http_backend import HttpBackend
+        return HttpBackend(
+            base_url=config["service_url"],
+            api_key=config.get("service_api_key"),
+            timeout=config.get("service_timeout", 10.0),
+            batch_size=config.get("service_batch_size", 500),
+            flush_interval=config.get("service_flush_interval", 0.5),
+            max_in_flight=config.get("service_max_in_flight", 4),
+            pool_size=config.get("service_pool_size", 8),
+            max_backoff=config.get("service_max_backoff", 60.0),
+            close_timeout=config.get("service_close_timeout", 30.0),
+        )
+
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,150 @@
+import asyncio
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger('bot.database')
+
+def backup_database(source_path, target_path):
+    """Copy a live SQLite database with VACUUM INTO
+
+    The copy is written from a single read transaction on its own
+    read-only connection. In WAL mode that is a consistent snapshot which
+    writers never block and which their commits don't restart, unlike
+    the online backup API from a second connection. Blocking; run it in a
+    thread. target_path must not exist yet.
+    """
+    source = sqlite3.connect(f"{Path(source_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        source.execute('VACUUM INTO ?', (str(target_path),))
+    finally:
+        source.close()
+
+def check_integrity(path):
+    """Return True if SQLite's integrity check passes for a database file"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    finally:
+        conn.close()
+
+def compress_file(source_path, target_path):
+    with open(source_path, 'rb') as source, gzip.open(target_path, 'wb', compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+def restore_backup(backup_path, target_path):
+    """Restore a compressed backup over a database file
+
+    The backup is decompressed and integrity-checked next to the target
+    first, then swapped in with an atomic rename. Stop the bot before
+    restoring; open connections would keep using the old file.
+    """
+    temp_path = f"{target_path}.restore"
+    with gzip.open(backup_path, 'rb') as source, open(temp_path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+    if not check_integrity(temp_path):
+        os.remove(temp_path)
+        raise ValueError(f"Backup {backup_path} failed the integrity check")
+
+    # Leftover WAL/SHM files belong to the old database and must not be applied to the restored one
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target_path + suffix):
+            os.remove(target_path + suffix)
+    os.replace(temp_path, target_path)
+    logger.warning(f"Restored {target_path} from {backup_path}")
+
+class BackupScheduler:
+    """Takes periodic hot backups of the bot's SQLite databases
+
+    Each database is copied from a snapshot (see backup_database) on a
+    worker thread, so neither the event loop nor writers stall. The copy
+    is integrity-checked, gzip-compressed and rotated by count and age.
+    """
+
+    def __init__(self, databases='database/*.db', backup_dir='backups', interval_hours=6,
+                 keep=10, max_age_days=14):
+        self.databases = databases
+        self.backup_dir = Path(backup_dir)
+        self.interval = interval_hours * 3600
+        self.keep = keep
+        self.max_age = timedelta(days=max_age_days)
+        self.task = None
+
+    def start(self):
+        """Start the backup loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the backup loop"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.backup_all()
+
+    async def backup_all(self):
+        """Back up every database now; returns the paths of the new backups"""
+        created = []
+        for path in sorted(glob.glob(self.databases)):
+            try:
+                created.append(await asyncio.to_thread(self._backup_one, path))
+            except Exception as e:
+                logger.error(f"Backup of {path} failed: {str(e)}\n{traceback.format_exc()}")
+        return created
+
+    def _backup_one(self, path):
+        started = time.monotonic()
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        name = Path(path).stem
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        temp_path = self.backup_dir / f"{name}-{stamp}.db.tmp"
+        final_path = self.backup_dir / f"{name}-{stamp}.db.gz"
+
+        try:
+            backup_database(path, str(temp_path))
+            if not check_integrity(str(temp_path)):
+                raise ValueError("backup copy failed the integrity check")
+            compress_file(str(temp_path), str(final_path))
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+        self._rotate(name)
+        logger.info(
+            f"Backed up {path} to {final_path} ({final_path.stat().st_size / 1048576:.1f} MB) "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        return str(final_path)
+
+    def _rotate(self, name):
+        """Keep the newest `keep` backups of a database and drop any older than max_age"""
+        backups = sorted(self.backup_dir.glob(f"{name}-*.db.gz"), reverse=True)
+        cutoff = time.time() - self.max_age.total_seconds()
+        for index, backup in enumerate(backups):
+            if index >= self.keep or backup.stat().st_mtime < cutoff:
+                backup.unlink()
+
+if __name__ == "__main__":
+    # python -m database.backup restore backups/discord_bot-20240101-000000.db.gz database/discord_bot.db
+    if len(sys.argv) != 4 or sys.argv[1] != "restore":
+        print("Usage: python -m database.backup restore <backup.db.gz> <database.db>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    restore_backup(sys.argv[2], sys.argv[3])
@@ -1,41 +1,31 @@
-import os
-import sqlite3
-import logging
 import asyncio
-from pathlib import Path
+import logging
+from array import array
+from database.backend import StorageBackend
+from database.role_sets import RoleSetStore
+from database.snapshot import MemberSnapshot
 
 logger = logging.getLogger('bot.database')
 
-class DatabaseHandler:
+class DatabaseHandler(StorageBackend):
     """Handles all database operations for the Discord bot using SQLite"""
     
-    def __init__(self):
-        """Initialize database connection"""
+    def __init__(self, storage):
+        """Initialize database handler on top of the shared storage manager"""
+        self.storage = storage
+        self.db_path = storage.db_path
         self.conn = None
-        self.cursor = None
-        self.db_path = 'database/discord_bot.db'
+        self.role_sets = RoleSetStore(storage)
+        
+    @property
+    def last_write(self):
+        return self.storage.last_write
         
     async def connect(self):
         """Connect to SQLite database"""
         try:
-            # Ensure database directory exists
-            Path('database').mkdir(exist_ok=True)
-            
-            # Connect to SQLite database
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
-            
-            # Create tables if they don't exist
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS members (
-                    user_id TEXT PRIMARY KEY,
-                    roles TEXT,
-                    nickname TEXT,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            self.conn.commit()
+            self.storage.open()
+            self.conn = self.storage.conn
             logger.info("Connected to SQLite database successfully!")
             return True
             
@@ -45,22 +35,28 @@ class DatabaseHandler:
     
     async def close(self):
         """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            logger.info("SQLite database connection closed")
+        # The connection belongs to the storage manager, which is closed by its owner
+        self.conn = None
     
-    async def update_member(self, user_id, roles, nickname=None):
-        """Update or insert member data"""
+    async def update_member(self, user_id, roles, nickname=None, left=False):
+        """Update or insert member data
+
+        left=True marks a member who is not in the guild; an existing
+        departure time is kept so edits don't postpone retention.
+        """
         try:
-            # Convert roles list to string for storage
-            roles_str = ','.join(map(str, roles)) if roles else ''
-            
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO members (user_id, roles, nickname, last_updated)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (user_id, roles_str, nickname))
-            
-            self.conn.commit()
+            role_set_id = self.role_sets.intern(roles or ())
+            # A new set left unused by a failed write is removed by RoleSetStore.collect()
+            # An upsert rather than REPLACE, so the role set reference triggers see an update
+            self.storage.execute('''
+                INSERT INTO members (user_id, role_set_id, nickname, last_updated, left_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    role_set_id = excluded.role_set_id,
+                    nickname = excluded.nickname,
+                    last_updated = excluded.last_updated,
+                    left_at = CASE WHEN excluded.left_at IS NOT NULL THEN COALESCE(members.left_at, excluded.left_at) END
+            ''', (user_id, role_set_id, nickname, left))
             return True
             
         except Exception as e:
@@ -70,19 +66,13 @@ class DatabaseHandler:
     async def get_member(self, user_id):
         """Get member data from database"""
         try:
-            self.cursor.execute('SELECT * FROM members WHERE user_id = ?', (user_id,))
-            member_data = self.cursor.fetchone()
+            member_data = await self.storage.fetchone('''
+                SELECT user_id, roles, nickname, last_updated FROM members
+                LEFT JOIN role_sets USING (role_set_id)
+                WHERE user_id = ?
+            ''', (user_id,))
             
-            if member_data:
-                # Convert roles string back to list
-                roles = member_data[1].split(',') if member_data[1] else []
-                return {
-                    'user_id': member_data[0],
-                    'roles': roles,
-                    'nickname': member_data[2],
-                    'last_updated': member_data[3]
-                }
-            return None
+            return MemberSnapshot.from_row(member_data) if member_data else None
             
         except Exception as e:
             logger.error(f"Failed to get member data for user_id {user_id}: {str(e)}")
@@ -91,10 +81,9 @@ class DatabaseHandler:
     async def delete_member(self, user_id):
         """Delete member data from database"""
         try:
-            self.cursor.execute('DELETE FROM members WHERE user_id = ?', (user_id,))
-            self.conn.commit()
+            cursor = self.storage.execute('DELETE FROM members WHERE user_id = ?', (user_id,))
             
-            if self.cursor.rowcount > 0:
+            if cursor.rowcount > 0:
                 logger.info(f"Deleted member data for user_id {user_id}")
                 return True
             else:
@@ -108,9 +97,8 @@ class DatabaseHandler:
     async def clear_database(self):
         """Clear entire database - ADMIN ONLY"""
         try:
-            self.cursor.execute('DELETE FROM members')
-            self.conn.commit()
-            count = self.cursor.rowcount
+            count = self.storage.execute('DELETE FROM members').rowcount
+            self.role_sets.collect()
             logger.warning(f"Cleared database, removed {count} records")
             return count
             
@@ -119,18 +107,79 @@ class DatabaseHandler:
             return 0
             
     async def get_all_members(self):
-        """Get all members from database"""
+        """Get all members from database
+
+        Members with the same role set share one roles array.
+        """
         try:
-            self.cursor.execute('SELECT * FROM members')
-            members = self.cursor.fetchall()
-            
-            return [{
-                'user_id': member[0],
-                'roles': member[1].split(',') if member[1] else [],
-                'nickname': member[2],
-                'last_updated': member[3]
-            } for member in members]
-            
+            # Build the snapshots on the reader thread too, so large exports don't stall the loop
+            return await self.storage.read(self._read_all_members)
+
         except Exception as e:
             logger.error(f"Failed to get all members: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _read_all_members(conn):
+        role_sets = {
+            role_set_id: array('Q', map(int, roles.split(','))) if roles else array('Q')
+            for role_set_id, roles in conn.execute('SELECT role_set_id, roles FROM role_sets')
+        }
+        empty = array('Q')
+        return [
+            MemberSnapshot(user_id, role_sets.get(role_set_id, empty), nickname, last_updated)
+            for user_id, role_set_id, nickname, last_updated
+            in conn.execute('SELECT user_id, role_set_id, nickname, last_updated FROM members')
+        ]
+
+    async def purge_role(self, guild_id, role_id, role_name, record_history=False, chunk_size=1000):
+        """Remove a deleted role from every stored member; returns the affected user ids
+
+        Only the role sets containing the role are looked at. Their members
+        move to the set without it through the role_set_id index. Each
+        transaction moves at most chunk_size members, across as many sets
+        as that covers, with a yield to the loop between transactions.
+        """
+        # Roles are stored comma-joined; wrapping both sides in commas matches whole ids only
+        needle = f",{int(role_id)},"
+        affected = array('Q')
+        try:
+            sets = self.storage.execute(
+                "SELECT role_set_id, roles FROM role_sets WHERE refs > 0 AND instr(',' || roles || ',', ?)",
+                (needle,)
+            ).fetchall()
+            position = 0
+            while position < len(sets):
+                moved = 0
+                with self.storage.transaction():
+                    while position < len(sets) and moved < chunk_size:
+                        old_id, roles = sets[position]
+                        new_id = self.role_sets.intern(r for r in roles.split(',') if int(r) != int(role_id))
+                        limit = chunk_size - moved
+                        rows = self.storage.execute('''
+                            UPDATE members SET role_set_id = ?
+                            WHERE rowid IN (SELECT rowid FROM members WHERE role_set_id = ? LIMIT ?)
+                            RETURNING user_id
+                        ''', (new_id, old_id, limit)).fetchall()
+                        affected.extend(int(row[0]) for row in rows)
+                        moved += len(rows)
+                        if len(rows) < limit:
+                            position += 1
+                await asyncio.sleep(0)
+
+            if record_history and affected:
+                self.storage.execute(
+                    'INSERT INTO role_purges (guild_id, role_id, role_name, user_ids) VALUES (?, ?, ?, ?)',
+                    (guild_id, role_id, role_name, affected.tobytes())
+                )
+            logger.info(
+                f"Purged deleted role {role_name} ({role_id}) from {len(affected)} stored members "
+                f"in {len(sets)} role sets"
+            )
+            return affected
+
+        except Exception as e:
+            # A rolled back transaction may have dropped role sets the cache still maps
+            self.role_sets.ids.clear()
+            logger.error(f"Failed to purge role {role_id}: {str(e)}")
+            return affected
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import traceback
+import aiohttp
+from database.backend import StorageBackend
+from database.snapshot import MemberSnapshot
+
+logger = logging.getLogger('bot.database')
+
+class HttpBackend(StorageBackend):
+    """Stores member data through the REST service in service/
+
+    All requests share one pooled keep-alive session. Writes are buffered
+    per user (the latest snapshot wins) and shipped in batches through
+    POST /api/users/bulk, with several batches allowed in flight at once.
+    Reads check the buffer first so callers always see their own writes.
+
+    A batch the service doesn't accept goes back into the buffer, and
+    shipping pauses with exponential backoff, or for as long as the
+    service's Retry-After asks. close() keeps retrying for close_timeout
+    seconds before giving up on what is left.
+    """
+
+    def __init__(self, base_url, api_key=None, timeout=10.0, batch_size=500,
+                 flush_interval=0.5, max_in_flight=4, pool_size=8,
+                 max_backoff=60.0, close_timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool_size = pool_size
+        self.max_backoff = max_backoff
+        self.close_timeout = close_timeout
+        self.session = None
+
+        # user_id -> (roles, nickname) waiting to be shipped
+        self._pending = {}
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._flusher = None
+        self._batches = set()
+        # Loop time before which no batch is sent, and the next backoff to apply
+        self._retry_at = 0.0
+        self._backoff = flush_interval
+
+    def _url(self, path):
+        return f"{self.base_url}/api/users{path}"
+
+    async def connect(self):
+        """Open the pooled HTTP session and start the write flusher"""
+        headers = {'x-api-key': self.api_key} if self.api_key else {}
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=self.timeout
+        )
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"Using member storage service at {self.base_url}")
+        return True
+
+    async def close(self):
+        """Ship buffered writes, retrying for up to close_timeout, and close the HTTP session"""
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        if self.session:
+            deadline = asyncio.get_running_loop().time() + self.close_timeout
+            while not await self.flush(deadline=deadline):
+                if asyncio.get_running_loop().time() >= deadline:
+                    logger.error(
+                        f"Closing with {len(self._pending)} member updates the service did not accept; "
+                        f"they stay buffered until the backend is connected again"
+                    )
+                    break
+            await self.session.close()
+            self.session = None
+            logger.info("Member storage service session closed")
+
+    async def _flush_loop(self):
+        """Ship buffered writes whenever a batch fills up or the interval passes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=max(self._retry_at - loop.time(), self.flush_interval)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # A full buffer doesn't cut a backoff short
+            if self._pending and loop.time() >= self._retry_at:
+                self._start_batches()
+
+    def _start_batches(self):
+        """Move buffered writes into batch requests that run concurrently"""
+        while self._pending:
+            batch = {}
+            for user_id in list(self._pending)[:self.batch_size]:
+                batch[user_id] = self._pending.pop(user_id)
+            task = asyncio.create_task(self._send_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, batch):
+        """POST one batch to the bulk endpoint, requeueing it on failure"""
+        users = [{
+            'user_id': str(user_id),
+            'roles': [str(role_id) for role_id in roles],
+            'nickname': nickname
+        } for user_id, (roles, nickname) in batch.items()]
+
+        async with self._in_flight:
+            try:
+                async with self.session.post(self._url('/bulk'), json={'users': users}) as response:
+                    # Error bodies aren't always JSON, e.g. the rate limiter's plain text 429
+                    if response.status not in (200, 207):
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=(await response.text())[:200],
+                            headers=response.headers
+                        )
+                    body = await response.json(content_type=None)
+                for result in body.get('results', []):
+                    if not result.get('success'):
+                        logger.error(f"Service rejected member {result.get('user_id')}: {result.get('message')}")
+                self._backoff = self.flush_interval
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                delay = self._requeue(batch, e)
+                logger.error(f"Failed to ship {len(batch)} member updates, retrying in {delay:.1f}s: {str(e)}")
+            except Exception as e:
+                delay = self._requeue(batch, e)
+                logger.error(f"Failed to ship {len(batch)} member updates: {str(e)}\n{traceback.format_exc()}")
+
+    def _requeue(self, batch, error):
+        """Put a failed batch back in the buffer and pause shipping; returns the pause in seconds"""
+        # Newer writes for the same user take precedence over the failed batch
+        for user_id, data in batch.items():
+            self._pending.setdefault(user_id, data)
+
+        delay = self._retry_after(getattr(error, 'headers', None))
+        if delay is None:
+            delay = self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+        self._retry_at = max(self._retry_at, asyncio.get_running_loop().time() + delay)
+        return delay
+
+    @staticmethod
+    def _retry_after(headers):
+        """Seconds from a Retry-After header, if the service sent one"""
+        try:
+            return max(float(headers['Retry-After']), 0.0)
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    async def flush(self, deadline=None):
+        """Ship all buffered writes and wait for the requests to finish
+
+        Waits out any backoff first, but not past deadline (a loop time).
+        Returns True if nothing is left in the buffer.
+        """
+        loop = asyncio.get_running_loop()
+        wait = self._retry_at - loop.time()
+        if deadline is not None:
+            wait = min(wait, deadline - loop.time())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if loop.time() >= self._retry_at:
+            self._start_batches()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        return not self._pending
+
+    async def update_member(self, user_id, roles, nickname=None, left=False):
+        """Buffer member data for the next batch
+
+        The service keeps no departure times, so left is ignored and
+        retention applies only to SQLite storage.
+        """
+        self._pending[str(user_id)] = (list(roles) if roles else [], nickname)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+            # Backpressure: don't let the buffer grow unbounded while the service is slow.
+            # While backing off it is bounded by the member count (one entry per user) anyway.
+            if len(self._pending) >= self.batch_size * 4 and asyncio.get_running_loop().time() >= self._retry_at:
+                await self.flush()
+        return True
+
+    async def get_member(self, user_id):
+        """Get member data from the service"""
+        user_id = str(user_id)
+        if user_id in self._pending:
+            roles, nickname = self._pending[user_id]
+            return MemberSnapshot(user_id, roles, nickname)
+
+        try:
+            async with self.session.get(self._url(f'/{user_id}')) as response:
+                if response.status == 404:
+                    return None
+                response.raise_for_status()
+                body = await response.json()
+                return self._to_member(body['data'])
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to get member data for user_id {user_id}: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error getting member data for user_id {user_id}: {str(e)}\n{traceback.format_exc()}")
+            return None
+
+    async def delete_member(self, user_id):
+        """Delete member data from the service"""
+        user_id = str(user_id)
+        had_pending = self._pending.pop(user_id, None) is not None
+        # Wait for batches that may still carry this user so the delete lands last
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        try:
+            async with self.session.delete(self._url(f'/{user_id}')) as response:
+                if response.status == 404:
+                    if not had_pending:
+                        logger.warning(f"No data found to delete for user_id {user_id}")
+                    return had_pending
+                response.raise_for_status()
+                logger.info(f"Deleted member data for user_id {user_id}")
+                return True
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to delete member data for user_id {user_id}: {str(e)}")
+            return False
+
+    async def clear_database(self):
+        """Clear all member data in the service - ADMIN ONLY"""
+        self._pending.clear()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        try:
+            async with self.session.delete(self._url('')) as response:
+                response.raise_for_status()
+                count = (await response.json()).get('count', 0)
+                logger.warning(f"Cleared database, removed {count} records")
+                return count
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to clear database: {str(e)}")
+            return 0
+
+    async def get_all_members(self):
+        """Get all members from the service"""
+        await self.flush()
+
+        try:
+            async with self.session.get(self._url('')) as response:
+                response.raise_for_status()
+                body = await response.json()
+                return [self._to_member(user) for user in body.get('data', [])]
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to get all members: {str(e)}")
+            return []
+
+    async def purge_role(self, guild_id, role_id, role_name, record_history=False):
+        """Remove a deleted role from every stored member through the batched update path
+
+        The service has no role-scoped update, so holders are rewritten one
+        member at a time. History is only kept by the SQLite backend.
+        """
+        members = await self.get_all_members()
+        affected = []
+        for member in members:
+            if role_id in member.roles:
+                await self.update_member(
+                    member.user_id,
+                    [r for r in member.roles if r != role_id],
+                    member.nickname
+                )
+                affected.append(member.user_id)
+        await self.flush()
+        logger.info(f"Purged deleted role {role_name} ({role_id}) from {len(affected)} stored members")
+        return affected
+
+    @staticmethod
+    def _to_member(user):
+        """Convert a service document to a MemberSnapshot"""
+        return MemberSnapshot(
+            user['user_id'],
+            user.get('roles') or (),
+            user.get('nickname'),
+            user.get('last_updated')
+        )
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import traceback
+
+logger = logging.getLogger('bot.database')
+
+class RoleJournal:
+    """Write-ahead journal for role and nickname changes made through the API
+
+    An entry describing the intended end state is written before the
+    Discord calls and removed once they finished. Whatever is still in the
+    journal at startup was interrupted and gets replayed by the handler
+    registered for its kind, so handlers must be idempotent.
+
+    Writes are group-committed: begin() calls made within flush_interval
+    share one transaction, and done() marks are buffered until the next
+    commit (a lost mark only means a harmless replay). The journal lives
+    in the shared storage manager's database, so complete() can remove
+    entries in the same transaction as the change they protect.
+    """
+
+    def __init__(self, storage, flush_interval=0.005):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.handlers = {}
+        self._replayed = False
+        self._next_id = 1
+        self._inserts = []
+        self._waiters = []
+        self._done = []
+        self._flush_task = None
+
+    def open(self):
+        """Open the journal; the role_journal table is created by the storage manager"""
+        self.storage.open()
+        max_id = self.storage.execute('SELECT MAX(entry_id) FROM role_journal').fetchone()[0]
+        self._next_id = (max_id or 0) + 1
+
+    async def close(self):
+        """Commit buffered writes"""
+        if self.storage.conn:
+            self._flush()
+
+    def register(self, kind, handler):
+        """Register the coroutine that replays entries of a kind
+
+        The handler is called as handler(guild_id, user_id, payload).
+        """
+        self.handlers[kind] = handler
+
+    async def begin(self, kind, guild_id, user_id, payload):
+        """Durably record an intended change; returns the entry id"""
+        return (await self.begin_many(kind, [(guild_id, user_id, payload)]))[0]
+
+    async def begin_many(self, kind, entries):
+        """Durably record several intended changes in one commit; returns their ids"""
+        entry_ids = []
+        for guild_id, user_id, payload in entries:
+            entry_ids.append(self._next_id)
+            self._inserts.append((self._next_id, kind, guild_id, user_id, json.dumps(payload)))
+            self._next_id += 1
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._schedule_flush()
+        await waiter
+        return entry_ids
+
+    def done(self, *entry_ids):
+        """Mark entries as applied"""
+        self._done.extend((entry_id,) for entry_id in entry_ids)
+        self._schedule_flush()
+
+    def complete(self, *entry_ids):
+        """Remove applied entries now, inside the caller's storage transaction if there is one
+
+        Use this instead of done() when the entries must disappear atomically
+        with the rows they protect.
+        """
+        self.storage.executemany('DELETE FROM role_journal WHERE entry_id = ?', [(entry_id,) for entry_id in entry_ids])
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush()
+
+    def _flush(self):
+        inserts, self._inserts = self._inserts, []
+        done, self._done = self._done, []
+        waiters, self._waiters = self._waiters, []
+        if not inserts and not done:
+            return
+
+        try:
+            with self.storage.transaction():
+                if inserts:
+                    self.storage.executemany('''
+                        INSERT INTO role_journal (entry_id, kind, guild_id, user_id, payload)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', inserts)
+                if done:
+                    self.storage.executemany('DELETE FROM role_journal WHERE entry_id = ?', done)
+        except Exception as e:
+            logger.error(f"Failed to write role journal: {str(e)}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def replay(self):
+        """Re-apply every entry left behind by an interrupted run
+
+        Only the first call replays. on_ready fires again after gateway
+        reconnects, and by then the journal also holds entries of operations
+        still running in this process.
+        """
+        if self._replayed:
+            return 0
+        self._replayed = True
+        self._flush()
+        rows = self.storage.execute(
+            'SELECT entry_id, kind, guild_id, user_id, payload FROM role_journal ORDER BY entry_id'
+        ).fetchall()
+        if not rows:
+            return 0
+
+        logger.warning(f"Replaying {len(rows)} unfinished role operation(s) from the journal")
+        replayed = 0
+        for entry_id, kind, guild_id, user_id, payload in rows:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                logger.error(f"No journal handler for '{kind}' entry {entry_id}, keeping it")
+                continue
+            try:
+                await handler(guild_id, user_id, json.loads(payload))
+                self.done(entry_id)
+                replayed += 1
+            except Exception as e:
+                logger.error(f"Failed to replay journal entry {entry_id}: {str(e)}\n{traceback.format_exc()}")
+
+        self._flush()
+        return replayed
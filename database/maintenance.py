@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+import traceback
+
+logger = logging.getLogger('bot.database')
+
+class DatabaseMaintenance:
+    """Keeps the shared SQLite database small and its statistics fresh
+
+    Runs alongside the bot on the StorageManager's connection: passive
+    WAL checkpoints on a fixed interval, PRAGMA optimize periodically
+    along with removing unused role sets, and incremental vacuum in small
+    slices whenever there have been no writes for a while. Every step is
+    short, so writers are never held up for long.
+    """
+
+    def __init__(self, storage, checkpoint_interval=60, optimize_interval=3600,
+                 idle_seconds=30, vacuum_pages=256, tick=5, role_sets=None):
+        self.storage = storage
+        self.role_sets = role_sets
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self.idle_seconds = idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.tick = tick
+        self.task = None
+
+    def start(self):
+        """Start the maintenance loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the maintenance loop"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def _pragma(self, statement):
+        return self.storage.conn.execute(statement).fetchone()
+
+    def checkpoint(self):
+        """Run a passive WAL checkpoint; returns (busy, wal_frames, checkpointed_frames)"""
+        return self._pragma('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def optimize(self):
+        """Refresh query planner statistics where SQLite thinks they are stale"""
+        # analysis_limit bounds how many rows ANALYZE reads per index
+        self.storage.conn.execute('PRAGMA analysis_limit=1000')
+        self.storage.conn.execute('PRAGMA optimize')
+
+    def vacuum_slice(self):
+        """Release up to vacuum_pages free pages; returns how many remain free"""
+        # Each step of this pragma frees one page and execute() only steps once;
+        # executescript runs it to completion
+        self.storage.conn.executescript(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})')
+        return self._pragma('PRAGMA freelist_count')[0]
+
+    def is_idle(self):
+        return time.monotonic() - self.storage.last_write >= self.idle_seconds
+
+    def report(self):
+        """Sizes of the database file, its free pages and the WAL"""
+        page_size = self._pragma('PRAGMA page_size')[0]
+        page_count = self._pragma('PRAGMA page_count')[0]
+        freelist = self._pragma('PRAGMA freelist_count')[0]
+        wal_path = f"{self.storage.db_path}-wal"
+        return {
+            'file_bytes': os.path.getsize(self.storage.db_path),
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_pages': freelist,
+            'freelist_bytes': freelist * page_size,
+            'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        }
+
+    async def _run(self):
+        last_checkpoint = last_optimize = time.monotonic()
+        # Run the first optimize soon after startup
+        last_optimize -= self.optimize_interval - 60
+
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                now = time.monotonic()
+                if now - last_checkpoint >= self.checkpoint_interval:
+                    busy, wal_frames, checkpointed = self.checkpoint()
+                    last_checkpoint = now
+                    if busy or wal_frames != checkpointed:
+                        logger.debug(f"Passive checkpoint copied {checkpointed}/{wal_frames} WAL frames")
+
+                if now - last_optimize >= self.optimize_interval and self.is_idle():
+                    if self.role_sets:
+                        self.role_sets.collect()
+                    self.optimize()
+                    last_optimize = now
+
+                # Vacuum slice by slice, giving the event loop and writers a turn between slices
+                reclaimed = 0
+                while self.is_idle():
+                    before = self._pragma('PRAGMA freelist_count')[0]
+                    if before == 0:
+                        break
+                    remaining = self.vacuum_slice()
+                    reclaimed += before - remaining
+                    await asyncio.sleep(0.05)
+                if reclaimed:
+                    logger.info(f"Incremental vacuum released {reclaimed} pages")
+
+            except Exception as e:
+                logger.error(f"Database maintenance failed: {str(e)}\n{traceback.format_exc()}")
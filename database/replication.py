@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import time
+import traceback
+import aiohttp
+
+logger = logging.getLogger('bot.database')
+
+class OutboxShipper:
+    """Replicates member changes from SQLite to the REST service in service/
+
+    Triggers on members (see REPLICATION_TRIGGERS in storage.py) append the
+    user id of every insert, delete and role or nickname change to
+    replication_outbox in the same transaction as the change, so nothing
+    committed can be missed. The shipper drains the outbox in seq order,
+    one batch at a time: it reads each user's current state and sends it
+    through POST /api/users/bulk, or DELETE /api/users/:id when the member
+    is gone. Shipping state rather than the individual changes keeps every
+    user's latest write last, and retries are idempotent. Rows are only
+    removed from the outbox once the service has answered for them; failed
+    batches are retried with exponential backoff. Records the service
+    rejects would be rejected again, so they go to replication_rejects
+    with the service's message instead of being retried.
+    """
+
+    def __init__(self, storage, base_url, api_key=None, timeout=10.0, batch_size=500,
+                 interval=1.0, pool_size=8, max_backoff=60.0):
+        self.storage = storage
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pool_size = pool_size
+        self.max_backoff = max_backoff
+        self.session = None
+        self.task = None
+        self.shipped = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_shipped_at = None
+
+    def _url(self, path):
+        return f"{self.base_url}/api/users{path}"
+
+    def start(self):
+        """Open the pooled HTTP session and start draining the outbox"""
+        if self.task is None:
+            headers = {'x-api-key': self.api_key} if self.api_key else {}
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+                headers=headers,
+                timeout=self.timeout
+            )
+            self.task = asyncio.create_task(self._run())
+            logger.info(f"Replicating member changes to {self.base_url}")
+
+    async def stop(self):
+        """Stop shipping; whatever is left stays in the outbox for the next start"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def _run(self):
+        backoff = self.interval
+        while True:
+            try:
+                # Keep going while there is a backlog, sleep once it is drained
+                while await self.ship_batch() == self.batch_size:
+                    pass
+                backoff = self.interval
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(backoff * 2, self.max_backoff)
+                logger.warning(f"Replication to the service failed, retrying in {backoff:.0f}s: {str(e)}")
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(backoff * 2, self.max_backoff)
+                logger.error(f"Replication failed: {str(e)}\n{traceback.format_exc()}")
+            await asyncio.sleep(backoff)
+
+    async def ship_batch(self):
+        """Ship the oldest outbox entries; returns how many were taken off the outbox"""
+        entries = self.storage.execute(
+            'SELECT seq, user_id FROM replication_outbox ORDER BY seq LIMIT ?', (self.batch_size,)
+        ).fetchall()
+        if not entries:
+            return 0
+
+        user_ids = list(dict.fromkeys(user_id for _, user_id in entries))
+        placeholders = ','.join('?' * len(user_ids))
+        rows = await self.storage.fetchall(f'''
+            SELECT user_id, roles, nickname FROM members
+            LEFT JOIN role_sets USING (role_set_id)
+            WHERE user_id IN ({placeholders})
+        ''', user_ids)
+        current = {user_id: (roles, nickname) for user_id, roles, nickname in rows}
+
+        # In outbox order, so the service sees users in the order they changed
+        users = []
+        deleted = []
+        for user_id in user_ids:
+            if user_id not in current:
+                deleted.append(user_id)
+                continue
+            roles, nickname = current[user_id]
+            users.append({'user_id': user_id, 'roles': roles.split(',') if roles else [], 'nickname': nickname})
+
+        rejects = await self._post_users(users) if users else []
+        if deleted:
+            await asyncio.gather(*(self._delete_user(user_id) for user_id in deleted))
+
+        with self.storage.transaction():
+            if rejects:
+                self.storage.executemany(
+                    'INSERT INTO replication_rejects (user_id, payload, message) VALUES (?, ?, ?)', rejects
+                )
+            # Entries queued while this batch was in flight have a higher seq and stay for the next one
+            self.storage.execute('DELETE FROM replication_outbox WHERE seq <= ?', (entries[-1][0],))
+        self.shipped += len(user_ids) - len(rejects)
+        self.last_shipped_at = time.time()
+        return len(entries)
+
+    async def _post_users(self, users):
+        """Send one bulk request; returns (user_id, payload, message) for each rejected record"""
+        async with self.session.post(self._url('/bulk'), json={'users': users}) as response:
+            body = await response.json(content_type=None)
+            if response.status not in (200, 207):
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=str(body)
+                )
+        rejects = []
+        for result in body.get('results', []):
+            if result.get('success'):
+                continue
+            index = result.get('index')
+            user = users[index] if isinstance(index, int) and 0 <= index < len(users) else None
+            user_id = user['user_id'] if user else result.get('user_id')
+            rejects.append((str(user_id), json.dumps(user) if user else None, result.get('message')))
+            logger.error(f"Service rejected replicated member {user_id}: {result.get('message')}")
+        return rejects
+
+    async def _delete_user(self, user_id):
+        async with self.session.delete(self._url(f'/{user_id}')) as response:
+            # 404: already gone, which is the state being replicated
+            if response.status not in (200, 204, 404):
+                response.raise_for_status()
+
+    def stats(self):
+        """Outbox backlog, how far the service is behind in seconds, and stored rejects"""
+        pending, oldest = self.storage.execute(
+            "SELECT COUNT(*), (julianday('now') - MIN(queued_at)) * 86400 FROM replication_outbox"
+        ).fetchone()
+        rejected = self.storage.execute('SELECT COUNT(*) FROM replication_rejects').fetchone()[0]
+        return {
+            'pending': pending,
+            'lag_seconds': oldest or 0.0,
+            'shipped': self.shipped,
+            'rejected': rejected,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
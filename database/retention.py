@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger('bot.database')
+
+def sqlite_timestamp(moment):
+    """Format a datetime like SQLite's CURRENT_TIMESTAMP (UTC, second precision)"""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class MemberRetention:
+    """Deletes stored snapshots of members who left more than retention_days ago
+
+    members.left_at is set when a member leaves and cleared when they are
+    seen again. Eviction walks the partial left_at index in small batches,
+    each in its own short write transaction, and sizes the batches so one
+    never holds the write lock for more than max_lock_ms. Freed pages are
+    returned to the OS by the incremental vacuum in DatabaseMaintenance.
+    """
+
+    def __init__(self, storage, retention_days, interval=3600, batch_size=200,
+                 max_lock_ms=5, pause=0.05, on_evicted=None):
+        self.storage = storage
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_lock_ms = max_lock_ms
+        self.pause = pause
+        # Called with the user ids removed by each batch
+        self.on_evicted = on_evicted
+        self.last_report = None
+        self.task = None
+
+    def start(self):
+        """Start the eviction loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the eviction loop"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.evict()
+            except Exception as e:
+                logger.error(f"Member retention failed: {str(e)}\n{traceback.format_exc()}")
+
+    def _resize(self, batch, took_ms):
+        """Scale the next batch so it should take about half of max_lock_ms"""
+        target = self.max_lock_ms / 2
+        scale = min(target / max(took_ms, 0.01), 2.0)
+        return int(min(max(batch * scale, 20), 10000))
+
+    async def mark_unseen(self, synced_since):
+        """Mark members not refreshed by a full member sync as departed
+
+        Covers snapshots stored before left_at existed and members who left
+        while the bot was offline. Their last update is the best known
+        departure time. Only call this after every guild synced cleanly.
+        """
+        cutoff = sqlite_timestamp(synced_since)
+        last_rowid = self.storage.conn.execute('SELECT MAX(rowid) FROM members').fetchone()[0] or 0
+        rowid, batch, marked = 0, self.batch_size, 0
+        while rowid < last_rowid:
+            started = time.perf_counter()
+            with self.storage.transaction():
+                marked += self.storage.execute('''
+                    UPDATE members SET left_at = last_updated
+                    WHERE rowid > ? AND rowid <= ? AND left_at IS NULL AND last_updated < ?
+                ''', (rowid, rowid + batch, cutoff)).rowcount
+            rowid += batch
+            batch = self._resize(batch, (time.perf_counter() - started) * 1000)
+            await asyncio.sleep(self.pause)
+
+        if marked:
+            logger.info(f"Marked {marked} members missing from the startup sync as departed")
+        return marked
+
+    async def evict(self):
+        """Delete every snapshot past retention; returns a report of what was reclaimed"""
+        started = time.monotonic()
+        cutoff = sqlite_timestamp(datetime.now(timezone.utc) - timedelta(days=self.retention_days))
+        page_size = self.storage.conn.execute('PRAGMA page_size').fetchone()[0]
+        free_before = self.storage.conn.execute('PRAGMA freelist_count').fetchone()[0]
+        batch, deleted, longest_ms = self.batch_size, 0, 0.0
+
+        while True:
+            batch_started = time.perf_counter()
+            with self.storage.transaction():
+                rows = self.storage.execute('''
+                    SELECT rowid, user_id FROM members
+                    WHERE left_at < ?
+                    ORDER BY left_at
+                    LIMIT ?
+                ''', (cutoff, batch)).fetchall()
+                if rows:
+                    self.storage.conn.executemany('DELETE FROM members WHERE rowid = ?', [(row[0],) for row in rows])
+            took_ms = (time.perf_counter() - batch_started) * 1000
+            longest_ms = max(longest_ms, took_ms)
+
+            if not rows:
+                break
+            deleted += len(rows)
+            if self.on_evicted:
+                self.on_evicted([row[1] for row in rows])
+            if len(rows) < batch:
+                break
+            batch = self._resize(batch, took_ms)
+            await asyncio.sleep(self.pause)
+
+        freed = self.storage.conn.execute('PRAGMA freelist_count').fetchone()[0] - free_before
+        self.last_report = {
+            'deleted': deleted,
+            'freed_bytes': max(freed, 0) * page_size,
+            'longest_batch_ms': longest_ms,
+            'seconds': time.monotonic() - started,
+        }
+        if deleted:
+            logger.info(
+                f"Retention removed {deleted} members gone over {self.retention_days} days, "
+                f"freed {self.last_report['freed_bytes'] / 1048576:.1f} MB "
+                f"(longest batch {longest_ms:.1f} ms)"
+            )
+        return self.last_report
@@ -0,0 +1,264 @@
+import logging
+from array import array
+from utils.members import iter_members
+
+logger = logging.getLogger('bot.database')
+
+class RoleIndex:
+    """In-memory role membership bitmap for the stored members of one guild
+
+    Every stored member gets a row number. Each role id maps to a column,
+    which is a bytearray holding one bit per row, so a member's roles are the
+    bits set in its row across all columns. Boolean role queries convert the
+    columns they need to Python ints and combine them with &, | and ~, which
+    evaluates the whole member set at once in C instead of looping per member.
+    """
+
+    def __init__(self):
+        self._rows = {}                 # user_id -> row
+        self._user_ids = array('Q')     # row -> user_id
+        self._free_rows = []
+        self._member_roles = []         # row -> tuple of role ids, for diffing updates
+        self._columns = {}              # role_id -> bitmap over rows
+        self._counts = {}               # role_id -> stored members holding it, kept from the diffs
+        self._live = bytearray()        # rows holding a stored member
+        self._present = bytearray()     # rows whose member is currently in the guild
+
+    def __len__(self):
+        return len(self._rows)
+
+    @staticmethod
+    def _set_bit(bitmap, row, value):
+        byte, bit = row >> 3, 1 << (row & 7)
+        if byte >= len(bitmap):
+            if not value:
+                return
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        if value:
+            bitmap[byte] |= bit
+        else:
+            bitmap[byte] &= ~bit & 0xFF
+
+    @staticmethod
+    def _has_bit(bitmap, row):
+        byte = row >> 3
+        return byte < len(bitmap) and bool(bitmap[byte] & (1 << (row & 7)))
+
+    def _row_for(self, user_id):
+        row = self._rows.get(user_id)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+                self._user_ids[row] = user_id
+                self._member_roles[row] = ()
+            else:
+                row = len(self._user_ids)
+                self._user_ids.append(user_id)
+                self._member_roles.append(())
+            self._rows[user_id] = row
+            self._set_bit(self._live, row, True)
+        return row
+
+    def set_member(self, user_id, role_ids, present=None):
+        """Store a member's roles, only touching the columns that changed"""
+        row = self._row_for(int(user_id))
+        new_roles = tuple(sorted({int(role_id) for role_id in role_ids}))
+        old_roles = self._member_roles[row]
+
+        if new_roles != old_roles:
+            old_set, new_set = set(old_roles), set(new_roles)
+            for role_id in old_set - new_set:
+                column = self._columns.get(role_id)
+                if column is not None and self._has_bit(column, row):
+                    self._set_bit(column, row, False)
+                    self._counts[role_id] -= 1
+            for role_id in new_set - old_set:
+                column = self._columns.get(role_id)
+                if column is None:
+                    column = self._columns[role_id] = bytearray()
+                    self._counts[role_id] = 0
+                self._set_bit(column, row, True)
+                self._counts[role_id] += 1
+            self._member_roles[row] = new_roles
+
+        if present is not None:
+            self._set_bit(self._present, row, present)
+
+    def set_present(self, user_id, present):
+        """Mark whether a stored member is currently in the guild"""
+        row = self._rows.get(int(user_id))
+        if row is not None:
+            self._set_bit(self._present, row, present)
+
+    def remove_member(self, user_id):
+        """Forget a member whose stored data was deleted"""
+        row = self._rows.pop(int(user_id), None)
+        if row is None:
+            return
+        self._clear_row_roles(row)
+        self._set_bit(self._live, row, False)
+        self._set_bit(self._present, row, False)
+        self._free_rows.append(row)
+
+    def purge_role(self, role_id):
+        """Drop a deleted role from every member; returns how many held it
+
+        Only the column goes. Members' role tuples keep the id until their
+        next update, which skips roles that no longer have a column.
+        """
+        self._columns.pop(int(role_id), None)
+        return self._counts.pop(int(role_id), 0)
+
+    def _clear_row_roles(self, row):
+        for role_id in self._member_roles[row]:
+            column = self._columns.get(role_id)
+            if column is not None and self._has_bit(column, row):
+                self._set_bit(column, row, False)
+                self._counts[role_id] -= 1
+        self._member_roles[row] = ()
+
+    def clear(self):
+        """Drop every member from the index"""
+        self.__init__()
+
+    def role_counts(self):
+        """Stored members per role id, without scanning anything"""
+        return self._counts
+
+    def _column(self, role_id):
+        column = self._columns.get(int(role_id))
+        return int.from_bytes(column, 'little') if column else 0
+
+    def _mask(self, all_of=(), any_of=(), none_of=(), present=None):
+        mask = int.from_bytes(self._live, 'little')
+        for role_id in all_of:
+            mask &= self._column(role_id)
+        if any_of:
+            either = 0
+            for role_id in any_of:
+                either |= self._column(role_id)
+            mask &= either
+        for role_id in none_of:
+            mask &= ~self._column(role_id)
+        if present is not None:
+            present_mask = int.from_bytes(self._present, 'little')
+            mask = mask & present_mask if present else mask & ~present_mask
+        return mask
+
+    def count(self, all_of=(), any_of=(), none_of=(), present=None):
+        """Count stored members matching a role query"""
+        return bin(self._mask(all_of, any_of, none_of, present)).count('1')
+
+    def query(self, all_of=(), any_of=(), none_of=(), present=None, offset=0, limit=None):
+        """Find stored members matching a role query
+
+        Members must hold every role in all_of, at least one role in any_of
+        (if given) and none of the roles in none_of. present=True/False limits
+        the result to members currently in / absent from the guild.
+        Returns (total, user_ids) with user_ids sliced by offset and limit.
+        """
+        mask = self._mask(all_of, any_of, none_of, present)
+        total = bin(mask).count('1')
+        if limit is None:
+            limit = total
+
+        user_ids = []
+        if limit <= 0 or offset >= total:
+            return total, user_ids
+
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        skipped = 0
+        for byte_index, byte in enumerate(data):
+            if not byte:
+                continue
+            bits = _POPCOUNT[byte]
+            if skipped + bits <= offset:
+                skipped += bits
+                continue
+            base = byte_index << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    user_ids.append(self._user_ids[base + bit])
+                    if len(user_ids) >= limit:
+                        return total, user_ids
+        return total, user_ids
+
+_POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+
+class RoleIndexManager:
+    """Keeps one RoleIndex per guild in sync with stored member data
+
+    Stored snapshots are not scoped by guild, so every guild index holds all
+    stored members and tracks separately which of them are in that guild.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.indexes = {}
+
+    def get(self, guild_id):
+        """Get the index for a guild, or None if it has not been built yet"""
+        return self.indexes.get(guild_id)
+
+    async def build(self, guild):
+        """Build a guild's index from storage plus the guild's current members"""
+        index = RoleIndex()
+        for member_data in await self.db.get_all_members():
+            index.set_member(member_data.user_id, member_data.roles, present=False)
+
+        async for member in iter_members(guild):
+            if not member.bot:
+                index.set_member(
+                    member.id,
+                    [role.id for role in member.roles if role.name != "@everyone"],
+                    present=True
+                )
+
+        self.indexes[guild.id] = index
+        logger.info(f"Built role index for {guild.name} with {len(index)} members")
+        return index
+
+    def update_member(self, member, present=True):
+        """Apply a member's current roles to the guild index"""
+        index = self.indexes.get(member.guild.id)
+        if index is not None:
+            index.set_member(
+                member.id,
+                [role.id for role in member.roles if role.name != "@everyone"],
+                present=present
+            )
+
+    def update_raw(self, guild_id, user_id, role_ids, present=True):
+        """Apply roles from a raw gateway payload to the guild index"""
+        index = self.indexes.get(guild_id)
+        if index is not None:
+            index.set_member(user_id, role_ids, present=present)
+
+    def set_present(self, guild_id, user_id, present):
+        """Mark whether a stored member is currently in the guild"""
+        index = self.indexes.get(guild_id)
+        if index is not None:
+            index.set_present(user_id, present)
+
+    def role_counts(self, guild_id):
+        """Stored members per role id for a guild, or None if the guild has no index"""
+        index = self.indexes.get(guild_id)
+        return index.role_counts() if index else None
+
+    def purge_role(self, role_id):
+        """Drop a deleted role from every guild index"""
+        for index in self.indexes.values():
+            index.purge_role(role_id)
+
+    def remove_member(self, user_id):
+        """Forget a member whose stored data was deleted, in every guild"""
+        for index in self.indexes.values():
+            index.remove_member(user_id)
+
+    def clear(self):
+        """Forget every member after the database was cleared"""
+        for index in self.indexes.values():
+            index.clear()
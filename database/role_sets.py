@@ -0,0 +1,54 @@
+import hashlib
+import logging
+from array import array
+
+logger = logging.getLogger('bot.database')
+
+def canonical_roles(role_ids):
+    """Sorted, de-duplicated role ids as stored in role_sets.roles"""
+    return ','.join(map(str, sorted({int(role_id) for role_id in role_ids})))
+
+def role_set_hash(roles):
+    """Hash of a canonical roles string: the packed role ids, so the text format doesn't matter"""
+    packed = array('Q', map(int, roles.split(','))).tobytes() if roles else b''
+    return hashlib.blake2b(packed, digest_size=16).digest()
+
+class RoleSetStore:
+    """Interns role combinations in the role_sets table
+
+    Most members share one of a few hundred role combinations, so members
+    only store a role_set_id. Triggers on members keep role_sets.refs
+    equal to the number of members pointing at each set; collect() deletes
+    the sets nothing points at any more. Ids are cached in memory, so
+    interning a known combination costs a sort and a dict lookup.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.ids = {}   # canonical roles -> role_set_id
+
+    def intern(self, role_ids):
+        """Get the id of a role combination, adding it if it is new"""
+        roles = canonical_roles(role_ids)
+        role_set_id = self.ids.get(roles)
+        if role_set_id is None:
+            digest = role_set_hash(roles)
+            row = self.storage.execute('SELECT role_set_id FROM role_sets WHERE hash = ?', (digest,)).fetchone()
+            if row:
+                role_set_id = row[0]
+            else:
+                role_set_id = self.storage.execute(
+                    'INSERT INTO role_sets (hash, roles) VALUES (?, ?)', (digest, roles)
+                ).lastrowid
+            self.ids[roles] = role_set_id
+        return role_set_id
+
+    def collect(self):
+        """Delete role sets no member references; returns how many were removed"""
+        removed = {row[0] for row in self.storage.execute(
+            'DELETE FROM role_sets WHERE refs <= 0 RETURNING role_set_id'
+        ).fetchall()}
+        if removed:
+            self.ids = {roles: role_set_id for roles, role_set_id in self.ids.items() if role_set_id not in removed}
+            logger.info(f"Removed {len(removed)} unused role sets")
+        return len(removed)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+import traceback
+
+logger = logging.getLogger('bot.database')
+
+class RoleCountCheckpoints:
+    """Saves the role index's per-role member counts into time buckets
+
+    The counts themselves are kept up to date by RoleIndex from the role
+    changes it applies, so reading them is free. Every interval seconds
+    they are copied into role_counts under the bucket's start time, which
+    is what "how did this change over the week" is answered from.
+    Checkpoints older than keep_days are deleted.
+    """
+
+    def __init__(self, storage, role_index, interval=3600, keep_days=90):
+        self.storage = storage
+        self.role_index = role_index
+        self.interval = interval
+        self.keep_days = keep_days
+        self.task = None
+
+    def start(self):
+        """Start the checkpoint loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the checkpoint loop"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logger.error(f"Role count checkpoint failed: {str(e)}\n{traceback.format_exc()}")
+
+    def checkpoint(self, now=None):
+        """Write the current counts of every indexed guild; returns the bucket written"""
+        now = time.time() if now is None else now
+        bucket = int(now) // self.interval * self.interval
+        rows = [
+            (guild_id, role_id, bucket, members)
+            for guild_id, index in self.role_index.indexes.items()
+            for role_id, members in index.role_counts().items()
+        ]
+        with self.storage.transaction():
+            self.storage.executemany(
+                'INSERT OR REPLACE INTO role_counts (guild_id, role_id, bucket, members) VALUES (?, ?, ?, ?)', rows
+            )
+            self.storage.execute('DELETE FROM role_counts WHERE bucket < ?', (bucket - self.keep_days * 86400,))
+        return bucket
+
+    async def counts_at(self, guild_id, moment):
+        """Counts from the last checkpoint at or before moment; returns (role_id -> members, bucket)"""
+        rows = await self.storage.fetchall('''
+            SELECT role_id, members, bucket FROM role_counts
+            WHERE guild_id = ? AND bucket = (
+                SELECT MAX(bucket) FROM role_counts WHERE guild_id = ? AND bucket <= ?
+            )
+        ''', (guild_id, guild_id, int(moment)))
+        if not rows:
+            return {}, None
+        return {role_id: members for role_id, members, _ in rows}, rows[0][2]
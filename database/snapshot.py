@@ -0,0 +1,30 @@
+from array import array
+
+class MemberSnapshot:
+    """A stored member as returned by every storage backend
+
+    Ids are ints and roles an array('Q') of role ids, 8 bytes per role with
+    no per-role objects, so large result sets stay small.
+    """
+
+    __slots__ = ('user_id', 'roles', 'nickname', 'last_updated')
+
+    def __init__(self, user_id, roles=(), nickname=None, last_updated=None):
+        self.user_id = int(user_id)
+        self.roles = roles if isinstance(roles, array) else array('Q', map(int, roles))
+        self.nickname = nickname
+        self.last_updated = last_updated
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a snapshot from a (user_id, roles, nickname, last_updated, ...) members row"""
+        user_id, roles, nickname, last_updated = row[:4]
+        return cls(user_id, array('Q', map(int, roles.split(','))) if roles else array('Q'), nickname, last_updated)
+
+    def __eq__(self, other):
+        if not isinstance(other, MemberSnapshot):
+            return NotImplemented
+        return (self.user_id, self.roles, self.nickname) == (other.user_id, other.roles, other.nickname)
+
+    def __repr__(self):
+        return f"MemberSnapshot(user_id={self.user_id}, roles={list(self.roles)}, nickname={self.nickname!r})"
@@ -0,0 +1,518 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from database.role_sets import canonical_roles, role_set_hash
+
+logger = logging.getLogger('bot.database')
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS members (
+        user_id TEXT PRIMARY KEY,
+        role_set_id INTEGER,
+        nickname TEXT,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        left_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS role_sets (
+        role_set_id INTEGER PRIMARY KEY,
+        hash BLOB NOT NULL UNIQUE,
+        roles TEXT NOT NULL,
+        refs INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS replication_outbox (
+        seq INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        queued_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS replication_rejects (
+        reject_id INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        payload TEXT,
+        message TEXT,
+        rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS temp_roles (
+        user_id INTEGER,
+        role_id INTEGER,
+        guild_id INTEGER,
+        start_time TIMESTAMP,
+        duration TEXT,
+        start_message TEXT,
+        end_message TEXT,
+        PRIMARY KEY (user_id, role_id, guild_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS admin_roles (
+        role_id INTEGER,
+        guild_id INTEGER,
+        PRIMARY KEY (role_id, guild_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS role_purges (
+        purge_id INTEGER PRIMARY KEY,
+        guild_id INTEGER,
+        role_id INTEGER,
+        role_name TEXT,
+        user_ids BLOB,
+        purged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS role_journal (
+        entry_id INTEGER PRIMARY KEY,
+        kind TEXT,
+        guild_id INTEGER,
+        user_id INTEGER,
+        payload TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS dm_outbox (
+        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedupe_key TEXT UNIQUE,
+        user_id INTEGER,
+        embed TEXT,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        created_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS bulk_role_jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER,
+        role_id INTEGER,
+        action TEXT,
+        filter TEXT,
+        channel_id INTEGER,
+        message_id INTEGER,
+        requested_by INTEGER,
+        status TEXT,
+        last_user_id INTEGER DEFAULT 0,
+        processed INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        created_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS role_counts (
+        guild_id INTEGER,
+        role_id INTEGER,
+        bucket INTEGER,
+        members INTEGER,
+        PRIMARY KEY (guild_id, bucket, role_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS manager_roles (
+        role_id INTEGER,
+        guild_id INTEGER,
+        PRIMARY KEY (role_id, guild_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS command_permissions (
+        guild_id INTEGER,
+        command TEXT,
+        level TEXT,
+        PRIMARY KEY (guild_id, command)
+    )
+    ''',
+]
+
+# Keep role_sets.refs equal to the number of members using each set.
+# Created after migrate_role_sets, once members has its role_set_id column.
+ROLE_SET_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS members_role_set_insert AFTER INSERT ON members
+    BEGIN
+        UPDATE role_sets SET refs = refs + 1 WHERE role_set_id = NEW.role_set_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS members_role_set_delete AFTER DELETE ON members
+    BEGIN
+        UPDATE role_sets SET refs = refs - 1 WHERE role_set_id = OLD.role_set_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS members_role_set_update AFTER UPDATE OF role_set_id ON members
+    WHEN OLD.role_set_id IS NOT NEW.role_set_id
+    BEGIN
+        UPDATE role_sets SET refs = refs - 1 WHERE role_set_id = OLD.role_set_id;
+        UPDATE role_sets SET refs = refs + 1 WHERE role_set_id = NEW.role_set_id;
+    END
+    ''',
+]
+
+# Queue changed members for OutboxShipper in the same transaction as the change.
+# Only present while replication is enabled, so the outbox can't grow unread.
+REPLICATION_TRIGGERS = {
+    'members_outbox_insert': '''
+    CREATE TRIGGER IF NOT EXISTS members_outbox_insert AFTER INSERT ON members
+    BEGIN
+        INSERT INTO replication_outbox (user_id, queued_at) VALUES (NEW.user_id, julianday('now'));
+    END
+    ''',
+    'members_outbox_update': '''
+    CREATE TRIGGER IF NOT EXISTS members_outbox_update AFTER UPDATE OF role_set_id, nickname ON members
+    WHEN OLD.role_set_id IS NOT NEW.role_set_id OR OLD.nickname IS NOT NEW.nickname
+    BEGIN
+        INSERT INTO replication_outbox (user_id, queued_at) VALUES (NEW.user_id, julianday('now'));
+    END
+    ''',
+    'members_outbox_delete': '''
+    CREATE TRIGGER IF NOT EXISTS members_outbox_delete AFTER DELETE ON members
+    BEGIN
+        INSERT INTO replication_outbox (user_id, queued_at) VALUES (OLD.user_id, julianday('now'));
+    END
+    ''',
+}
+
+# Stores that used to live in their own files next to the main database, and how to copy them in
+LEGACY_STORES = [
+    ('temp_roles.db', 'temp_roles', '''
+        INSERT OR IGNORE INTO main.temp_roles
+        SELECT user_id, role_id, guild_id, start_time, duration, start_message, end_message
+        FROM legacy.temp_roles
+    '''),
+    ('admin_roles.db', 'admin_roles', '''
+        INSERT OR IGNORE INTO main.admin_roles (role_id, guild_id)
+        SELECT role_id, guild_id FROM legacy.admin_roles
+    '''),
+    ('role_journal.db', 'role_journal', '''
+        INSERT OR IGNORE INTO main.role_journal
+        SELECT entry_id, kind, guild_id, user_id, payload, created_at
+        FROM legacy.role_journal
+    '''),
+    ('dm_outbox.db', 'dm_outbox', '''
+        INSERT OR IGNORE INTO main.dm_outbox
+        SELECT message_id, dedupe_key, user_id, embed, status, attempts, created_at
+        FROM legacy.dm_outbox
+    '''),
+    ('bulk_role_jobs.db', 'bulk_role_jobs', '''
+        INSERT OR IGNORE INTO main.bulk_role_jobs
+        SELECT job_id, guild_id, role_id, action, filter, channel_id, message_id, requested_by,
+               status, last_user_id, processed, failed, created_at
+        FROM legacy.bulk_role_jobs
+    '''),
+]
+
+class StorageManager:
+    """Owns the SQLite connection shared by the member, temp role, permission, journal, DM outbox and bulk role job stores
+
+    They all live in one database file, so they share pragmas, the page
+    cache and the statement cache, and a transaction() can span tables
+    atomically. Stores created before the merge are copied in on first open
+    and their old files are renamed to *.migrated.
+
+    The connection runs in autocommit mode: single statements commit on
+    their own and multi-statement work goes through transaction().
+
+    Reads that can wait for a thread go through read(), fetchone() and
+    fetchall(), which use a pool of read-only connections on worker
+    threads. WAL lets them run alongside each other and the writer, each
+    on a consistent snapshot of the last commit, so a long export doesn't
+    hold up a lookup.
+    """
+
+    def __init__(self, db_path='database/discord_bot.db', cache_size_kb=16384,
+                 mmap_size=64 * 1024 * 1024, synchronous='NORMAL', statement_cache_size=256,
+                 read_pool_size=4, replicate=False, convert_auto_vacuum=False):
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.statement_cache_size = statement_cache_size
+        self.read_pool_size = read_pool_size
+        # Queue member changes in replication_outbox for OutboxShipper
+        self.replicate = replicate
+        # Rebuild an existing database with a full VACUUM to enable incremental vacuum
+        self.convert_auto_vacuum = convert_auto_vacuum
+        self.conn = None
+        self.readers = []
+        self._idle_readers = None
+        self._depth = 0
+        # Monotonic time of the last write, used to find idle periods for maintenance
+        self.last_write = 0.0
+        # Statement label -> [calls, total seconds]
+        self.metrics = {}
+
+    def open(self):
+        """Open the database, apply settings and migrate legacy stores; safe to call again"""
+        if self.conn:
+            return
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            cached_statements=self.statement_cache_size
+        )
+        self.configure()
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.migrate_columns()
+        self.migrate_role_sets()
+        self.configure_replication()
+        self.migrate_legacy()
+        self.open_readers()
+        logger.info(f"Opened shared SQLite storage at {self.db_path}")
+
+    def open_readers(self):
+        self._idle_readers = asyncio.Queue()
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        for _ in range(self.read_pool_size):
+            reader = sqlite3.connect(
+                uri,
+                uri=True,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            # The page cache is per connection; readers get a share of the writer's
+            reader.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb) // max(self.read_pool_size, 1)}')
+            reader.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            self.readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+
+    def close(self):
+        """Close the writer and reader connections"""
+        for reader in self.readers:
+            reader.close()
+        self.readers = []
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def configure(self):
+        """Apply journal, cache and mmap settings to the connection"""
+        # auto_vacuum can only change on an empty file or through a full VACUUM
+        if self.conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            if not self.conn.execute('PRAGMA page_count').fetchone()[0]:
+                self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            elif self.convert_auto_vacuum:
+                size_mb = os.path.getsize(self.db_path) / 1048576
+                logger.warning(
+                    f"Rebuilding {self.db_path} ({size_mb:.0f} MB) with a full VACUUM to enable "
+                    f"incremental auto_vacuum; startup is blocked until it finishes"
+                )
+                started = time.monotonic()
+                self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                self.conn.execute('VACUUM')
+                logger.warning(f"VACUUM finished in {time.monotonic() - started:.1f}s")
+            else:
+                logger.info(
+                    "Incremental auto_vacuum is off for this database, so idle maintenance can't "
+                    "shrink it; set SQLITE_CONVERT_AUTO_VACUUM=true for a one-off rebuild"
+                )
+
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        self.conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        self.conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+
+    def migrate_columns(self):
+        """Add columns introduced after a table was first created"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(members)')}
+        if 'left_at' not in columns:
+            self.conn.execute('ALTER TABLE members ADD COLUMN left_at TIMESTAMP')
+        # Partial index: only departed members are ever looked up by left_at
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS members_left_at ON members (left_at) WHERE left_at IS NOT NULL'
+        )
+
+    def migrate_role_sets(self):
+        """Move members from a roles text column onto shared role_sets rows"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(members)')}
+        if 'roles' in columns:
+            started = time.monotonic()
+            with self.transaction():
+                self.conn.execute('ALTER TABLE members ADD COLUMN role_set_id INTEGER')
+                # One row per distinct stored string; differently ordered lists map to the same set
+                self.conn.execute('CREATE TEMP TABLE role_set_map (roles TEXT PRIMARY KEY, role_set_id INTEGER)')
+                for (roles,) in self.conn.execute("SELECT DISTINCT COALESCE(roles, '') FROM members").fetchall():
+                    canonical = canonical_roles(roles.split(',') if roles else ())
+                    digest = role_set_hash(canonical)
+                    self.conn.execute('INSERT OR IGNORE INTO role_sets (hash, roles) VALUES (?, ?)', (digest, canonical))
+                    self.conn.execute(
+                        'INSERT INTO role_set_map SELECT ?, role_set_id FROM role_sets WHERE hash = ?', (roles, digest)
+                    )
+                self.conn.execute('''
+                    UPDATE members SET role_set_id = (
+                        SELECT role_set_id FROM role_set_map WHERE role_set_map.roles = COALESCE(members.roles, '')
+                    )
+                ''')
+                self.conn.execute('CREATE INDEX members_role_set ON members (role_set_id)')
+                self.conn.execute('''
+                    UPDATE role_sets SET refs = (
+                        SELECT COUNT(*) FROM members WHERE members.role_set_id = role_sets.role_set_id
+                    )
+                ''')
+                self.conn.execute('DROP TABLE temp.role_set_map')
+                self.conn.execute('ALTER TABLE members DROP COLUMN roles')
+            sets, members = self.conn.execute('SELECT COUNT(*), SUM(refs) FROM role_sets').fetchone()
+            logger.info(
+                f"Moved {members or 0} members onto {sets} shared role sets "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+
+        self.conn.execute('CREATE INDEX IF NOT EXISTS members_role_set ON members (role_set_id)')
+        for statement in ROLE_SET_TRIGGERS:
+            self.conn.execute(statement)
+
+    def configure_replication(self):
+        """Add or remove the outbox triggers to match the replicate setting"""
+        enabled = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'members_outbox_insert'"
+        ).fetchone()
+        if self.replicate and not enabled:
+            # Changes made while replication was off never reached the outbox; ship everyone once
+            queued = self.conn.execute(
+                "INSERT INTO replication_outbox (user_id, queued_at) SELECT user_id, julianday('now') FROM members"
+            ).rowcount
+            logger.info(f"Replication enabled, queued all {queued} stored members for the service")
+        for name, statement in REPLICATION_TRIGGERS.items():
+            self.conn.execute(statement if self.replicate else f'DROP TRIGGER IF EXISTS {name}')
+
+    def migrate_legacy(self):
+        """Copy rows from the old per-store database files into the shared one"""
+        for filename, table, copy_sql in LEGACY_STORES:
+            path = str(Path(self.db_path).parent / filename)
+            if not os.path.exists(path) or os.path.abspath(path) == os.path.abspath(self.db_path):
+                continue
+
+            self.conn.execute('ATTACH DATABASE ? AS legacy', (path,))
+            try:
+                exists = self.conn.execute(
+                    "SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                copied = 0
+                if exists:
+                    with self.transaction():
+                        copied = self.conn.execute(copy_sql).rowcount
+            finally:
+                self.conn.execute('DETACH DATABASE legacy')
+
+            os.replace(path, f"{path}.migrated")
+            logger.info(f"Migrated {copied} {table} row(s) from {path} into {self.db_path}")
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements as one atomic transaction
+
+        Nested uses join the outer transaction. Don't await inside the block:
+        other tasks' statements would run inside it too.
+        """
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self.conn
+            finally:
+                self._depth -= 1
+            return
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        self._depth = 1
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        else:
+            self.conn.execute('COMMIT')
+            self.last_write = time.monotonic()
+        finally:
+            self._depth = 0
+
+    def _record(self, sql, started):
+        label = ' '.join(sql.split()[:5])
+        entry = self.metrics.get(label)
+        if entry is None:
+            entry = self.metrics[label] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        """Execute one statement and record its timing; returns the cursor"""
+        started = time.perf_counter()
+        cursor = self.conn.execute(sql, params)
+        self._record(sql, started)
+        if not sql.lstrip().upper().startswith('SELECT'):
+            self.last_write = time.monotonic()
+        return cursor
+
+    def executemany(self, sql, rows):
+        """Execute one statement for many parameter rows inside a transaction"""
+        started = time.perf_counter()
+        with self.transaction():
+            cursor = self.conn.executemany(sql, rows)
+        self._record(sql, started)
+        self.last_write = time.monotonic()
+        return cursor
+
+    async def read(self, fn, *args):
+        """Run fn(connection, *args) in a read transaction on a pooled reader thread
+
+        Everything fn reads comes from one snapshot. Writes still inside an
+        open transaction() are not visible. Without a pool, fn runs on the
+        writer connection in the event loop thread.
+        """
+        if not self.readers:
+            return fn(self.conn, *args)
+
+        reader = await self._idle_readers.get()
+        try:
+            return await asyncio.to_thread(self._read_snapshot, reader, fn, args)
+        finally:
+            self._idle_readers.put_nowait(reader)
+
+    @staticmethod
+    def _read_snapshot(reader, fn, args):
+        reader.execute('BEGIN')
+        try:
+            return fn(reader, *args)
+        finally:
+            reader.execute('COMMIT')
+
+    async def fetchone(self, sql, params=()):
+        """Run a query on a pooled reader and return its first row"""
+        started = time.perf_counter()
+        row = await self.read(lambda conn: conn.execute(sql, params).fetchone())
+        self._record(sql, started)
+        return row
+
+    async def fetchall(self, sql, params=()):
+        """Run a query on a pooled reader and return all rows"""
+        started = time.perf_counter()
+        rows = await self.read(lambda conn: conn.execute(sql, params).fetchall())
+        self._record(sql, started)
+        return rows
+
+    def stats(self):
+        """Per-statement call counts and timings, slowest total first"""
+        return sorted(
+            ({
+                'statement': label,
+                'calls': calls,
+                'total_ms': total * 1000,
+                'avg_ms': total * 1000 / calls,
+            } for label, (calls, total) in self.metrics.items()),
+            key=lambda entry: entry['total_ms'],
+            reverse=True
+        )
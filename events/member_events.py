@@ -2,18 +2,57 @@ import discord
 from discord.ext import commands
 import logging
 import traceback
+from events.pipeline import run_ordered
+from utils.members import resolve_member
 
 logger = logging.getLogger('bot.events')
 
 class MemberEventsCog(commands.Cog):
     """Handle member-related events"""
     
-    def __init__(self, bot, db):
+    def __init__(self, bot, db, journal=None, role_index=None, purge_history=False, pipeline=None):
         self.bot = bot
         self.db = db
+        self.journal = journal
+        # Runs the join/update/remove handlers in order per member
+        self.pipeline = pipeline
+        self.role_index = role_index
+        self.purge_history = purge_history
+        if journal:
+            journal.register('restore', self.replay_restore)
+    
+    async def replay_restore(self, guild_id, user_id, payload):
+        """Finish an interrupted restore; roles and nickname already applied are skipped"""
+        guild = self.bot.get_guild(guild_id)
+        member = await resolve_member(guild, user_id) if guild else None
+        if not member:
+            return
+        
+        bot_top_role = guild.me.top_role
+        current_roles = {role.id for role in member.roles}
+        roles = [
+            role for role in (guild.get_role(role_id) for role_id in payload['roles'])
+            if role and role < bot_top_role and role.id not in current_roles
+        ]
+        if roles:
+            await member.add_roles(*roles, reason="Automatic role restoration (resumed)")
+        if payload.get('nickname') and member.nick != payload['nickname']:
+            await member.edit(nick=payload['nickname'], reason="Automatic nickname restoration (resumed)")
+        logger.info("Resumed restore for %s (%s): %d roles added", member.name, member.id, len(roles))
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
+        await run_ordered(self.pipeline, member.guild.id, member.id, self.handle_member_join, member)
+    
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        await run_ordered(self.pipeline, after.guild.id, after.id, self.handle_member_update, before, after)
+    
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        await run_ordered(self.pipeline, member.guild.id, member.id, self.handle_member_remove, member)
+    
+    async def handle_member_join(self, member):
         """Handle when a member joins the server"""
         if member.bot:
             return
@@ -31,8 +70,8 @@ class MemberEventsCog(commands.Cog):
                 roles_to_restore = []
                 failed_roles = []
                 
-                for role_id in member_data.get('roles', []):
-                    role = member.guild.get_role(int(role_id))
+                for role_id in member_data.roles:
+                    role = member.guild.get_role(role_id)
                     if role:
                         # Check if bot can manage this role
                         if role < bot_top_role:
@@ -42,26 +81,37 @@ class MemberEventsCog(commands.Cog):
                     else:
                         failed_roles.append(f"Role {role_id} no longer exists")
                 
+                # Journal the restore so a crash part-way through gets finished on startup
+                entry_id = None
+                if self.journal and (roles_to_restore or member_data.nickname):
+                    entry_id = await self.journal.begin('restore', member.guild.id, member.id, {
+                        'roles': [role.id for role in roles_to_restore],
+                        'nickname': member_data.nickname
+                    })
+                
                 # Add roles
                 if roles_to_restore:
                     try:
                         await member.add_roles(*roles_to_restore, reason="Automatic role restoration")
-                        logger.info(f"Restored {len(roles_to_restore)} roles to {member.name} ({member.id})")
+                        logger.info("Restored %d roles to %s (%s)", len(roles_to_restore), member.name, member.id)
                     except discord.Forbidden:
                         logger.error(f"Missing permissions to restore roles for {member.name} ({member.id})")
                     except Exception as e:
                         logger.error(f"Error restoring roles for {member.name} ({member.id}): {str(e)}")
                 
                 # Restore nickname if it exists
-                if member_data.get('nickname'):
+                if member_data.nickname:
                     try:
-                        await member.edit(nick=member_data['nickname'], reason="Automatic nickname restoration")
-                        logger.info(f"Restored nickname for {member.name} ({member.id})")
+                        await member.edit(nick=member_data.nickname, reason="Automatic nickname restoration")
+                        logger.info("Restored nickname for %s (%s)", member.name, member.id)
                     except discord.Forbidden:
                         logger.error(f"Missing permissions to restore nickname for {member.name} ({member.id})")
                     except Exception as e:
                         logger.error(f"Error restoring nickname for {member.name} ({member.id}): {str(e)}")
                 
+                if entry_id:
+                    self.journal.done(entry_id)
+                
                 # Log any failed roles
                 if failed_roles:
                     logger.warning(f"Failed to restore some roles for {member.name} ({member.id}): {', '.join(failed_roles)}")
@@ -73,13 +123,12 @@ class MemberEventsCog(commands.Cog):
                 roles=roles,
                 nickname=member.nick
             )
-            logger.info(f"Stored data for member: {member.name} ({member.id})")
+            logger.info("Stored data for member: %s (%s)", member.name, member.id)
             
         except Exception as e:
             logger.error(f"Error handling member join for {member.id}: {str(e)}\n{traceback.format_exc()}")
     
-    @commands.Cog.listener()
-    async def on_member_update(self, before, after):
+    async def handle_member_update(self, before, after):
         """Handle when a member's roles or nickname changes"""
         if before.bot:
             return
@@ -95,12 +144,11 @@ class MemberEventsCog(commands.Cog):
                     roles=roles,
                     nickname=after.nick
                 )
-                logger.info(f"Updated data for member: {after.name} ({after.id})")
+                logger.info("Updated data for member: %s (%s)", after.name, after.id)
         except Exception as e:
             logger.error(f"Error handling member update for {after.id}: {str(e)}\n{traceback.format_exc()}")
     
-    @commands.Cog.listener()
-    async def on_member_remove(self, member):
+    async def handle_member_remove(self, member):
         """Handle when a member leaves the server"""
         if member.bot:
             return
@@ -111,8 +159,19 @@ class MemberEventsCog(commands.Cog):
             await self.db.update_member(
                 user_id=str(member.id),
                 roles=roles,
-                nickname=member.nick
+                nickname=member.nick,
+                left=True
             )
-            logger.info(f"Stored data for leaving member: {member.name} ({member.id})")
+            logger.info("Stored data for leaving member: %s (%s)", member.name, member.id)
+        except Exception as e:
+            logger.error(f"Error handling member remove for {member.id}: {str(e)}\n{traceback.format_exc()}")
+    
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        """Remove a deleted role from every stored member"""
+        try:
+            await self.db.purge_role(role.guild.id, role.id, role.name, self.purge_history)
+            if self.role_index:
+                self.role_index.purge_role(role.id)
         except Exception as e:
-            logger.error(f"Error handling member remove for {member.id}: {str(e)}\n{traceback.format_exc()}") 
\ No newline at end of file
+            logger.error(f"Error purging deleted role {role.id}: {str(e)}\n{traceback.format_exc()}")
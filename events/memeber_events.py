@@ -109,8 +109,8 @@ class MemberEventsCog(commands.Cog):
             roles_failed = []
             
             # Restore roles
-            for role_id in member_data.get("roles", []):
-                role = member.guild.get_role(int(role_id))
+            for role_id in member_data.roles:
+                role = member.guild.get_role(role_id)
                 
                 # Skip if role doesn't exist
                 if not role:
@@ -132,7 +132,7 @@ class MemberEventsCog(commands.Cog):
             
             # Restore nickname if it exists
             nickname_result = "No nickname to restore"
-            stored_nickname = member_data.get("nickname")
+            stored_nickname = member_data.nickname
             
             if stored_nickname:
                 try:
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger('bot.events')
+
+class MemberEventPipeline:
+    """Runs member event handlers in order per member, concurrently across members
+
+    discord.py starts every listener call as its own task, so a join, an
+    update and a remove for the same user can interleave and a stale update
+    can overwrite the leave snapshot. Here (guild, user) hashes to one of
+    `partitions` worker queues. Each worker runs its handlers one at a time,
+    so events for one member are processed in the order they arrived while
+    other partitions keep going. Partitions are bounded: submit() waits when
+    one is full, which holds back the listener instead of buffering without
+    limit. Waiting submits are admitted strictly in arrival order by the
+    worker as it takes events, so backpressure can't reorder them.
+    """
+
+    def __init__(self, partitions=8, max_queue=1000):
+        self.partitions = partitions
+        self.max_queue = max_queue
+        self.queues = []
+        # Per partition: (event, future) for submits waiting on a full queue
+        self.waiting = []
+        self.workers = []
+        # Per partition: [processed, failed, lag of the last event, worst lag]
+        self.metrics = [[0, 0, 0.0, 0.0] for _ in range(partitions)]
+
+    def start(self):
+        """Start one worker per partition"""
+        if self.workers:
+            return
+        # Unbounded; max_queue is enforced in submit() so admission stays FIFO
+        self.queues = [asyncio.Queue() for _ in range(self.partitions)]
+        self.waiting = [deque() for _ in range(self.partitions)]
+        self.workers = [
+            asyncio.create_task(self._run(partition), name=f"member-events-{partition}")
+            for partition in range(self.partitions)
+        ]
+
+    async def stop(self, timeout=10.0):
+        """Let queued events finish for up to timeout seconds, then stop the workers"""
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Stopped the member event pipeline with {sum(q.qsize() for q in self.queues)} event(s) queued "
+                f"and {sum(len(w) for w in self.waiting)} submit(s) waiting"
+            )
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        for waiting in self.waiting:
+            while waiting:
+                waiting.popleft()[1].cancel()
+
+    def partition_for(self, guild_id, user_id):
+        return hash((int(guild_id), int(user_id))) % self.partitions
+
+    async def submit(self, guild_id, user_id, handler, *args):
+        """Queue handler(*args) behind earlier events for the same member
+
+        Call it before the listener awaits anything else, so events enter
+        the queue in the order the gateway delivered them.
+        """
+        partition = self.partition_for(guild_id, user_id)
+        queue = self.queues[partition]
+        waiting = self.waiting[partition]
+        event = (time.monotonic(), handler, args)
+        if not waiting and queue.qsize() < self.max_queue:
+            queue.put_nowait(event)
+            return
+        # asyncio.Queue.put() lets a new caller take a freed slot before an
+        # older waiter wakes, so waiters are queued here and _admit() enqueues
+        # their events for them. A cancelled submit is skipped there.
+        admitted = asyncio.get_running_loop().create_future()
+        waiting.append((event, admitted))
+        await admitted
+
+    def _admit(self, partition):
+        queue = self.queues[partition]
+        waiting = self.waiting[partition]
+        while waiting and queue.qsize() < self.max_queue:
+            event, admitted = waiting.popleft()
+            if admitted.cancelled():
+                continue
+            queue.put_nowait(event)
+            admitted.set_result(None)
+
+    async def _run(self, partition):
+        queue = self.queues[partition]
+        metrics = self.metrics[partition]
+        while True:
+            queued_at, handler, args = await queue.get()
+            self._admit(partition)
+            lag = time.monotonic() - queued_at
+            metrics[2] = lag
+            metrics[3] = max(metrics[3], lag)
+            try:
+                await handler(*args)
+                metrics[0] += 1
+            except Exception as e:
+                metrics[1] += 1
+                logger.error(f"Member event handler {handler.__qualname__} failed: {str(e)}\n{traceback.format_exc()}")
+            finally:
+                queue.task_done()
+
+    def stats(self):
+        """Queue depth, throughput and lag (queued until started, in ms) per partition"""
+        return [{
+            'partition': partition,
+            'queued': self.queues[partition].qsize() if self.queues else 0,
+            'waiting': len(self.waiting[partition]) if self.waiting else 0,
+            'processed': processed,
+            'failed': failed,
+            'lag_ms': lag * 1000,
+            'worst_lag_ms': worst * 1000,
+        } for partition, (processed, failed, lag, worst) in enumerate(self.metrics)]
+
+async def run_ordered(pipeline, guild_id, user_id, handler, *args):
+    """Hand an event to the pipeline, or run it right away when there is none"""
+    if pipeline:
+        await pipeline.submit(guild_id, user_id, handler, *args)
+    else:
+        await handler(*args)
@@ -0,0 +1,93 @@
+import discord
+from discord.ext import commands
+import logging
+import traceback
+from events.pipeline import run_ordered
+
+logger = logging.getLogger('bot.events')
+
+def install_raw_member_update(bot):
+    """Dispatch GUILD_MEMBER_UPDATE payloads as on_raw_member_update
+
+    discord.py only dispatches on_member_update for cached members, so with
+    the member cache disabled role and nickname changes would be dropped.
+    This wraps the library's parser to also hand the raw payload to cogs.
+
+    discord.py has no public hook for this, so it relies on the private
+    Client._connection.parsers table (present from 2.0 through at least
+    2.7). If a discord.py upgrade changes it, this raises at startup
+    instead of silently dropping updates; tests/test_raw_member_events.py
+    checks it against the installed version.
+    """
+    parsers = getattr(getattr(bot, '_connection', None), 'parsers', None)
+    parse_member_update = parsers.get('GUILD_MEMBER_UPDATE') if isinstance(parsers, dict) else None
+    if not callable(parse_member_update):
+        raise RuntimeError(
+            f"discord.py {discord.__version__} has no GUILD_MEMBER_UPDATE parser at "
+            f"bot._connection.parsers; RAW_MEMBER_EVENTS needs updating for this version"
+        )
+
+    def parse_with_raw(data):
+        parse_member_update(data)
+        bot.dispatch('raw_member_update', data)
+
+    parsers['GUILD_MEMBER_UPDATE'] = parse_with_raw
+
+class RawMemberEventsCog(commands.Cog):
+    """Store member snapshots straight from gateway payloads
+
+    Used instead of the cached on_member_update/on_member_remove handlers
+    when the member cache is disabled. GUILD_MEMBER_UPDATE always carries
+    the member's full role list and nickname, so every update is written as
+    is. GUILD_MEMBER_REMOVE carries no roles, but the stored snapshot is
+    already the one from the member's last update, which is exactly what the
+    cached path would write on leave; it only gets its departure time.
+    """
+
+    def __init__(self, bot, db, pipeline=None):
+        self.bot = bot
+        self.db = db
+        self.pipeline = pipeline
+
+    @commands.Cog.listener()
+    async def on_raw_member_update(self, data):
+        await run_ordered(self.pipeline, int(data['guild_id']), int(data['user']['id']), self.handle_member_update, data)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        await run_ordered(self.pipeline, payload.guild_id, payload.user.id, self.handle_member_remove, payload)
+
+    async def handle_member_update(self, data):
+        """Handle a GUILD_MEMBER_UPDATE payload"""
+        user = data['user']
+        if user.get('bot'):
+            return
+
+        try:
+            await self.db.update_member(
+                user_id=user['id'],
+                roles=[int(role_id) for role_id in data.get('roles', [])],
+                nickname=data.get('nick')
+            )
+        except Exception as e:
+            logger.error(f"Error handling raw member update for {user['id']}: {str(e)}\n{traceback.format_exc()}")
+
+    async def handle_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        """Handle a GUILD_MEMBER_REMOVE payload"""
+        if payload.user.bot:
+            return
+
+        try:
+            member_data = await self.db.get_member(str(payload.user.id))
+            if member_data is None:
+                logger.warning(f"Member {payload.user.id} left guild {payload.guild_id} with no stored snapshot")
+                return
+            # Re-store the last snapshot as it is, stamped with the departure time
+            await self.db.update_member(
+                user_id=str(payload.user.id),
+                roles=member_data.roles,
+                nickname=member_data.nickname,
+                left=True
+            )
+        except Exception as e:
+            logger.error(f"Error handling raw member remove for {payload.user.id}: {str(e)}\n{traceback.format_exc()}")
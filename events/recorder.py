@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import traceback
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger('bot.events')
+
+RECORDING_VERSION = 1
+
+def read_recording(path):
+    """Yield the events of a recording in order
+
+    Each event is a dict with 't' (epoch seconds), 'e' ('join', 'update' or
+    'remove'), 'g' guild id, 'u' user id, 'r' role ids (None when the
+    gateway did not send them), 'n' nickname and 'bot' for bot accounts.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'e' in record:
+                yield record
+
+class EventRecorder(commands.Cog):
+    """Record the member events the cogs receive to a gzip JSON lines file
+
+    Only the fields the member and temp role cogs look at are kept: guild,
+    user, role ids and nickname after the event. The recording is replayed
+    with `python -m events.replay`. Events are buffered and appended from a
+    worker thread once a second, so recording never blocks the loop.
+    """
+
+    def __init__(self, bot, path, raw=False, flush_interval=1.0):
+        self.bot = bot
+        self.path = path
+        # In raw member event mode updates and removes only arrive as raw events
+        self.raw = raw
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.recorded = 0
+        self.task = None
+
+    async def cog_load(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.path):
+            self.buffer.append({'version': RECORDING_VERSION, 'started': time.time()})
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Recording member events to {self.path}")
+
+    async def cog_unload(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.to_thread(self._write, self._take())
+
+    def record(self, kind, guild_id, user_id, roles, nick, bot=False):
+        event = {
+            't': round(time.time(), 3),
+            'e': kind,
+            'g': guild_id,
+            'u': user_id,
+            'r': roles,
+            'n': nick,
+        }
+        if bot:
+            event['bot'] = True
+        self.buffer.append(event)
+        self.recorded += 1
+
+    def record_member(self, kind, member: discord.Member):
+        self.record(
+            kind, member.guild.id, member.id,
+            [role.id for role in member.roles if not role.is_default()],
+            member.nick, member.bot
+        )
+
+    def _take(self):
+        events, self.buffer = self.buffer, []
+        return events
+
+    def _write(self, events):
+        if not events:
+            return
+        # Appending opens a new gzip member each time; gzip readers concatenate them
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self._write, self._take())
+            except Exception as e:
+                logger.error(f"Failed to write event recording: {str(e)}\n{traceback.format_exc()}")
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.record_member('join', member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if not self.raw:
+            self.record_member('update', after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        if not self.raw:
+            self.record_member('remove', member)
+
+    @commands.Cog.listener()
+    async def on_raw_member_update(self, data):
+        if self.raw:
+            user = data['user']
+            self.record(
+                'update', int(data['guild_id']), int(user['id']),
+                [int(role_id) for role_id in data.get('roles', [])],
+                data.get('nick'), user.get('bot', False)
+            )
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        if self.raw:
+            # The gateway sends no roles on leave; the replayer uses the member's last known state
+            self.record('remove', payload.guild_id, payload.user.id, None, None, payload.user.bot)
@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+
+from database.db_handler import DatabaseHandler
+from database.storage import StorageManager
+from events.member_events import MemberEventsCog
+from events.recorder import read_recording
+
+logger = logging.getLogger('bot.replay')
+
+class FakeRole:
+    """Just enough of discord.Role for the member and temp role cogs"""
+
+    def __init__(self, role_id, guild, position):
+        self.id = role_id
+        self.guild = guild
+        self.position = position
+        self.name = "@everyone" if role_id == guild.id else f"role-{role_id}"
+        self.mention = f"<@&{role_id}>"
+
+    def is_default(self):
+        return self.id == self.guild.id
+
+    def __lt__(self, other):
+        return self.position < other.position
+
+    def __ge__(self, other):
+        return self.position >= other.position
+
+class FakeMember:
+    """A member whose role and nickname edits only change local state"""
+
+    def __init__(self, user_id, guild, role_ids, nick, bot=False):
+        self.id = user_id
+        self.guild = guild
+        self.name = f"user-{user_id}"
+        self.nick = nick
+        self.bot = bot
+        self.roles = [guild.default_role] + [guild.get_role(role_id) for role_id in role_ids]
+
+    @property
+    def top_role(self):
+        return max(self.roles, key=lambda role: role.position)
+
+    async def add_roles(self, *roles, reason=None):
+        self.roles += [role for role in roles if role not in self.roles]
+
+    async def remove_roles(self, *roles, reason=None):
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def edit(self, nick=None, reason=None):
+        self.nick = nick
+
+class FakeGuild:
+    def __init__(self, guild_id, bot_user_id):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.roles = {}
+        self.default_role = self.get_role(guild_id)
+        # Above every recorded role, so the cogs may manage all of them
+        self.me = FakeMember(bot_user_id, self, [], None, bot=True)
+        self.me.roles.append(FakeRole(0, self, 1 << 30))
+
+    def get_role(self, role_id):
+        role = self.roles.get(role_id)
+        if role is None:
+            role = self.roles[role_id] = FakeRole(role_id, self, len(self.roles))
+        return role
+
+    def get_member(self, user_id):
+        return self.me if user_id == self.me.id else None
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+class FakeBot:
+    def __init__(self, user_id=1):
+        self.user = FakeUser(user_id)
+        self.guilds = {}
+
+    def get_guild(self, guild_id):
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = FakeGuild(guild_id, self.user.id)
+        return guild
+
+def table_checksum(storage, sql):
+    """SHA-256 over the rows a query returns, in order"""
+    digest = hashlib.sha256()
+    for row in storage.conn.execute(sql):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+async def replay(path, speed=None, db_path=None, temp_roles=True):
+    """Feed a recording through the member and temp role cogs and DatabaseHandler
+
+    speed is a multiplier for the recorded gaps between events, or None to
+    replay as fast as possible. Handlers are awaited one event at a time,
+    so the final state only depends on the recording. Returns a report
+    with throughput and a checksum of the resulting members table.
+
+    Temp role grants and expiries are not recorded, so the temp role cog
+    only sees joins; it is fed them for timing and the temp_roles table
+    is not checksummed.
+    """
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="replay-"), "discord_bot.db")
+    storage = StorageManager(db_path)
+    db = DatabaseHandler(storage)
+    await db.connect()
+
+    bot = FakeBot()
+    member_cog = MemberEventsCog(bot, db)
+    temp_cog = None
+    if temp_roles:
+        from commands.temp import TempRole
+        # DMs are queued in the replay database's outbox, never in the bot's
+        temp_cog = TempRole(bot, storage=storage)
+
+    members = {}
+    kinds = Counter()
+    handler_time = 0.0
+    first_event = None
+    started = time.perf_counter()
+
+    for event in read_recording(path):
+        if speed:
+            first_event = first_event if first_event is not None else event['t']
+            delay = (event['t'] - first_event) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        guild = bot.get_guild(event['g'])
+        key = (event['g'], event['u'])
+        previous = members.get(key)
+        role_ids, nick = event['r'], event['n']
+        if role_ids is None:
+            # Raw removes carry no roles; use the member's last known state
+            role_ids = [role.id for role in previous.roles if not role.is_default()] if previous else []
+            nick = previous.nick if previous else None
+        member = FakeMember(event['u'], guild, role_ids, nick, event.get('bot', False))
+
+        handler_started = time.perf_counter()
+        if event['e'] == 'join':
+            members[key] = member
+            await member_cog.on_member_join(member)
+            if temp_cog:
+                await temp_cog.on_member_join(member)
+        elif event['e'] == 'update':
+            members[key] = member
+            await member_cog.on_member_update(previous or member, member)
+        elif event['e'] == 'remove':
+            members.pop(key, None)
+            await member_cog.on_member_remove(member)
+        handler_time += time.perf_counter() - handler_started
+        kinds[event['e']] += 1
+
+    elapsed = time.perf_counter() - started
+    total = sum(kinds.values())
+    report = {
+        'db_path': db_path,
+        'events': total,
+        'by_kind': dict(kinds),
+        'elapsed_s': elapsed,
+        'events_per_s': total / elapsed if elapsed else 0.0,
+        'handler_us_per_event': handler_time * 1e6 / total if total else 0.0,
+        # last_updated differs on every run, so it is left out of the checksum
+        'members_checksum': table_checksum(
+            storage, 'SELECT user_id, roles, nickname FROM members JOIN role_sets USING (role_set_id) ORDER BY user_id'
+        ),
+    }
+    await db.close()
+    storage.close()
+    return report
+
+if __name__ == "__main__":
+    # python -m events.replay recordings/events.jsonl.gz --speed 10
+    parser = argparse.ArgumentParser(description="Replay recorded member events against a scratch database")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", default="max", help="1 for real time, N for N times faster, max for no pacing")
+    parser.add_argument("--db", help="Database to replay into (default: a new temporary file)")
+    parser.add_argument("--no-temp-roles", action="store_true", help="Don't feed joins to the temp role cog")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    speed = None if args.speed == "max" else float(args.speed)
+    report = asyncio.run(replay(args.recording, speed, args.db, not args.no_temp_roles))
+
+    print(f"Replayed {report['events']} events {report['by_kind']} into {report['db_path']}")
+    print(f"  {report['elapsed_s']:.2f}s, {report['events_per_s']:.0f} events/s, "
+          f"{report['handler_us_per_event']:.0f} us handler time per event")
+    print(f"  members checksum: {report['members_checksum']}")
@@ -3,11 +3,25 @@ import sys
 import logging
 import asyncio
 import traceback
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
+from config import BOT_CONFIG
+from database.backend import create_storage_backend, create_storage_manager
+from database.role_index import RoleIndexManager
+from database.journal import RoleJournal
 from database.db_handler import DatabaseHandler
+from database.maintenance import DatabaseMaintenance
+from database.retention import MemberRetention
+from database.role_stats import RoleCountCheckpoints
+from database.replication import OutboxShipper
+from database.backup import BackupScheduler
+from events.pipeline import MemberEventPipeline
 from utils.logger import setup_logger
+from utils.members import iter_members
+from utils.permission_policy import policy
+from utils.profiling import LoopStallMonitor
 
 # Load environment variables
 load_dotenv()
@@ -27,8 +41,76 @@ intents.guilds = True
 intents.message_content = True  # Add message content intent for commands
 
 # Initialize bot with slash command support
-bot = commands.Bot(command_prefix="!", intents=intents)
-db = DatabaseHandler()
+if BOT_CONFIG["raw_member_events"]:
+    # Don't keep members in memory; member events are handled from raw gateway payloads
+    bot = commands.Bot(
+        command_prefix="!",
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
+storage = create_storage_manager(BOT_CONFIG)
+# Extensions loaded on their own find the shared storage here instead of opening a second writer
+bot.storage = storage
+db = create_storage_backend(BOT_CONFIG, storage)
+role_index = RoleIndexManager(db)
+role_stats = RoleCountCheckpoints(
+    storage,
+    role_index,
+    interval=BOT_CONFIG["role_stats_interval"],
+    keep_days=BOT_CONFIG["role_stats_keep_days"],
+)
+journal = RoleJournal(storage)
+maintenance = DatabaseMaintenance(
+    storage,
+    checkpoint_interval=BOT_CONFIG["db_checkpoint_interval"],
+    optimize_interval=BOT_CONFIG["db_optimize_interval"],
+    idle_seconds=BOT_CONFIG["db_idle_seconds"],
+    vacuum_pages=BOT_CONFIG["db_vacuum_pages"],
+    role_sets=db.role_sets if isinstance(db, DatabaseHandler) else None,
+)
+retention = None
+if BOT_CONFIG["member_retention_days"] > 0 and isinstance(db, DatabaseHandler):
+    def forget_evicted(user_ids):
+        for user_id in user_ids:
+            role_index.remove_member(user_id)
+
+    retention = MemberRetention(
+        storage,
+        BOT_CONFIG["member_retention_days"],
+        interval=BOT_CONFIG["member_retention_interval"],
+        on_evicted=forget_evicted,
+    )
+replication = None
+if BOT_CONFIG["replicate_to_service"] and isinstance(db, DatabaseHandler):
+    replication = OutboxShipper(
+        storage,
+        BOT_CONFIG["service_url"],
+        api_key=BOT_CONFIG["service_api_key"],
+        timeout=BOT_CONFIG["service_timeout"],
+        batch_size=BOT_CONFIG["service_batch_size"],
+        interval=BOT_CONFIG["replication_interval"],
+        pool_size=BOT_CONFIG["service_pool_size"],
+    )
+pipeline = None
+if BOT_CONFIG["event_pipeline_partitions"] > 0:
+    pipeline = MemberEventPipeline(
+        BOT_CONFIG["event_pipeline_partitions"],
+        max_queue=BOT_CONFIG["event_pipeline_queue_size"],
+    )
+loop_monitor = None
+if BOT_CONFIG["loop_stall_threshold"] > 0:
+    loop_monitor = LoopStallMonitor(threshold=BOT_CONFIG["loop_stall_threshold"])
+backups = None
+if BOT_CONFIG["backup_enabled"]:
+    backups = BackupScheduler(
+        backup_dir=BOT_CONFIG["backup_dir"],
+        interval_hours=BOT_CONFIG["backup_interval_hours"],
+        keep=BOT_CONFIG["backup_keep"],
+        max_age_days=BOT_CONFIG["backup_max_age_days"],
+    )
 
 async def log_to_channel(message):
     """Send logs to Discord channel if configured"""
@@ -59,7 +141,17 @@ async def on_ready():
         logger.error(f"Failed to sync commands: {e}")
         await log_to_channel(f"ERROR: Failed to sync commands: {e}")
     
+    # Finish role operations interrupted by a crash
+    try:
+        replayed = await journal.replay()
+        if replayed:
+            await log_to_channel(f"Resumed {replayed} interrupted role operation(s)")
+    except Exception as e:
+        logger.error(f"Failed to replay role journal: {e}")
+    
     # Load all member data on startup
+    sync_started = datetime.now(timezone.utc)
+    all_synced = True
     for guild in bot.guilds:
         message = f"Connected to guild: {guild.name} (id: {guild.id})"
         logger.info(message)
@@ -67,18 +159,26 @@ async def on_ready():
         
         try:
             # Fetch and store all members
-            await fetch_all_members(guild)
+            all_synced = await fetch_all_members(guild) and all_synced
         except Exception as e:
+            all_synced = False
             error_msg = f"Error processing guild {guild.name}: {str(e)}"
             logger.error(error_msg)
             await log_to_channel(f"ERROR: {error_msg}")
+    
+    # Anyone the sync didn't refresh is no longer in any guild
+    if retention and all_synced:
+        try:
+            await retention.mark_unseen(sync_started)
+        except Exception as e:
+            logger.error(f"Failed to mark departed members: {e}")
 
 async def fetch_all_members(guild):
-    """Fetch and store all members' data"""
+    """Fetch and store all members' data; returns True if every member was stored"""
     try:
         members_processed = 0
         errors = 0
-        for member in guild.members:
+        async for member in iter_members(guild):
             if not member.bot:  # Skip bots
                 try:
                     # Get roles (excluding @everyone)
@@ -101,10 +201,12 @@ async def fetch_all_members(guild):
         message = f"Stored data for {members_processed} members in {guild.name} ({errors} errors)"
         logger.info(message)
         await log_to_channel(message)
+        return errors == 0
     except Exception as e:
         error_msg = f"Error fetching members: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
         await log_to_channel(f"ERROR: {error_msg}")
+        return False
 
 # Load command extensions
 async def load_extensions():
@@ -114,11 +216,27 @@ async def load_extensions():
         from events.member_events import MemberEventsCog
         from commands.all_slash_commands import CommandsCog
         from commands.temp import TempRole
+        from commands.whohas import RoleIndexCog
+        from commands.bulk_roles import BulkRoles
+        from commands.permissions import PermissionsCog
+        from commands.profiling import ProfilingCog
         
         # Add the cogs
-        await bot.add_cog(CommandsCog(bot, db))
-        await bot.add_cog(MemberEventsCog(bot, db))
-        await bot.add_cog(TempRole(bot))
+        await bot.add_cog(CommandsCog(bot, db, role_index, journal, maintenance, storage, replication))
+        await bot.add_cog(MemberEventsCog(bot, db, journal, role_index, BOT_CONFIG["role_purge_history"], pipeline))
+        if BOT_CONFIG["raw_member_events"]:
+            # on_member_update/remove only fire for cached members; joins still go through MemberEventsCog
+            from events.raw_member_events import RawMemberEventsCog, install_raw_member_update
+            install_raw_member_update(bot)
+            await bot.add_cog(RawMemberEventsCog(bot, db, pipeline))
+        await bot.add_cog(TempRole(bot, journal, storage, pipeline=pipeline, role_index=role_index))
+        await bot.add_cog(RoleIndexCog(bot, role_index, role_stats))
+        await bot.add_cog(BulkRoles(bot, db, storage, role_index))
+        await bot.add_cog(PermissionsCog(bot, policy))
+        await bot.add_cog(ProfilingCog(bot, loop_monitor, pipeline))
+        if BOT_CONFIG["record_events_path"]:
+            from events.recorder import EventRecorder
+            await bot.add_cog(EventRecorder(bot, BOT_CONFIG["record_events_path"], raw=BOT_CONFIG["raw_member_events"]))
         logger.info("Successfully loaded all extensions")
     except Exception as e:
         error_msg = f"Failed to load extensions: {str(e)}\n{traceback.format_exc()}"
@@ -130,8 +248,24 @@ async def load_extensions():
 async def main():
     """Main entry point for the bot"""
     try:
+        if loop_monitor:
+            loop_monitor.start()
+        
         # Initialize database connection
+        storage.open()
+        policy.attach(storage)
         await db.connect()
+        journal.open()
+        maintenance.start()
+        role_stats.start()
+        if retention:
+            retention.start()
+        if backups:
+            backups.start()
+        if replication:
+            replication.start()
+        if pipeline:
+            pipeline.start()
         
         # Load extensions
         await load_extensions()
@@ -145,7 +279,21 @@ async def main():
         await log_to_channel(f"CRITICAL ERROR: {error_msg}")
     finally:
         # Ensure database connection is closed
+        if pipeline:
+            await pipeline.stop()
+        if backups:
+            await backups.stop()
+        if replication:
+            await replication.stop()
+        await maintenance.stop()
+        await role_stats.stop()
+        if retention:
+            await retention.stop()
+        if loop_monitor:
+            await loop_monitor.stop()
+        await journal.close()
         await db.close()
+        storage.close()
 
 if __name__ == "__main__":
     try:
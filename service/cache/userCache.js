@@ -0,0 +1,123 @@
+const crypto = require('crypto');
+require('dotenv').config();
+
+// Maximum number of user documents kept in memory
+const MAX_ENTRIES = parseInt(process.env.USER_CACHE_SIZE, 10) || 5000;
+
+/**
+ * Bounded LRU cache of user documents keyed by user_id
+ * A Map keeps insertion order, so re-inserting on access moves an entry
+ * to the most recently used end and the first key is always the oldest
+ */
+const entries = new Map();
+
+// Bumped on every invalidation so a read that raced a write never caches stale data
+let generation = 0;
+
+const stats = {
+  hits: 0,
+  misses: 0,
+  notModified: 0,
+  evictions: 0,
+  invalidations: 0,
+};
+
+/**
+ * Build a strong ETag from the serialized response body
+ */
+const computeETag = (body) => {
+  const hash = crypto.createHash('sha1').update(JSON.stringify(body)).digest('base64');
+  return `"${hash}"`;
+};
+
+/**
+ * Get a cached entry ({ body, etag }) and mark it as recently used
+ */
+const get = (userId) => {
+  const entry = entries.get(userId);
+  if (!entry) {
+    stats.misses++;
+    return null;
+  }
+  
+  entries.delete(userId);
+  entries.set(userId, entry);
+  stats.hits++;
+  return entry;
+};
+
+/**
+ * Current invalidation generation; pass it back to set() after a database read
+ */
+const currentGeneration = () => generation;
+
+/**
+ * Cache a response body for a user, evicting the least recently used entry if full
+ * The entry is only stored if nothing was invalidated since readGeneration
+ */
+const set = (userId, body, readGeneration = generation) => {
+  const entry = { body, etag: computeETag(body) };
+  
+  if (readGeneration !== generation) {
+    return entry;
+  }
+  
+  entries.delete(userId);
+  entries.set(userId, entry);
+  
+  if (entries.size > MAX_ENTRIES) {
+    entries.delete(entries.keys().next().value);
+    stats.evictions++;
+  }
+  
+  return entry;
+};
+
+/**
+ * Drop a user from the cache after it was written or deleted
+ */
+const invalidate = (userId) => {
+  generation++;
+  if (entries.delete(userId)) {
+    stats.invalidations++;
+  }
+};
+
+/**
+ * Drop every cached user
+ */
+const clear = () => {
+  generation++;
+  stats.invalidations += entries.size;
+  entries.clear();
+};
+
+/**
+ * Record a conditional GET answered with 304
+ */
+const recordNotModified = () => {
+  stats.notModified++;
+};
+
+/**
+ * Snapshot of cache counters for the admin stats route
+ */
+const getStats = () => {
+  const lookups = stats.hits + stats.misses;
+  return {
+    size: entries.size,
+    maxEntries: MAX_ENTRIES,
+    ...stats,
+    hitRate: lookups === 0 ? 0 : stats.hits / lookups,
+  };
+};
+
+module.exports = {
+  get,
+  set,
+  currentGeneration,
+  invalidate,
+  clear,
+  recordNotModified,
+  getStats,
+};
@@ -11,6 +11,37 @@ let client = null;
 let db = null;
 let membersCollection = null;
 
+// Name of the multikey index serving role-filtered listings
+const ROLES_INDEX = 'roles_user_id';
+
+/**
+ * Flatten an explain() winning plan into its stages, outermost first
+ * e.g. ['LIMIT', 'FETCH', 'IXSCAN roles_user_id']
+ */
+function planStages(plan) {
+  const stages = [];
+  const visit = (stage) => {
+    if (!stage) return;
+    stages.push(stage.indexName ? `${stage.stage} ${stage.indexName}` : stage.stage);
+    visit(stage.inputStage);
+    (stage.inputStages || []).forEach(visit);
+  };
+  const winningPlan = plan.queryPlanner ? plan.queryPlanner.winningPlan : plan;
+  // Plans run by the slot based engine (MongoDB 7+) nest the classic plan under queryPlan
+  visit(winningPlan.queryPlan || winningPlan);
+  return stages;
+}
+
+// Make sure role queries can use the roles index instead of scanning the collection
+async function checkRoleQueryPlan(collection) {
+  const plan = await collection.find({ roles: '0' }).sort({ user_id: 1 }).limit(1).explain('queryPlanner');
+  const stages = planStages(plan);
+  if (!stages.includes(`IXSCAN ${ROLES_INDEX}`)) {
+    console.warn(`Role queries are not using the ${ROLES_INDEX} index: ${stages.join(' <- ')}`);
+  }
+  return stages;
+}
+
 // Connect to MongoDB
 async function connectToDatabase() {
   if (client) return { db, membersCollection };
@@ -43,6 +74,11 @@ async function connectToDatabase() {
       console.log('Created index on user_id field');
     }
     
+    // Multikey index: one entry per role of every member, ordered by user_id within a role
+    // so role listings can page by user_id without a sort
+    await membersCollection.createIndex({ roles: 1, user_id: 1 }, { name: ROLES_INDEX });
+    await checkRoleQueryPlan(membersCollection);
+    
     return { db, membersCollection };
   } catch (error) {
     console.error('MongoDB connection error:', error);
@@ -71,6 +107,8 @@ async function getMembersCollection() {
 }
 
 module.exports = {
+  ROLES_INDEX,
+  planStages,
   connectToDatabase,
   closeConnection,
   getMembersCollection,
@@ -1,50 +1,171 @@
+const DISCORD_ID_PATTERN = /^\d+$/;
+
+// Maximum number of records accepted by a single bulk request
+const BULK_MAX_RECORDS = parseInt(process.env.BULK_MAX_RECORDS, 10) || 1000;
+
+// Page sizes for role-filtered listings
+const QUERY_DEFAULT_LIMIT = 100;
+const QUERY_MAX_LIMIT = parseInt(process.env.QUERY_MAX_LIMIT, 10) || 1000;
+
+// Fields a listing may project
+const QUERYABLE_FIELDS = ['user_id', 'roles', 'nickname'];
+
 /**
- * Validate user data for create/update operations
+ * Check a single user record
+ * Returns an error message, or null if the record is valid
  */
-const validateUserData = (req, res, next) => {
-    const { user_id, roles } = req.body;
+const checkUserRecord = (record) => {
+    if (!record || typeof record !== 'object') {
+      return 'record must be an object';
+    }
+    
+    const { user_id, roles } = record;
     
     // Check required fields
     if (!user_id) {
-      return res.status(400).json({
-        success: false,
-        message: 'user_id is required'
-      });
+      return 'user_id is required';
     }
     
     // Validate user_id format (should be a string with valid characters)
-    if (typeof user_id !== 'string' || !/^\d+$/.test(user_id)) {
-      return res.status(400).json({
-        success: false,
-        message: 'user_id must be a valid Discord user ID (string of numbers)'
-      });
+    if (typeof user_id !== 'string' || !DISCORD_ID_PATTERN.test(user_id)) {
+      return 'user_id must be a valid Discord user ID (string of numbers)';
     }
     
     // Validate roles if provided
     if (roles !== undefined) {
       // Roles should be an array
       if (!Array.isArray(roles)) {
-        return res.status(400).json({
-          success: false,
-          message: 'roles must be an array'
-        });
+        return 'roles must be an array';
       }
       
       // Validate each role ID
-      for (const roleId of roles) {
-        if (typeof roleId !== 'string' || !/^\d+$/.test(roleId)) {
-          return res.status(400).json({
-            success: false,
-            message: 'Each role ID must be a valid Discord role ID (string of numbers)'
-          });
-        }
+      if (!roles.every(roleId => typeof roleId === 'string' && DISCORD_ID_PATTERN.test(roleId))) {
+        return 'Each role ID must be a valid Discord role ID (string of numbers)';
       }
     }
     
+    return null;
+  };
+
+/**
+ * Validate user data for create/update operations
+ */
+const validateUserData = (req, res, next) => {
+    const error = checkUserRecord(req.body);
+    
+    if (error) {
+      return res.status(400).json({
+        success: false,
+        message: error
+      });
+    }
+    
     // All validations passed
     next();
   };
   
+  /**
+   * Validate a batch of user records for bulk create/update
+   * Rejects malformed batches outright; per-record errors are stored on
+   * req.bulkErrors (index -> message) so valid records can still be written
+   */
+  const validateUserBatch = (req, res, next) => {
+    const { users } = req.body || {};
+    
+    if (!Array.isArray(users) || users.length === 0) {
+      return res.status(400).json({
+        success: false,
+        message: 'users must be a non-empty array'
+      });
+    }
+    
+    if (users.length > BULK_MAX_RECORDS) {
+      return res.status(413).json({
+        success: false,
+        message: `A bulk request may contain at most ${BULK_MAX_RECORDS} users`
+      });
+    }
+    
+    // Run the single-record checks over the whole batch and flag repeated
+    // user IDs, since an unordered write gives no ordering between them
+    const errors = new Map();
+    const seen = new Set();
+    users.forEach((record, index) => {
+      const error = checkUserRecord(record);
+      if (error) {
+        errors.set(index, error);
+      } else if (seen.has(record.user_id)) {
+        errors.set(index, 'Duplicate user_id in batch');
+      } else {
+        seen.add(record.user_id);
+      }
+    });
+    
+    req.bulkErrors = errors;
+    next();
+  };
+  
+  /**
+   * Split a comma separated query parameter of Discord IDs
+   * Returns the list, or null if any entry is not an ID
+   */
+  const parseIdList = (value) => {
+    if (value === undefined) return [];
+    const ids = String(value).split(',').map(id => id.trim()).filter(Boolean);
+    return ids.every(id => DISCORD_ID_PATTERN.test(id)) ? ids : null;
+  };
+  
+  /**
+   * Validate a role-filtered listing: role, all and any hold role IDs,
+   * fields picks the projection, after and limit page through the results
+   * Stores the parsed query on req.roleQuery
+   */
+  const validateRoleQuery = (req, res, next) => {
+    const { role, all, any, fields, after, limit } = req.query;
+    
+    const allRoles = parseIdList(all);
+    const anyRoles = parseIdList(any);
+    const roleIds = parseIdList(role);
+    if (!allRoles || !anyRoles || !roleIds) {
+      return res.status(400).json({
+        success: false,
+        message: 'role, all and any must be comma separated Discord role IDs'
+      });
+    }
+    
+    const projection = fields ? String(fields).split(',').map(field => field.trim()) : QUERYABLE_FIELDS;
+    if (!projection.every(field => QUERYABLE_FIELDS.includes(field))) {
+      return res.status(400).json({
+        success: false,
+        message: `fields may only contain ${QUERYABLE_FIELDS.join(', ')}`
+      });
+    }
+    
+    if (after !== undefined && !DISCORD_ID_PATTERN.test(after)) {
+      return res.status(400).json({
+        success: false,
+        message: 'after must be a user ID from a previous page'
+      });
+    }
+    
+    const pageSize = limit === undefined ? QUERY_DEFAULT_LIMIT : parseInt(limit, 10);
+    if (!Number.isInteger(pageSize) || pageSize < 1 || pageSize > QUERY_MAX_LIMIT) {
+      return res.status(400).json({
+        success: false,
+        message: `limit must be between 1 and ${QUERY_MAX_LIMIT}`
+      });
+    }
+    
+    req.roleQuery = {
+      all: [...new Set([...roleIds, ...allRoles])],
+      any: anyRoles,
+      fields: projection,
+      after,
+      limit: pageSize
+    };
+    next();
+  };
+  
   /**
    * Check if user is an admin
    * Currently using the API key approach - all authenticated users
@@ -69,6 +190,10 @@ const validateUserData = (req, res, next) => {
   };
   
   module.exports = {
+    BULK_MAX_RECORDS,
+    checkUserRecord,
     validateUserData,
+    validateUserBatch,
+    validateRoleQuery,
     isAdminUser
   };
\ No newline at end of file
@@ -1,9 +1,74 @@
 const express = require('express');
-const { getMembersCollection } = require('../db/mongo');
-const { validateUserData, isAdminUser } = require('../middleware/validators');
+const { getMembersCollection, planStages } = require('../db/mongo');
+const { validateUserData, validateUserBatch, validateRoleQuery, isAdminUser } = require('../middleware/validators');
+const userCache = require('../cache/userCache');
 
 const router = express.Router();
 
+/**
+ * Check an If-None-Match header against a strong ETag
+ */
+const etagMatches = (ifNoneMatch, etag) => {
+  if (!ifNoneMatch) return false;
+  if (ifNoneMatch.trim() === '*') return true;
+  return ifNoneMatch.split(',').some(tag => tag.trim() === etag);
+};
+
+// Query parameters that turn GET /api/users into a filtered, paged listing
+const LISTING_PARAMS = ['role', 'all', 'any', 'fields', 'after', 'limit', 'explain'];
+
+/**
+ * GET /api/users?role=&all=&any=&fields=&after=&limit=
+ * List users holding a role (role), every role in a list (all) and/or
+ * at least one role in a list (any), sorted by user_id
+ * Pages by keyset: pass the returned next as after to get the next page
+ * explain=true returns the query plan instead of the users
+ * Admin only
+ */
+router.get('/', isAdminUser, (req, res, next) => {
+  next(LISTING_PARAMS.some(param => req.query[param] !== undefined) ? undefined : 'route');
+}, validateRoleQuery, async (req, res, next) => {
+  try {
+    const { all, any, fields, after, limit } = req.roleQuery;
+    const filter = {};
+    if (all.length || any.length) {
+      filter.roles = {};
+      if (all.length) filter.roles.$all = all;
+      if (any.length) filter.roles.$in = any;
+    }
+    if (after) {
+      filter.user_id = { $gt: after };
+    }
+    
+    const projection = { _id: 0, user_id: 1 };
+    fields.forEach(field => { projection[field] = 1; });
+    
+    const collection = await getMembersCollection();
+    const cursor = collection.find(filter, { projection }).sort({ user_id: 1 }).limit(limit);
+    
+    if (req.query.explain === 'true') {
+      const plan = await cursor.explain('executionStats');
+      return res.status(200).json({
+        success: true,
+        stages: planStages(plan),
+        keysExamined: plan.executionStats.totalKeysExamined,
+        docsExamined: plan.executionStats.totalDocsExamined,
+        returned: plan.executionStats.nReturned
+      });
+    }
+    
+    const users = await cursor.toArray();
+    res.status(200).json({
+      success: true,
+      count: users.length,
+      data: users,
+      next: users.length === limit ? users[users.length - 1].user_id : null
+    });
+  } catch (error) {
+    next(error);
+  }
+});
+
 /**
  * GET /api/users
  * Get all users
@@ -24,9 +89,22 @@ router.get('/', isAdminUser, async (req, res, next) => {
   }
 });
 
+/**
+ * GET /api/users/stats/cache
+ * User cache hit rates
+ * Admin only
+ */
+router.get('/stats/cache', isAdminUser, (req, res) => {
+  res.status(200).json({
+    success: true,
+    data: userCache.getStats()
+  });
+});
+
 /**
  * GET /api/users/:id
  * Get user by ID
+ * Served from the in-process cache when possible; supports If-None-Match
  */
 router.get('/:id', async (req, res, next) => {
   try {
@@ -40,20 +118,31 @@ router.get('/:id', async (req, res, next) => {
       });
     }
     
-    const collection = await getMembersCollection();
-    const user = await collection.findOne({ user_id: userId });
+    let entry = userCache.get(userId);
     
-    if (!user) {
-      return res.status(404).json({
-        success: false,
-        message: 'User not found'
-      });
+    if (!entry) {
+      const generation = userCache.currentGeneration();
+      const collection = await getMembersCollection();
+      const user = await collection.findOne({ user_id: userId });
+      
+      if (!user) {
+        return res.status(404).json({
+          success: false,
+          message: 'User not found'
+        });
+      }
+      
+      entry = userCache.set(userId, { success: true, data: user }, generation);
     }
     
-    res.status(200).json({
-      success: true,
-      data: user
-    });
+    res.set('ETag', entry.etag);
+    
+    if (etagMatches(req.headers['if-none-match'], entry.etag)) {
+      userCache.recordNotModified();
+      return res.status(304).end();
+    }
+    
+    res.status(200).json(entry.body);
   } catch (error) {
     next(error);
   }
@@ -75,6 +164,7 @@ router.post('/', validateUserData, async (req, res, next) => {
       { $set: { roles, nickname } },
       { upsert: true }
     );
+    userCache.invalidate(user_id);
     
     const isNewUser = result.upsertedCount === 1;
     
@@ -95,6 +185,93 @@ router.post('/', validateUserData, async (req, res, next) => {
   }
 });
 
+/**
+ * POST /api/users/bulk
+ * Create or update many users in one unordered bulkWrite
+ * Returns a result for every submitted record, in request order
+ */
+router.post('/bulk', validateUserBatch, async (req, res, next) => {
+  try {
+    const { users } = req.body;
+    const results = new Array(users.length);
+    const operations = [];
+    const opIndexes = [];
+    
+    users.forEach((record, index) => {
+      if (req.bulkErrors.has(index)) {
+        results[index] = {
+          index,
+          user_id: record && record.user_id,
+          success: false,
+          message: req.bulkErrors.get(index)
+        };
+        return;
+      }
+      
+      const { user_id, roles, nickname } = record;
+      operations.push({
+        updateOne: {
+          filter: { user_id },
+          update: { $set: { roles, nickname } },
+          upsert: true
+        }
+      });
+      opIndexes.push(index);
+    });
+    
+    let upsertedIds = {};
+    const writeErrors = new Map();
+    
+    if (operations.length > 0) {
+      const collection = await getMembersCollection();
+      
+      try {
+        const result = await collection.bulkWrite(operations, { ordered: false });
+        upsertedIds = result.upsertedIds || {};
+      } catch (error) {
+        // Unordered writes keep going past failures; collect them per operation
+        if (!error.writeErrors) {
+          throw error;
+        }
+        upsertedIds = (error.result && error.result.upsertedIds) || {};
+        const failed = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors];
+        for (const writeError of failed) {
+          writeErrors.set(writeError.index, writeError.code === 11000 ? 'Duplicate user ID' : writeError.errmsg);
+        }
+      } finally {
+        operations.forEach(op => userCache.invalidate(op.updateOne.filter.user_id));
+      }
+    }
+    
+    opIndexes.forEach((index, opIndex) => {
+      const { user_id } = users[index];
+      if (writeErrors.has(opIndex)) {
+        results[index] = { index, user_id, success: false, message: writeErrors.get(opIndex) };
+      } else {
+        const isNewUser = upsertedIds[opIndex] !== undefined;
+        results[index] = {
+          index,
+          user_id,
+          success: true,
+          message: isNewUser ? 'User created' : 'User updated'
+        };
+      }
+    });
+    
+    const failedCount = results.filter(result => !result.success).length;
+    
+    res.status(failedCount > 0 ? 207 : 200).json({
+      success: failedCount === 0,
+      count: users.length,
+      written: users.length - failedCount,
+      failed: failedCount,
+      results
+    });
+  } catch (error) {
+    next(error);
+  }
+});
+
 /**
  * DELETE /api/users/:id
  * Delete user by ID
@@ -113,6 +290,7 @@ router.delete('/:id', async (req, res, next) => {
     
     const collection = await getMembersCollection();
     const result = await collection.deleteOne({ user_id: userId });
+    userCache.invalidate(userId);
     
     if (result.deletedCount === 0) {
       return res.status(404).json({
@@ -138,6 +316,7 @@ router.delete('/', isAdminUser, async (req, res, next) => {
   try {
     const collection = await getMembersCollection();
     const result = await collection.deleteMany({});
+    userCache.clear();
     
     res.status(200).json({
       success: true,
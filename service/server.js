@@ -19,19 +19,41 @@ app.use(cors({
   methods: ['GET', 'POST', 'DELETE'],
 }));
 
+// The bot authenticates with API_KEY and syncs whole guilds through the bulk
+// endpoint, so it gets its own, much larger budget than anonymous clients
+const isServiceClient = (req) => Boolean(process.env.API_KEY) && req.headers['x-api-key'] === process.env.API_KEY;
+
 // Rate limiting
 const limiter = rateLimit({
   windowMs: 15 * 60 * 1000, // 15 minutes
   max: 100, // Limit each IP to 100 requests per windowMs
   standardHeaders: true,
   legacyHeaders: false,
+  // Bulk sync traffic has its own budget below
+  skip: (req) => req.path === '/api/users/bulk',
 });
 app.use(limiter);
 
+// Bulk endpoint rate limiting: fewer, much larger requests
+// A full sync sends one request per batch of members (500 by default), so a
+// large guild needs hundreds of requests at startup
+const bulkLimiter = rateLimit({
+  windowMs: 15 * 60 * 1000, // 15 minutes
+  max: (req) => (isServiceClient(req)
+    ? parseInt(process.env.BULK_CLIENT_RATE_LIMIT, 10) || 5000
+    : parseInt(process.env.BULK_RATE_LIMIT, 10) || 60),
+  keyGenerator: (req) => (isServiceClient(req) ? 'service-client' : req.ip),
+  standardHeaders: true,
+  legacyHeaders: false,
+});
+app.use('/api/users/bulk', bulkLimiter);
+
 // Logging middleware
 app.use(morgan('combined'));
 
 // Body parsing middleware
+// Bulk requests get a larger body limit; parsed bodies are skipped by the generic parser
+app.use('/api/users/bulk', express.json({ limit: process.env.BULK_BODY_LIMIT || '5mb' }));
 app.use(express.json());
 app.use(express.urlencoded({ extended: true }));
 
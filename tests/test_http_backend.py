@@ -0,0 +1,136 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from database.http_backend import HttpBackend
+
+class StubService:
+    """Stand-in for the REST service in service/ that records what it receives"""
+
+    def __init__(self):
+        self.bulk_calls = []
+        self.stored = {}
+        # Responses to give the next bulk requests before accepting them
+        self.failures = []
+        self.delay = 0.0
+        self.member_body = None
+        app = web.Application()
+        app.router.add_post('/api/users/bulk', self.bulk)
+        app.router.add_get('/api/users/{user_id}', self.get_user)
+        self.server = TestServer(app)
+
+    async def bulk(self, request):
+        body = await request.json()
+        self.bulk_calls.append(body['users'])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            return self.failures.pop(0)
+        for user in body['users']:
+            self.stored[user['user_id']] = user
+        return web.json_response({'results': [{'user_id': u['user_id'], 'success': True} for u in body['users']]})
+
+    async def get_user(self, request):
+        if self.member_body is not None:
+            return web.Response(text=self.member_body, content_type='application/json')
+        user = self.stored.get(request.match_info['user_id'])
+        if user is None:
+            return web.json_response({'success': False}, status=404)
+        return web.json_response({'data': user})
+
+class HttpBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = StubService()
+        await self.service.server.start_server()
+        # Cleanups run last-in first-out, so backends close before the server goes away
+        self.addAsyncCleanup(self.service.server.close)
+
+    async def connect(self, **kwargs):
+        kwargs.setdefault('flush_interval', 0.05)
+        kwargs.setdefault('close_timeout', 1.0)
+        backend = HttpBackend(str(self.service.server.make_url('')), **kwargs)
+        await backend.connect()
+        self.addAsyncCleanup(backend.close)
+        return backend
+
+    async def test_writes_are_batched(self):
+        backend = await self.connect(batch_size=2, flush_interval=10)
+        for user_id in range(5):
+            await backend.update_member(user_id, [1, 2], f"nick-{user_id}")
+        self.assertTrue(await backend.flush())
+        self.assertEqual(sorted(len(users) for users in self.service.bulk_calls), [1, 2, 2])
+        self.assertEqual(self.service.stored['3'], {'user_id': '3', 'roles': ['1', '2'], 'nickname': 'nick-3'})
+
+    async def test_latest_write_wins_within_a_batch(self):
+        backend = await self.connect(flush_interval=10)
+        await backend.update_member(1, [1], 'old')
+        await backend.update_member(1, [2], 'new')
+        await backend.flush()
+        self.assertEqual(self.service.bulk_calls, [[{'user_id': '1', 'roles': ['2'], 'nickname': 'new'}]])
+
+    async def test_reads_see_buffered_writes(self):
+        backend = await self.connect(flush_interval=10)
+        await backend.update_member(7, [3], 'pending')
+        member = await backend.get_member(7)
+        self.assertEqual((list(member.roles), member.nickname), ([3], 'pending'))
+        self.assertEqual(self.service.bulk_calls, [])
+
+    async def test_plain_text_rate_limit_is_requeued_and_retried_after(self):
+        self.service.failures = [web.Response(status=429, text='Too many requests', headers={'Retry-After': '0.2'})]
+        backend = await self.connect(flush_interval=10)
+        for user_id in range(5):
+            await backend.update_member(user_id, [1])
+        self.assertFalse(await backend.flush())
+        self.assertEqual(len(backend._pending), 5)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.assertTrue(await backend.flush())
+        self.assertGreaterEqual(loop.time() - started, 0.15)
+        self.assertEqual(len(self.service.stored), 5)
+
+    async def test_backoff_doubles_without_retry_after(self):
+        self.service.failures = [web.Response(status=502, text='bad gateway') for _ in range(3)]
+        backend = await self.connect(flush_interval=0.05, max_backoff=0.1)
+        await backend.update_member(1, [1])
+        for _ in range(3):
+            await backend.flush()
+        self.assertEqual(backend._backoff, 0.1)
+        self.assertTrue(await backend.flush())
+        self.assertEqual(backend._backoff, 0.05)
+
+    async def test_newer_write_survives_a_failed_batch(self):
+        self.service.failures = [web.Response(status=500, text='error')]
+        backend = await self.connect(flush_interval=10)
+        await backend.update_member(1, [1], 'old')
+        backend._start_batches()
+        await backend.update_member(1, [2], 'new')
+        await asyncio.gather(*backend._batches)
+        self.assertEqual(backend._pending['1'], ([2], 'new'))
+
+    async def test_timeout_requeues_the_batch(self):
+        self.service.delay = 0.5
+        backend = await self.connect(timeout=0.1, flush_interval=10)
+        await backend.update_member(1, [1])
+        self.assertFalse(await backend.flush())
+        self.assertIn('1', backend._pending)
+
+    async def test_close_keeps_writes_the_service_never_accepts(self):
+        self.service.failures = [web.Response(status=503, text='down') for _ in range(100)]
+        backend = HttpBackend(str(self.service.server.make_url('')), flush_interval=0.05,
+                              max_backoff=0.05, close_timeout=0.3)
+        await backend.connect()
+        await backend.update_member(1, [1])
+        await backend.close()
+        self.assertIn('1', backend._pending)
+
+    async def test_get_member_handles_missing_and_malformed_responses(self):
+        backend = await self.connect()
+        self.assertIsNone(await backend.get_member(404))
+        self.service.member_body = 'not json'
+        self.assertIsNone(await backend.get_member(1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from database.journal import RoleJournal
+from database.storage import StorageManager
+
+class RoleJournalTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = StorageManager(os.path.join(self.dir, 'discord_bot.db'))
+        self.journal = RoleJournal(self.storage, flush_interval=0)
+        self.journal.open()
+
+    async def asyncTearDown(self):
+        await self.journal.close()
+        self.storage.close()
+
+    def entries(self):
+        return [row[0] for row in self.storage.execute('SELECT entry_id FROM role_journal ORDER BY entry_id')]
+
+    async def test_complete_commits_with_the_protected_change(self):
+        entry_id = await self.journal.begin('temp_expire', 1, 2, {'role_id': 3})
+        self.storage.execute("INSERT INTO temp_roles (user_id, role_id, guild_id) VALUES (2, 3, 1)")
+
+        with self.assertRaises(RuntimeError):
+            with self.storage.transaction():
+                self.storage.execute('DELETE FROM temp_roles')
+                self.journal.complete(entry_id)
+                raise RuntimeError("crash before commit")
+        self.assertEqual(self.entries(), [entry_id])
+        self.assertEqual(self.storage.execute('SELECT COUNT(*) FROM temp_roles').fetchone()[0], 1)
+
+        with self.storage.transaction():
+            self.storage.execute('DELETE FROM temp_roles')
+            self.journal.complete(entry_id)
+        self.assertEqual(self.entries(), [])
+
+    async def test_replay_runs_once_per_process(self):
+        replayed = []
+
+        async def handler(guild_id, user_id, payload):
+            replayed.append((guild_id, user_id, payload))
+
+        self.journal.register('restore', handler)
+        await self.journal.begin('restore', 1, 2, {'roles': [3]})
+        self.assertEqual(await self.journal.replay(), 1)
+        self.assertEqual(replayed, [(1, 2, {'roles': [3]})])
+
+        # An entry of an operation still running when on_ready fires again
+        await self.journal.begin('restore', 1, 4, {'roles': [5]})
+        self.assertEqual(await self.journal.replay(), 0)
+        self.assertEqual(len(replayed), 1)
+
+    async def test_legacy_journal_is_migrated(self):
+        legacy_dir = tempfile.mkdtemp()
+        legacy = sqlite3.connect(os.path.join(legacy_dir, 'role_journal.db'))
+        legacy.execute('''
+            CREATE TABLE role_journal (entry_id INTEGER PRIMARY KEY, kind TEXT, guild_id INTEGER,
+                                       user_id INTEGER, payload TEXT, created_at TIMESTAMP)
+        ''')
+        legacy.execute("INSERT INTO role_journal VALUES (7, 'restore', 1, 2, '{}', NULL)")
+        legacy.commit()
+        legacy.close()
+
+        storage = StorageManager(os.path.join(legacy_dir, 'discord_bot.db'))
+        journal = RoleJournal(storage)
+        journal.open()
+        self.assertEqual(storage.execute('SELECT entry_id, kind FROM role_journal').fetchall(), [(7, 'restore')])
+        self.assertEqual(journal._next_id, 8)
+        storage.close()
+
+if __name__ == '__main__':
+    unittest.main()
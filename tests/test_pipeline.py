@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from events.pipeline import MemberEventPipeline
+
+class MemberEventPipelineTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pipeline = MemberEventPipeline(partitions=1, max_queue=2)
+        self.pipeline.start()
+        self.seen = []
+
+    async def asyncTearDown(self):
+        await self.pipeline.stop(timeout=1.0)
+
+    async def handler(self, user_id, seq):
+        await asyncio.sleep(0)
+        self.seen.append((user_id, seq))
+
+    async def test_full_partition_keeps_per_member_order(self):
+        # Listener tasks keep arriving while the full partition drains, so
+        # a freed slot is contended by a blocked submit and a fresh one
+        submitted = []
+        listeners = []
+        for seq in range(60):
+            user_id = seq % 3
+            submitted.append((user_id, seq))
+            listeners.append(asyncio.create_task(self.pipeline.submit(1, user_id, self.handler, user_id, seq)))
+            if seq % 4 == 3:
+                await asyncio.sleep(0)
+        await asyncio.gather(*listeners)
+        await self.pipeline.queues[0].join()
+
+        self.assertEqual(self.seen, submitted)
+        for user_id in range(3):
+            self.assertEqual([s for u, s in self.seen if u == user_id], [s for u, s in submitted if u == user_id])
+
+    async def test_submit_waits_while_the_partition_is_full(self):
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        for _ in range(3):
+            await self.pipeline.submit(1, 1, blocked)
+        waiting = asyncio.create_task(self.pipeline.submit(1, 1, self.handler, 1, 0))
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        self.assertEqual(self.pipeline.stats()[0]['waiting'], 1)
+
+        release.set()
+        await waiting
+        await self.pipeline.queues[0].join()
+        self.assertEqual(self.seen, [(1, 0)])
+        self.assertEqual(self.pipeline.stats()[0]['processed'], 4)
+
+    async def test_stop_cancels_submits_still_waiting(self):
+        never = asyncio.Event()
+
+        async def blocked():
+            await never.wait()
+
+        for _ in range(3):
+            await self.pipeline.submit(1, 1, blocked)
+        waiting = asyncio.create_task(self.pipeline.submit(1, 1, blocked))
+        await asyncio.sleep(0)
+        await self.pipeline.stop(timeout=0.01)
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+if __name__ == '__main__':
+    unittest.main()
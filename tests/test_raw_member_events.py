@@ -0,0 +1,33 @@
+import unittest
+
+import discord
+from discord.ext import commands
+
+from events.raw_member_events import install_raw_member_update
+
+class InstallRawMemberUpdateTest(unittest.TestCase):
+    def make_bot(self):
+        intents = discord.Intents.default()
+        intents.members = True
+        return commands.Bot(command_prefix="!", intents=intents,
+                            member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+
+    def test_updates_are_dispatched_raw_with_the_installed_discord_py(self):
+        bot = self.make_bot()
+        dispatched = []
+        bot.dispatch = lambda event, *args: dispatched.append((event, args))
+        install_raw_member_update(bot)
+
+        payload = {'guild_id': '1', 'user': {'id': '2'}, 'roles': ['3'], 'nick': 'n'}
+        # The guild isn't cached, so the library's own parser ignores the payload
+        bot._connection.parsers['GUILD_MEMBER_UPDATE'](payload)
+        self.assertEqual(dispatched, [('raw_member_update', (payload,))])
+
+    def test_missing_parser_fails_loudly(self):
+        bot = self.make_bot()
+        del bot._connection.parsers['GUILD_MEMBER_UPDATE']
+        with self.assertRaises(RuntimeError):
+            install_raw_member_update(bot)
+
+if __name__ == '__main__':
+    unittest.main()
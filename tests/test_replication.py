@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from database.db_handler import DatabaseHandler
+from database.replication import OutboxShipper
+from database.storage import StorageManager
+
+class StubService:
+    """Stand-in for the bulk and delete routes of the REST service in service/"""
+
+    def __init__(self):
+        self.bulk_calls = []
+        self.bulk_times = []
+        self.deletes = []
+        self.stored = {}
+        # Responses to give the next bulk requests before accepting them
+        self.failures = []
+        # user_id -> message for records to reject as the validator would
+        self.reject = {}
+        app = web.Application()
+        app.router.add_post('/api/users/bulk', self.bulk)
+        app.router.add_delete('/api/users/{user_id}', self.delete_user)
+        self.server = TestServer(app)
+
+    async def bulk(self, request):
+        users = (await request.json())['users']
+        self.bulk_calls.append(users)
+        self.bulk_times.append(time.monotonic())
+        if self.failures:
+            return self.failures.pop(0)
+        results = []
+        for index, user in enumerate(users):
+            message = self.reject.get(user['user_id'])
+            if message:
+                results.append({'index': index, 'user_id': user['user_id'], 'success': False, 'message': message})
+            else:
+                self.stored[user['user_id']] = user
+                results.append({'index': index, 'user_id': user['user_id'], 'success': True})
+        failed = sum(not result['success'] for result in results)
+        return web.json_response({'success': not failed, 'results': results}, status=207 if failed else 200)
+
+    async def delete_user(self, request):
+        user_id = request.match_info['user_id']
+        self.deletes.append(user_id)
+        if self.stored.pop(user_id, None) is None:
+            return web.json_response({'success': False, 'message': 'User not found'}, status=404)
+        return web.json_response({'success': True})
+
+class OutboxShipperTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = StubService()
+        await self.service.server.start_server()
+        self.addAsyncCleanup(self.service.server.close)
+        self.storage = StorageManager(os.path.join(tempfile.mkdtemp(), 'discord_bot.db'), replicate=True)
+        self.db = DatabaseHandler(self.storage)
+        await self.db.connect()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.storage.close()
+
+    async def shipper(self, run=False, **kwargs):
+        shipper = OutboxShipper(self.storage, str(self.service.server.make_url('')), **kwargs)
+        shipper.start()
+        # Tests drive ship_batch() themselves unless they want the retry loop
+        if not run:
+            shipper.task.cancel()
+        self.addAsyncCleanup(shipper.stop)
+        return shipper
+
+    def pending(self):
+        return self.storage.execute('SELECT COUNT(*) FROM replication_outbox').fetchone()[0]
+
+    async def test_batches_ship_latest_state_in_seq_order(self):
+        shipper = await self.shipper(batch_size=3)
+        for user_id in range(1, 5):
+            await self.db.update_member(user_id, [10 + user_id], f"nick-{user_id}")
+        await self.db.update_member(1, [20], 'renamed')
+
+        self.assertEqual(await shipper.ship_batch(), 3)
+        self.assertEqual(await shipper.ship_batch(), 2)
+        self.assertEqual(await shipper.ship_batch(), 0)
+
+        self.assertEqual([[u['user_id'] for u in users] for users in self.service.bulk_calls],
+                         [['1', '2', '3'], ['4', '1']])
+        self.assertEqual(self.service.stored['1'], {'user_id': '1', 'roles': ['20'], 'nickname': 'renamed'})
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual(shipper.stats()['shipped'], 5)
+
+    async def test_partial_failure_keeps_rejected_records(self):
+        shipper = await self.shipper()
+        self.service.reject['2'] = 'roles must be an array of strings'
+        for user_id in (1, 2, 3):
+            await self.db.update_member(user_id, [5])
+
+        self.assertEqual(await shipper.ship_batch(), 3)
+        self.assertEqual(sorted(self.service.stored), ['1', '3'])
+        self.assertEqual(self.pending(), 0)
+
+        rejects = self.storage.execute('SELECT user_id, payload, message FROM replication_rejects').fetchall()
+        self.assertEqual(len(rejects), 1)
+        self.assertEqual(rejects[0][0], '2')
+        self.assertEqual(json.loads(rejects[0][1]), {'user_id': '2', 'roles': ['5'], 'nickname': None})
+        self.assertEqual(rejects[0][2], 'roles must be an array of strings')
+        stats = shipper.stats()
+        self.assertEqual((stats['shipped'], stats['rejected']), (2, 1))
+
+    async def test_deletes_treat_404_as_already_gone(self):
+        shipper = await self.shipper()
+        await self.db.update_member(1, [5])
+        await self.db.update_member(2, [5])
+        await shipper.ship_batch()
+
+        await self.db.delete_member(1)
+        await self.db.delete_member(2)
+        self.service.stored.pop('2')
+        self.assertEqual(await shipper.ship_batch(), 2)
+        self.assertEqual(sorted(self.service.deletes), ['1', '2'])
+        self.assertEqual(self.service.stored, {})
+        self.assertEqual(self.pending(), 0)
+
+    async def test_server_errors_keep_the_outbox_and_back_off(self):
+        for _ in range(2):
+            self.service.failures.append(web.json_response({'success': False}, status=500))
+        await self.db.update_member(1, [5])
+        shipper = await self.shipper(run=True, interval=0.05, max_backoff=1.0)
+
+        for _ in range(100):
+            if self.pending() == 0:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual(self.service.stored['1']['roles'], ['5'])
+        self.assertEqual(shipper.failures, 2)
+        self.assertIn('500', shipper.last_error)
+
+        # Waits after the two failures: interval doubled, then doubled again
+        times = self.service.bulk_times
+        self.assertEqual(len(times), 3)
+        self.assertGreaterEqual(times[1] - times[0], 0.09)
+        self.assertGreaterEqual(times[2] - times[1], 0.19)
+
+    async def test_failed_batch_is_retried_whole(self):
+        shipper = await self.shipper()
+        self.service.failures.append(web.json_response({'success': False}, status=503))
+        await self.db.update_member(1, [5])
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await shipper.ship_batch()
+        self.assertEqual(self.pending(), 1)
+        self.assertEqual(await shipper.ship_batch(), 1)
+        self.assertEqual(self.pending(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import random
+import unittest
+
+from database.role_index import RoleIndex
+
+class RoleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = RoleIndex()
+        # user_id -> (set of role ids, present)
+        self.members = {}
+
+    def store(self, user_id, roles, present=None):
+        self.index.set_member(user_id, roles, present=present)
+        old_present = self.members.get(user_id, (set(), False))[1]
+        self.members[user_id] = (set(roles), old_present if present is None else present)
+
+    def expected(self, all_of=(), any_of=(), none_of=(), present=None):
+        return sorted(
+            user_id for user_id, (roles, is_present) in self.members.items()
+            if all(r in roles for r in all_of)
+            and (not any_of or any(r in roles for r in any_of))
+            and not any(r in roles for r in none_of)
+            and (present is None or is_present == present)
+        )
+
+    def assertMatches(self, **query):
+        total, user_ids = self.index.query(**query)
+        self.assertEqual(sorted(user_ids), self.expected(**query), query)
+        self.assertEqual(total, len(user_ids))
+        self.assertEqual(self.index.count(**query), total)
+
+    def test_boolean_queries(self):
+        self.store(1, [10, 20], present=True)
+        self.store(2, [10], present=False)
+        self.store(3, [20, 30], present=True)
+        self.store(4, [], present=True)
+
+        self.assertEqual(self.index.query(all_of=[10])[1], [1, 2])
+        self.assertEqual(self.index.query(all_of=[10], none_of=[20])[1], [2])
+        self.assertEqual(self.index.query(any_of=[10, 30])[1], [1, 2, 3])
+        self.assertEqual(self.index.query(all_of=[20], present=True)[1], [1, 3])
+        self.assertEqual(self.index.query(none_of=[10, 20, 30], present=True)[1], [4])
+        self.assertEqual(self.index.query(all_of=[99]), (0, []))
+
+    def test_paging(self):
+        for user_id in range(100, 150):
+            self.store(user_id, [1])
+        total, page = self.index.query(all_of=[1], offset=20, limit=10)
+        self.assertEqual(total, 50)
+        self.assertEqual(page, list(range(120, 130)))
+        self.assertEqual(self.index.query(all_of=[1], offset=50, limit=10), (50, []))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        rng = random.Random(7)
+        for _ in range(3000):
+            user_id = rng.randrange(200)
+            if rng.random() < 0.1:
+                self.index.remove_member(user_id)
+                self.members.pop(user_id, None)
+            elif rng.random() < 0.1:
+                present = rng.random() < 0.5
+                self.index.set_present(user_id, present)
+                if user_id in self.members:
+                    self.members[user_id] = (self.members[user_id][0], present)
+            else:
+                self.store(user_id, rng.sample(range(12), rng.randrange(5)), present=rng.choice([None, True, False]))
+
+        self.assertEqual(len(self.index), len(self.members))
+        for _ in range(50):
+            self.assertMatches(
+                all_of=rng.sample(range(12), rng.randrange(3)),
+                any_of=rng.sample(range(12), rng.randrange(3)),
+                none_of=rng.sample(range(12), rng.randrange(3)),
+                present=rng.choice([None, True, False]),
+            )
+
+    def test_counts_follow_updates_and_removals(self):
+        self.store(1, [10, 20])
+        self.store(2, [10])
+        self.store(1, [20, 30])
+        self.index.remove_member(2)
+        self.assertEqual(self.index.role_counts(), {10: 0, 20: 1, 30: 1})
+
+    def test_freed_rows_are_reused_without_old_roles(self):
+        self.store(1, [10])
+        self.index.remove_member(1)
+        self.members.pop(1)
+        self.store(2, [20])
+        self.assertEqual(self.index.query(all_of=[10]), (0, []))
+        self.assertEqual(self.index.query(all_of=[20])[1], [2])
+
+    def test_purge_role(self):
+        self.store(1, [10, 20])
+        self.store(2, [10])
+        self.assertEqual(self.index.purge_role(10), 2)
+        self.assertEqual(self.index.query(all_of=[10]), (0, []))
+        self.assertNotIn(10, self.index.role_counts())
+        # A later update still carrying the purged id leaves it out
+        self.index.set_member(2, [30])
+        self.assertEqual(self.index.query(all_of=[30])[1], [2])
+        self.assertEqual(self.index.query(all_of=[20])[1], [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from array import array
+
+from database.db_handler import DatabaseHandler
+from database.storage import StorageManager
+
+class PurgeRoleTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = StorageManager(os.path.join(tempfile.mkdtemp(), 'discord_bot.db'))
+        self.db = DatabaseHandler(self.storage)
+        await self.db.connect()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self.storage.close()
+
+    async def roles_of(self, user_id):
+        return sorted((await self.db.get_member(user_id)).roles)
+
+    async def test_moves_holders_across_sets_in_chunks(self):
+        # One large set split across chunks, and many single-member sets sharing chunks
+        for user_id in range(1, 8):
+            await self.db.update_member(user_id, [5, 6])
+        for user_id in range(10, 20):
+            await self.db.update_member(user_id, [5, user_id + 100])
+        await self.db.update_member(50, [6])
+        await self.db.update_member(51, [55])
+
+        yields = 0
+        async def count_yields():
+            nonlocal yields
+            while True:
+                await asyncio.sleep(0)
+                yields += 1
+        counter = asyncio.create_task(count_yields())
+        await asyncio.sleep(0)
+        affected = await self.db.purge_role(1, 5, 'gone', record_history=True, chunk_size=3)
+        counter.cancel()
+
+        self.assertEqual(sorted(affected), [*range(1, 8), *range(10, 20)])
+        self.assertGreaterEqual(yields, len(affected) // 3)
+        for user_id in range(1, 8):
+            self.assertEqual(await self.roles_of(user_id), [6])
+        for user_id in range(10, 20):
+            self.assertEqual(await self.roles_of(user_id), [user_id + 100])
+        self.assertEqual(await self.roles_of(50), [6])
+        self.assertEqual(await self.roles_of(51), [55])
+
+        history = self.storage.execute('SELECT role_id, role_name, user_ids FROM role_purges').fetchall()
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0][:2], (5, 'gone'))
+        self.assertEqual(sorted(array('Q', history[0][2])), sorted(affected))
+
+    async def test_role_ids_match_whole_ids_only(self):
+        await self.db.update_member(1, [5])
+        await self.db.update_member(2, [55, 15])
+        self.assertEqual(list(await self.db.purge_role(1, 5, 'gone')), [1])
+        self.assertEqual(await self.roles_of(1), [])
+        self.assertEqual(await self.roles_of(2), [15, 55])
+        self.assertEqual(self.storage.execute('SELECT COUNT(*) FROM role_purges').fetchone()[0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
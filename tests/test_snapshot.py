@@ -0,0 +1,40 @@
+import unittest
+from array import array
+
+from database.snapshot import MemberSnapshot
+
+class MemberSnapshotTest(unittest.TestCase):
+    def test_ids_are_converted_to_ints(self):
+        snapshot = MemberSnapshot('123', ['4', 5], 'nick', '2024-01-01')
+        self.assertEqual(snapshot.user_id, 123)
+        self.assertEqual(snapshot.roles, array('Q', [4, 5]))
+        self.assertEqual((snapshot.nickname, snapshot.last_updated), ('nick', '2024-01-01'))
+
+    def test_role_arrays_are_shared_not_copied(self):
+        roles = array('Q', [1, 2])
+        self.assertIs(MemberSnapshot(1, roles).roles, roles)
+
+    def test_from_row(self):
+        snapshot = MemberSnapshot.from_row(('9', '10,11', None, 'ts', 'extra column'))
+        self.assertEqual((snapshot.user_id, list(snapshot.roles), snapshot.nickname, snapshot.last_updated),
+                         (9, [10, 11], None, 'ts'))
+        self.assertEqual(list(MemberSnapshot.from_row(('9', '', None, None)).roles), [])
+        self.assertEqual(list(MemberSnapshot.from_row(('9', None, None, None)).roles), [])
+
+    def test_equality_ignores_last_updated(self):
+        self.assertEqual(MemberSnapshot(1, [2], 'n', 'then'), MemberSnapshot('1', ['2'], 'n', 'now'))
+        self.assertNotEqual(MemberSnapshot(1, [2], 'n'), MemberSnapshot(1, [3], 'n'))
+        self.assertNotEqual(MemberSnapshot(1, [2], 'n'), MemberSnapshot(1, [2], 'other'))
+        self.assertNotEqual(MemberSnapshot(1), {'user_id': 1})
+
+    def test_slots_only(self):
+        snapshot = MemberSnapshot(1)
+        with self.assertRaises(AttributeError):
+            snapshot.extra = True
+        self.assertFalse(hasattr(snapshot, '__dict__'))
+
+    def test_repr(self):
+        self.assertEqual(repr(MemberSnapshot(1, [2], 'n')), "MemberSnapshot(user_id=1, roles=[2], nickname='n')")
+
+if __name__ == '__main__':
+    unittest.main()
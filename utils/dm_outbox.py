@@ -0,0 +1,189 @@
+import discord
+import aiohttp
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+import json
+import logging
+import time
+
+logger = logging.getLogger('bot.dm_outbox')
+
+class DMOutboxDB:
+    """Persists queued direct messages so they survive restarts
+
+    Messages live in the shared storage manager's database, which creates
+    the dm_outbox table.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.storage.open()
+
+    def add_message(self, user_id: int, embed: dict, dedupe_key: str):
+        """Queue a message, returning its id or None if the key was already queued"""
+        cursor = self.storage.execute('''
+            INSERT OR IGNORE INTO dm_outbox (dedupe_key, user_id, embed, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (dedupe_key, user_id, json.dumps(embed), datetime.now().isoformat()))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def get_message(self, message_id: int):
+        """Get (user_id, embed, attempts, created_at) for a queued message"""
+        return self.storage.execute('''
+            SELECT user_id, embed, attempts, created_at FROM dm_outbox
+            WHERE message_id = ? AND status = 'pending'
+        ''', (message_id,)).fetchone()
+
+    def set_status(self, message_id: int, status: str, attempts: int):
+        """Record the outcome of a send attempt"""
+        self.storage.execute('UPDATE dm_outbox SET status = ?, attempts = ? WHERE message_id = ?',
+                             (status, attempts, message_id))
+
+    def get_pending_ids(self):
+        """Get ids of all messages still waiting to be sent"""
+        return [row[0] for row in self.storage.execute(
+            "SELECT message_id FROM dm_outbox WHERE status = 'pending' ORDER BY message_id"
+        )]
+
+    def prune(self, older_than: datetime):
+        """Forget finished messages; their dedupe keys only need to live for a while"""
+        return self.storage.execute(
+            "DELETE FROM dm_outbox WHERE status != 'pending' AND created_at < ?",
+            (older_than.isoformat(),)
+        ).rowcount
+
+class DMOutbox:
+    """Sends direct messages from a persisted queue with a small worker pool
+
+    Callers enqueue and return immediately, so role grants and expiries
+    never wait on Discord's DM endpoint. Sends are paced globally, transient
+    failures are retried with exponential backoff and closed DMs are dropped
+    on the first attempt.
+    """
+
+    def __init__(self, bot, db, workers=2, send_interval=1.0, max_attempts=5, retry_base=5.0):
+        self.bot = bot
+        self.db = db
+        self.workers = workers
+        self.send_interval = send_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+
+        self.queue = asyncio.Queue()
+        self.retrying = 0
+        self.latencies = deque(maxlen=500)
+        self.sent = 0
+        self.dropped = 0
+        self._next_send = 0.0
+        self._pace_lock = asyncio.Lock()
+        self._tasks = []
+        # Scheduled requeues of messages waiting to retry
+        self._retry_handles = set()
+
+    def start(self):
+        """Load pending messages and start the workers"""
+        pruned = self.db.prune(datetime.now() - timedelta(days=7))
+        pending = self.db.get_pending_ids()
+        for message_id in pending:
+            self.queue.put_nowait(message_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"DM outbox started with {len(pending)} pending message(s), pruned {pruned}")
+
+    async def stop(self):
+        """Stop the workers; unsent messages stay queued in the database"""
+        # Messages waiting to retry are still 'pending' and are loaded again by the next start()
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        self.retrying = 0
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, user_id: int, embed: discord.Embed, dedupe_key: str):
+        """Queue a DM; returns False if the same dedupe key was already queued"""
+        message_id = self.db.add_message(user_id, embed.to_dict(), dedupe_key)
+        if message_id is None:
+            return False
+        self.queue.put_nowait(message_id)
+        return True
+
+    def stats(self):
+        """Queue depth and send latency (seconds from enqueue to delivery)"""
+        latencies = sorted(self.latencies)
+        return {
+            'queued': self.queue.qsize(),
+            'retrying': self.retrying,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
+
+    async def _pace(self):
+        async with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + self.send_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _retry_later(self, message_id: int, delay: float):
+        self.retrying += 1
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            self.retrying -= 1
+            self.queue.put_nowait(message_id)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    async def _worker(self):
+        while True:
+            message_id = await self.queue.get()
+            try:
+                await self._send(message_id)
+            except Exception as e:
+                logger.error(f"Unexpected error sending DM {message_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _send(self, message_id: int):
+        message = self.db.get_message(message_id)
+        if not message:
+            return
+        user_id, embed, attempts, created_at = message
+        attempts += 1
+
+        await self._pace()
+        try:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            await user.send(embed=discord.Embed.from_dict(json.loads(embed)))
+        except (discord.Forbidden, discord.NotFound) as e:
+            # DMs closed or user gone: retrying won't help
+            self.db.set_status(message_id, 'failed', attempts)
+            self.dropped += 1
+            if isinstance(e, discord.Forbidden):
+                logger.warning(f"Could not send DM to {user_id} - DMs are closed")
+            else:
+                logger.warning(f"Could not send DM to {user_id} - user not found")
+            return
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            permanent = isinstance(e, discord.HTTPException) and e.status < 500 and e.status != 429
+            if permanent or attempts >= self.max_attempts:
+                self.db.set_status(message_id, 'failed', attempts)
+                self.dropped += 1
+                logger.error(f"Giving up on DM to {user_id} after {attempts} attempts: {str(e)}")
+            else:
+                self.db.set_status(message_id, 'pending', attempts)
+                delay = self.retry_base * 2 ** (attempts - 1)
+                logger.warning(f"DM to {user_id} failed ({str(e)}), retrying in {delay:.0f}s")
+                self._retry_later(message_id, delay)
+            return
+
+        self.db.set_status(message_id, 'sent', attempts)
+        self.sent += 1
+        self.latencies.append((datetime.now() - datetime.fromisoformat(created_at)).total_seconds())
@@ -1,5 +1,9 @@
 import os
+import gzip
 import logging
+import shutil
+import threading
+import time
 from logging.handlers import RotatingFileHandler
 import sys
 from dotenv import load_dotenv
@@ -7,6 +11,108 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+class LogThrottle(logging.Filter):
+    """Sample and rate limit INFO and DEBUG records per call site
+
+    Add it to a logger (not a handler) so dropped records are never
+    formatted. Each call site (file and line) keeps one record out of every
+    sample_every, then spends a token from its own bucket holding up to
+    burst tokens, refilled at rate per second. Warnings and errors always
+    pass. Every summary_interval seconds, the next record through the filter
+    first logs one line per call site saying how many were suppressed.
+    """
+
+    def __init__(self, sample_every=1, rate=10.0, burst=50, summary_interval=60.0):
+        super().__init__()
+        self.sample_every = max(sample_every, 1)
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.sites = {}     # (logger, pathname, lineno) -> [seen, tokens, refilled_at, suppressed]
+        self.last_summary = time.monotonic()
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, 'throttle_summary', False):
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            key = (record.name, record.pathname, record.lineno)
+            site = self.sites.get(key)
+            if site is None:
+                site = self.sites[key] = [0, float(self.burst), now, 0]
+            site[0] += 1
+            keep = site[0] % self.sample_every == 0
+            if keep:
+                site[1] = min(self.burst, site[1] + (now - site[2]) * self.rate)
+                site[2] = now
+                keep = site[1] >= 1
+                if keep:
+                    site[1] -= 1
+            if not keep:
+                site[3] += 1
+            summaries = self._take_summaries(now) if now - self.last_summary >= self.summary_interval else None
+
+        if summaries:
+            self._emit_summaries(summaries)
+        return keep
+
+    def _take_summaries(self, now):
+        elapsed = now - self.last_summary
+        self.last_summary = now
+        summaries = []
+        for (name, pathname, lineno), site in self.sites.items():
+            if site[3]:
+                summaries.append((name, pathname, lineno, site[3], elapsed))
+                site[3] = 0
+        return summaries
+
+    @staticmethod
+    def _emit_summaries(summaries):
+        for name, pathname, lineno, suppressed, elapsed in summaries:
+            logger = logging.getLogger(name)
+            record = logger.makeRecord(
+                logger.name, logging.INFO, pathname, lineno,
+                "%d messages suppressed in the last %.0fs", (suppressed, elapsed), None,
+                extra={'throttle_summary': True}
+            )
+            logger.handle(record)
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that gzips rotated files on a background thread
+
+    Rollover only renames the full file, so logging isn't blocked while a
+    10MB file is compressed. Backups are named bot.log.1.gz, bot.log.2.gz...
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._rotate
+        self.compressing = None
+
+    def doRollover(self):
+        # Backups are shifted before the new one is written, so let the previous compression finish
+        if self.compressing:
+            self.compressing.join()
+        super().doRollover()
+
+    def _rotate(self, source, dest):
+        pending = f"{dest}.pending"
+        os.replace(source, pending)
+        self.compressing = threading.Thread(target=self._compress, args=(pending, dest), name="log-compress", daemon=True)
+        self.compressing.start()
+
+    @staticmethod
+    def _compress(pending, dest):
+        try:
+            with open(pending, 'rb') as src, gzip.open(dest, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(pending)
+        except OSError as e:
+            sys.stderr.write(f"Failed to compress rotated log {pending}: {e}\n")
+
 def setup_logger(name, log_file=None):
     """Set up logger with console and optional file handlers"""
     # Get log level from environment or default to INFO
@@ -39,7 +145,10 @@ def setup_logger(name, log_file=None):
     logger.addHandler(console_handler)
     
     # Create file handler with rotation
-    file_handler = RotatingFileHandler(
+    handler_class = RotatingFileHandler
+    if os.getenv('LOG_COMPRESS_ROTATED', 'true').lower() == 'true':
+        handler_class = CompressingRotatingFileHandler
+    file_handler = handler_class(
         log_file, 
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5,
@@ -49,6 +158,18 @@ def setup_logger(name, log_file=None):
     file_handler.setLevel(log_level)
     logger.addHandler(file_handler)
     
+    # Throttle the per-event loggers (comma separated, e.g. bot.events)
+    throttled = [n.strip() for n in os.getenv('LOG_THROTTLED_LOGGERS', f'{name}.events').split(',') if n.strip()]
+    if throttled:
+        throttle = LogThrottle(
+            sample_every=int(os.getenv('LOG_SAMPLE_EVERY', '1')),
+            rate=float(os.getenv('LOG_RATE_LIMIT', '10')),
+            burst=int(os.getenv('LOG_RATE_BURST', '50')),
+            summary_interval=float(os.getenv('LOG_SUMMARY_INTERVAL', '60'))
+        )
+        for throttled_name in throttled:
+            logging.getLogger(throttled_name).addFilter(throttle)
+    
     # Log initial setup
     logger.debug(f"Logger '{name}' initialized with level {logging.getLevelName(log_level)}")
     
@@ -0,0 +1,31 @@
+import discord
+from config import BOT_CONFIG
+
+async def iter_members(guild: discord.Guild):
+    """Yield every member of a guild
+
+    Uses the member cache when the guild is chunked. In raw member event
+    mode there is no cache, so members are streamed from the API without
+    being kept. Otherwise the guild is chunked over the gateway first.
+    """
+    if not guild.chunked:
+        if BOT_CONFIG["raw_member_events"]:
+            async for member in guild.fetch_members(limit=None):
+                yield member
+            return
+        await guild.chunk()
+    for member in guild.members:
+        yield member
+
+async def resolve_member(guild: discord.Guild, user_id: int):
+    """Get a member from the cache, falling back to the API when the cache is incomplete
+
+    Returns None if the user is not in the guild.
+    """
+    member = guild.get_member(user_id)
+    if member is None and not guild.chunked:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+    return member
@@ -0,0 +1,200 @@
+import discord
+import logging
+import os
+import time
+
+logger = logging.getLogger('bot.permissions')
+
+EVERYONE, MANAGER, ADMIN = 0, 1, 2
+LEVELS = {"everyone": EVERYONE, "manager": MANAGER, "admin": ADMIN}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+# A denied user is logged at most once per interval; repeats are counted instead
+DENIAL_LOG_INTERVAL = 60
+
+class PermissionPolicyDB:
+    """Per-guild permission rules, kept in the shared storage manager's database"""
+
+    ROLE_TABLES = {ADMIN: "admin_roles", MANAGER: "manager_roles"}
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.storage.open()
+
+    def get_rules(self, guild_id: int):
+        """Return (admin role ids, manager role ids, {command: level}) for a guild"""
+        admin_roles = {row[0] for row in self.storage.execute(
+            'SELECT role_id FROM admin_roles WHERE guild_id = ?', (guild_id,)
+        )}
+        manager_roles = {row[0] for row in self.storage.execute(
+            'SELECT role_id FROM manager_roles WHERE guild_id = ?', (guild_id,)
+        )}
+        overrides = {command: LEVELS[level] for command, level in self.storage.execute(
+            'SELECT command, level FROM command_permissions WHERE guild_id = ?', (guild_id,)
+        )}
+        return admin_roles, manager_roles, overrides
+
+    def add_role(self, guild_id: int, role_id: int, level: int):
+        self.storage.execute(
+            f'INSERT OR IGNORE INTO {self.ROLE_TABLES[level]} (role_id, guild_id) VALUES (?, ?)',
+            (role_id, guild_id)
+        )
+
+    def remove_role(self, guild_id: int, role_id: int, level: int):
+        """Returns True if the role had that level"""
+        return self.storage.execute(
+            f'DELETE FROM {self.ROLE_TABLES[level]} WHERE role_id = ? AND guild_id = ?',
+            (role_id, guild_id)
+        ).rowcount > 0
+
+    def set_override(self, guild_id: int, command: str, level: int):
+        self.storage.execute(
+            'INSERT OR REPLACE INTO command_permissions (guild_id, command, level) VALUES (?, ?, ?)',
+            (guild_id, command, LEVEL_NAMES[level])
+        )
+
+    def clear_override(self, guild_id: int, command: str):
+        self.storage.execute(
+            'DELETE FROM command_permissions WHERE guild_id = ? AND command = ?',
+            (guild_id, command)
+        )
+
+class CompiledPolicy:
+    """A guild's rules flattened into role id sets for constant time checks"""
+
+    __slots__ = ('owner_id', 'admin_roles', 'manager_roles', 'everyone_level', 'overrides')
+
+    def __init__(self, owner_id, admin_roles, manager_roles, everyone_level, overrides):
+        self.owner_id = owner_id
+        self.admin_roles = admin_roles
+        self.manager_roles = manager_roles
+        self.everyone_level = everyone_level
+        self.overrides = overrides
+
+class PermissionPolicy:
+    """Decides who may run which command, per guild
+
+    A member is admin if they own the guild, hold a role with the
+    administrator permission, ADMIN_ROLE_ID, or an admin role configured for
+    the guild. Managers hold manage_roles or a configured manager role.
+    Commands need the level they were declared with unless the guild
+    overrides it.
+
+    Each guild's rules are compiled once into role id sets and recompiled
+    only after a role, ownership or rule change invalidates them. Member
+    role changes need no invalidation since members are checked against
+    the sets with their current roles.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.admin_role_id = os.getenv('ADMIN_ROLE_ID')
+        self._compiled = {}
+        # (guild_id, user_id) -> [last logged monotonic time, suppressed denials]
+        self._denials = {}
+
+    def attach(self, storage):
+        """Load per-guild rules from the shared database from now on"""
+        self.db = PermissionPolicyDB(storage)
+        self.invalidate()
+
+    def invalidate(self, guild_id=None):
+        """Drop compiled rules for one guild, or for all guilds"""
+        if guild_id is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(guild_id, None)
+
+    def compile(self, guild: discord.Guild):
+        admin_roles, manager_roles, overrides = self.db.get_rules(guild.id) if self.db else (set(), set(), {})
+        if self.admin_role_id:
+            admin_roles.add(int(self.admin_role_id))
+
+        for role in guild.roles:
+            if role.is_default():
+                continue
+            if role.permissions.administrator:
+                admin_roles.add(role.id)
+            elif role.permissions.manage_roles:
+                manager_roles.add(role.id)
+
+        everyone = guild.default_role.permissions
+        everyone_level = ADMIN if everyone.administrator else MANAGER if everyone.manage_roles else EVERYONE
+
+        return CompiledPolicy(guild.owner_id, frozenset(admin_roles), frozenset(manager_roles), everyone_level, overrides)
+
+    def get(self, guild: discord.Guild):
+        compiled = self._compiled.get(guild.id)
+        if compiled is None:
+            compiled = self._compiled[guild.id] = self.compile(guild)
+        return compiled
+
+    def member_level(self, member: discord.Member):
+        """Highest permission level a member has in their guild"""
+        compiled = self.get(member.guild)
+        if member.id == compiled.owner_id:
+            return ADMIN
+        role_ids = {role.id for role in member.roles}
+        if compiled.everyone_level == ADMIN or not compiled.admin_roles.isdisjoint(role_ids):
+            return ADMIN
+        if compiled.everyone_level == MANAGER or not compiled.manager_roles.isdisjoint(role_ids):
+            return MANAGER
+        return EVERYONE
+
+    def required_level(self, guild: discord.Guild, command, default_level):
+        if command is None:
+            return default_level
+        return self.get(guild).overrides.get(command.qualified_name, default_level)
+
+    async def check(self, interaction: discord.Interaction, default_level):
+        """Return True if the user may run the interaction's command"""
+        if interaction.guild is None or not isinstance(interaction.user, discord.Member):
+            return False
+
+        required = self.required_level(interaction.guild, interaction.command, default_level)
+        if required == EVERYONE or self.member_level(interaction.user) >= required:
+            return True
+
+        self.log_denial(interaction, required)
+        return False
+
+    def log_denial(self, interaction: discord.Interaction, required):
+        user = interaction.user
+        key = (interaction.guild.id, user.id)
+        now = time.monotonic()
+        entry = self._denials.get(key)
+        if entry and now - entry[0] < DENIAL_LOG_INTERVAL:
+            entry[1] += 1
+            return
+
+        suppressed = entry[1] if entry else 0
+        if len(self._denials) > 10000:
+            self._denials = {k: v for k, v in self._denials.items() if now - v[0] < DENIAL_LOG_INTERVAL}
+        self._denials[key] = [now, 0]
+
+        command = interaction.command.qualified_name if interaction.command else "unknown"
+        repeats = f" ({suppressed} more denials since last logged)" if suppressed else ""
+        logger.warning(
+            f"User {user.name} ({user.id}) attempted to use /{command} without "
+            f"{LEVEL_NAMES[required]} permission{repeats}"
+        )
+
+    def add_role(self, guild_id: int, role_id: int, level: int):
+        self.db.add_role(guild_id, role_id, level)
+        self.invalidate(guild_id)
+
+    def remove_role(self, guild_id: int, role_id: int, level: int):
+        removed = self.db.remove_role(guild_id, role_id, level)
+        self.invalidate(guild_id)
+        return removed
+
+    def set_override(self, guild_id: int, command: str, level):
+        """Require a level for a command in a guild; None restores its default"""
+        if level is None:
+            self.db.clear_override(guild_id, command)
+        else:
+            self.db.set_override(guild_id, command, level)
+        self.invalidate(guild_id)
+
+# Shared by the check functions in utils.permission_checks and the permissions cog
+policy = PermissionPolicy()
@@ -0,0 +1,183 @@
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+logger = logging.getLogger('bot.profiling')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _is_project_frame(frame):
+    filename = frame.f_code.co_filename
+    return filename.startswith(PROJECT_ROOT) and '.venv' not in filename and filename != __file__
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.relpath(code.co_filename, PROJECT_ROOT)}:{frame.f_lineno})"
+
+def _stack(frame):
+    """Frames from the outermost call to the given frame"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+def describe_culprit(frame):
+    """Summarize where a thread is as 'entry point -> innermost bot code'
+
+    The outermost bot frame is usually the cog listener or command that
+    was scheduled on the loop, the innermost one the code actually running.
+    """
+    ours = [f for f in _stack(frame) if _is_project_frame(f)]
+    if not ours:
+        return _frame_name(frame)
+    if len(ours) == 1:
+        return _frame_name(ours[0])
+    return f"{_frame_name(ours[0])} -> {_frame_name(ours[-1])}"
+
+class LoopStallMonitor:
+    """Detects event loop stalls and reports the code that caused them
+
+    A heartbeat task records when the loop last got to run, and a watchdog
+    thread samples the loop thread's stack as soon as the heartbeat is
+    late. When the loop recovers, the stall is logged with the coroutine
+    or listener that was running, so it costs nothing while the loop is
+    healthy and needs no asyncio debug mode.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.last_tick = 0.0
+        self.loop_thread_id = None
+        self.stalls = 0
+        self.worst = 0.0
+        self.worst_culprit = None
+        self._task = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the heartbeat and watchdog; call from the event loop"""
+        if self._task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        """Stop monitoring"""
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self.last_tick = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        stalled_since = None
+        culprit = stack = None
+        while not self._stopping.wait(self.interval):
+            tick = self.last_tick
+            late = time.monotonic() - tick - self.interval
+            if late >= self.threshold:
+                if stalled_since != tick:
+                    # First sample of a new stall: catch the code while it is still running
+                    stalled_since = tick
+                    frame = sys._current_frames().get(self.loop_thread_id)
+                    culprit = describe_culprit(frame) if frame else "unknown"
+                    stack = ''.join(traceback.format_stack(frame, limit=15)) if frame else ""
+                continue
+
+            if stalled_since is not None:
+                duration = tick - stalled_since - self.interval
+                self._report(duration, culprit, stack)
+                stalled_since = None
+
+    def _report(self, duration, culprit, stack):
+        self.stalls += 1
+        if duration > self.worst:
+            self.worst = duration
+            self.worst_culprit = culprit
+        logger.warning(f"Event loop blocked for {duration * 1000:.0f} ms in {culprit}\n{stack}")
+
+    def stats(self):
+        return {
+            'stalls': self.stalls,
+            'worst_ms': self.worst * 1000,
+            'worst_culprit': self.worst_culprit,
+            'threshold_ms': self.threshold * 1000,
+        }
+
+async def profile_cprofile(seconds):
+    """Profile everything the event loop runs for a while
+
+    Returns (pstats file bytes, text summary of the top functions).
+    cProfile only sees the thread that enabled it, which is the loop
+    thread; work sent to worker threads is not included.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(25)
+
+    # Same format as Profile.dump_stats, which only writes to a path
+    stats_bytes = marshal.dumps(stats.stats)
+    return stats_bytes, summary.getvalue()
+
+async def profile_sampling(seconds, thread_id=None, sample_interval=0.005):
+    """Sample the event loop thread's stack for a while
+
+    Returns the samples as folded stacks ("outer;inner count" lines),
+    the input format of flamegraph.pl and speedscope, plus the number of
+    samples taken. Idle time shows up as the selector wait.
+    """
+    thread_id = thread_id or threading.get_ident()
+    counts = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    def sample():
+        nonlocal samples
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                counts[';'.join(
+                    f"{f.f_code.co_qualname} ({os.path.basename(f.f_code.co_filename)})"
+                    for f in _stack(frame)
+                )] += 1
+                samples += 1
+            time.sleep(sample_interval)
+
+    await asyncio.to_thread(sample)
+    folded = '\n'.join(f"{stack} {count}" for stack, count in counts.most_common())
+    return folded, samples